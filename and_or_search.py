@@ -0,0 +1,741 @@
+import heapq
+import math
+import numpy as np
+
+import compiled_graph
+
+
+class AndOrSearch:
+
+    def __init__(self, graph, start_nodes, h_score=None, constraints=None):
+        """
+        Generalized Dijkstra search (Knuth, 1977) for the cheapest attack on an AND/OR attack graph.
+
+        An 'or' node is reached from its cheapest settled parent, the one with the lowest index if
+        several are equally cheap. An 'and' node becomes ready when
+        all of its necessary parents are settled, and is then reached through all of them. Entering
+        a node through an edge costs the cost of the node, so an 'and' node pays its cost once per
+        necessary parent. Non-viable nodes and nodes that are not 'or' or 'and' are never entered.
+
+        The order of the search uses Knuth's sum of the parent costs for 'and' nodes, which counts
+        steps shared by the parents more than once. The cost of the extracted attack subgraph pays
+        every step once, and is the minimal cost when the alternatives do not share steps. Ties are
+        broken by the node indices, and the A* search settles a node after its parents of equal
+        estimate, so the attack subgraph does not depend on the order of the search: Dijkstra, A*
+        and the bidirectional search extract the same attack.
+
+        The search keeps the settled costs (g_score) and the predecessors of every node, so it can
+        be stopped at a target and the attack subgraph extracted without recursion.
+
+        Parameters:
+        - graph: A CompiledAttackGraph instance.
+        - start_nodes: The index of the node the attacker starts from (e.g. the attacker node), or a
+                       list of indices. A start node is reached at its own cost, which is 0 for the
+                       attacker node.
+        - h_score: Optional list with a lower bound of the cost from every node to the target,
+                   e.g. from heuristics.LandmarkHeuristic. Turns the search into an A* search.
+                   Nodes with an infinite estimate are not entered. The priorities of the open set
+                   are then (estimate, cost) pairs.
+        - constraints: Optional dictionary mapping node indices to the set of parent indices the
+                       node may be entered from, see cheapest_attacks(). An empty set blocks the node.
+        """
+        self.graph = graph
+        self.view = graph.scalar_view()
+        self.start_nodes = [start_nodes] if isinstance(start_nodes, int) else list(start_nodes)
+        self.h_score = h_score
+        self.constraints = constraints
+        size = len(graph)
+
+        self.g_score = [math.inf] * size
+        # The parents a node was reached from: one for 'or' nodes, all necessary parents for 'and' nodes.
+        self.predecessors = [None] * size
+        # Position of each node in the settle order, -1 if the node is not settled.
+        self.settle_position = [-1] * size
+        # The settled nodes in settle order.
+        self.settle_order = []
+        self.expanded_nodes = 0
+        # Number of child edges looked at by the expanded nodes.
+        self.relaxed_edges = 0
+
+        # Number of necessary parents of each node that are not settled yet.
+        self.necessary_parents = graph.necessary_parent_counts().tolist()
+        self.remaining_parents = self.necessary_parents.copy()
+
+        # Heap of (priority, node) entries. A node is pushed again when its cost is lowered, and
+        # the stale entries are skipped when they are popped (lazy deletion).
+        self.open_set = []
+        self.heap_pushes = 0
+        costs = self.view.cost
+        for start_node in self.start_nodes:
+            self.g_score[start_node] = costs[start_node]
+            self.push(start_node, costs[start_node] if h_score is None else (costs[start_node] + h_score[start_node], costs[start_node]))
+
+    def push(self, node, priority):
+        """
+        Add a node to the open set with a priority.
+        """
+        heapq.heappush(self.open_set, (priority, node))
+        self.heap_pushes += 1
+
+    def open_priority(self):
+        """
+        Return the lowest priority of a node in the open set that is not settled yet, math.inf if
+        there is none. The stale entries on top of the open set are dropped.
+        """
+        open_set = self.open_set
+        while open_set and self.settle_position[open_set[0][1]] != -1:
+            heapq.heappop(open_set)
+        return open_set[0][0] if open_set else math.inf
+
+    def is_settled(self, node):
+        """
+        Return True if the cheapest cost of the node is known.
+        """
+        return self.settle_position[node] != -1
+
+    def run(self, target_node=None, max_cost=None):
+        """
+        Settle nodes in order of cost until the target node is settled, or until all reachable
+        nodes are settled if no target node is given. The search can be resumed with another
+        target node if no h_score is used.
+
+        Parameters:
+        - target_node: Optional index of the target node.
+        - max_cost: Optional cost bound, the search stops before settling a node whose cost (or
+                    estimate with h_score) is above it.
+
+        Returns:
+        - bool: True if the target node is settled (always True without a target node).
+        """
+        if target_node is not None and self.is_settled(target_node):
+            return True
+        view = self.view
+        children_indptr = view.children_indptr
+        children_indices = view.children_indices
+        parents_indptr = view.parents_indptr
+        parents_indices = view.parents_indices
+        node_type = view.node_type
+        is_necessary = view.is_necessary
+        is_viable = view.is_viable
+        costs = view.cost
+        h_score = self.h_score
+        constraints = self.constraints
+        g_score = self.g_score
+        predecessors = self.predecessors
+        settle_position = self.settle_position
+        settle_order = self.settle_order
+        necessary_parents = self.necessary_parents
+        remaining_parents = self.remaining_parents
+        open_set = self.open_set
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+        pushes = 0
+
+        while open_set:
+            priority, node = heappop(open_set)
+            if settle_position[node] != -1:
+                continue
+            if max_cost is not None and priority > max_cost:
+                heappush(open_set, (priority, node))
+                break
+            settle_position[node] = self.expanded_nodes
+            settle_order.append(node)
+            self.expanded_nodes += 1
+
+            self.relaxed_edges += children_indptr[node + 1] - children_indptr[node]
+            for k in range(children_indptr[node], children_indptr[node + 1]):
+                child = children_indices[k]
+                if settle_position[child] != -1 or not is_viable[child]:
+                    continue
+                if h_score is not None and h_score[child] == math.inf:
+                    continue
+                if constraints is not None and child in constraints and node not in constraints[child]:
+                    continue
+                child_type = node_type[child]
+                if child_type == compiled_graph.OR or (child_type == compiled_graph.AND and necessary_parents[child] == 0):
+                    tentative_g_score = g_score[node] + costs[child]
+                    if tentative_g_score >= g_score[child]:
+                        if tentative_g_score == g_score[child] and node < predecessors[child][0]:
+                            predecessors[child] = [node]
+                        continue
+                    predecessors[child] = [node]
+                elif child_type == compiled_graph.AND:
+                    if not is_necessary[node]:
+                        continue
+                    # The children of the attacker node do not list it as a parent, and only the
+                    # parents are counted by necessary_parent_counts().
+                    parents = parents_indices[parents_indptr[child]:parents_indptr[child + 1]]
+                    if node not in parents:
+                        continue
+                    remaining_parents[child] -= 1
+                    if remaining_parents[child] > 0:
+                        continue
+                    # All necessary parents are settled, the node is reached through all of them.
+                    parents = [parent for parent in parents if is_necessary[parent]]
+                    tentative_g_score = sum(g_score[parent] for parent in parents) + len(parents) * costs[child]
+                    if tentative_g_score == math.inf:
+                        continue
+                    predecessors[child] = parents
+                else:
+                    continue
+                g_score[child] = tentative_g_score
+                heappush(open_set, (tentative_g_score if h_score is None else (tentative_g_score + h_score[child], tentative_g_score), child))
+                pushes += 1
+            # The children of the target are relaxed too, so the search can be resumed.
+            if node == target_node:
+                self.heap_pushes += pushes
+                return True
+        self.heap_pushes += pushes
+        return target_node is None
+
+    def attack_subgraph(self, target_node):
+        """
+        Extract the attack subgraph of a settled node by following the predecessors iteratively.
+        Steps that are shared by several branches of the subgraph are included and paid once.
+
+        Parameters:
+        - target_node: The index of a settled node.
+
+        Returns:
+        - cost: The cost of the attack subgraph, the sum of the costs of all its edges and start nodes.
+        - nodes: The node indices of the subgraph in settle order, the start nodes first.
+        - edges: A dictionary mapping node indices to the list of their child indices in the subgraph.
+        """
+        predecessors = self.predecessors
+        in_subgraph = {target_node}
+        stack = [target_node]
+        while stack:
+            node = stack.pop()
+            for parent in predecessors[node] or ():
+                if parent not in in_subgraph:
+                    in_subgraph.add(parent)
+                    stack.append(parent)
+
+        nodes = sorted(in_subgraph, key=self.settle_position.__getitem__)
+        cost, edges = self.subgraph_edges(nodes)
+        return cost, nodes, edges
+
+    def subgraph_edges(self, nodes):
+        """
+        Collect the predecessor edges of settled nodes whose predecessors are all in the nodes.
+
+        Parameters:
+        - nodes: The node indices.
+
+        Returns:
+        - cost: The sum of the costs of all edges and start nodes.
+        - edges: A dictionary mapping node indices to the list of their child indices.
+        """
+        costs = self.view.cost
+        predecessors = self.predecessors
+        cost = 0
+        edges = {}
+        for node in nodes:
+            if predecessors[node] is None:
+                cost += costs[node]
+            for parent in predecessors[node] or ():
+                edges.setdefault(parent, []).append(node)
+                cost += costs[node]
+        return cost, edges
+
+
+def budget_region(graph, start_nodes, attacker_cost_budget, stats=None):
+    """
+    Find every node the attacker can reach within the cost budget. The nodes are settled once,
+    at their minimal cost, by the AND/OR search (see AndOrSearch), which stops at the budget, so
+    the query is O((V+E) log V) whatever the budget.
+
+    Parameters:
+    - graph: A CompiledAttackGraph instance.
+    - start_nodes: The index of the node the attacker starts from, or a list of indices.
+    - attacker_cost_budget: The cost budget.
+    - stats: Optional instrumentation.SimulationStats instance, the search counters are added to it.
+
+    Returns:
+    - total_cost: The cost of the attack subgraph that reaches the whole region, every edge paid once.
+    - nodes: The node indices of the region in order of cost, the start nodes first.
+    - costs: A dictionary with the node indices as keys and their minimal cost as values.
+    - edges: A dictionary mapping node indices to the list of their child indices in the region.
+    """
+    search = AndOrSearch(graph, start_nodes)
+    search.run(max_cost=attacker_cost_budget)
+    if stats is not None:
+        stats.count_search(search)
+    nodes = search.settle_order
+
+    total_cost, edges = search.subgraph_edges(nodes)
+    return total_cost, nodes, {node: search.g_score[node] for node in nodes}, edges
+
+
+def repair_search(base_search, graph, affected_nodes, constraints=None):
+    """
+    Update a completed search after the viability, necessity or costs of some nodes changed,
+    without searching the rest of the graph again.
+
+    The cost of a node only depends on its ancestors, so the nodes that are not descendants of a
+    changed node keep their settled costs and predecessors. Only the affected nodes are searched
+    again, starting from the edges of their settled parents outside of them.
+
+    Parameters:
+    - base_search: An AndOrSearch run to completion, without h_score.
+    - graph: The changed CompiledAttackGraph, with the same nodes and edges as the graph of the base search.
+    - affected_nodes: The changed nodes and all their descendants, as a set of node indices.
+    - constraints: Optional constraints of the new search, see AndOrSearch. Nodes whose
+                   constraints differ from the base search must be affected, unless their
+                   predecessors in the base search are still allowed.
+
+    Returns:
+    - search: A new AndOrSearch run to completion on the changed graph. Its expanded_nodes is the
+              number of settled nodes, and resettled_nodes the number of affected nodes it settled.
+    """
+    search = AndOrSearch(graph, [], constraints=constraints)
+    search.start_nodes = base_search.start_nodes
+    view = search.view
+    costs = view.cost
+    node_type = view.node_type
+    is_necessary = view.is_necessary
+    is_viable = view.is_viable
+    parents_indptr = view.parents_indptr
+    parents_indices = view.parents_indices
+
+    # Keep the state of the nodes that are not affected.
+    g_score = search.g_score
+    settle_position = search.settle_position
+    for node in range(len(graph)):
+        if node not in affected_nodes:
+            g_score[node] = base_search.g_score[node]
+            search.predecessors[node] = base_search.predecessors[node]
+            settle_position[node] = base_search.settle_position[node]
+    search.expanded_nodes = base_search.expanded_nodes
+
+    # The children of the attacker node do not list it as a parent, so the edges from the start
+    # nodes are collected from their children.
+    start_parents = _start_parents(graph, search.start_nodes)
+
+    # Relax the edges into the affected nodes from their settled parents.
+    for node in affected_nodes:
+        if node in search.start_nodes:
+            g_score[node] = costs[node]
+            search.push(node, costs[node])
+            continue
+        if not is_viable[node] or node_type[node] not in (compiled_graph.OR, compiled_graph.AND):
+            continue
+        parents = [parents_indices[j] for j in range(parents_indptr[node], parents_indptr[node + 1])]
+        allowed = constraints.get(node) if constraints is not None else None
+        if node_type[node] == compiled_graph.OR or search.necessary_parents[node] == 0:
+            # A start node can also be a parent, each edge is relaxed once.
+            for parent in dict.fromkeys(parents + start_parents.get(node, [])):
+                if settle_position[parent] == -1 or (allowed is not None and parent not in allowed):
+                    continue
+                tentative_g_score = g_score[parent] + costs[node]
+                if tentative_g_score < g_score[node] or (tentative_g_score == g_score[node] and parent < search.predecessors[node][0]):
+                    g_score[node] = tentative_g_score
+                    search.predecessors[node] = [parent]
+        else:
+            # Only the parents are counted by necessary_parent_counts(), like in AndOrSearch.run().
+            search.remaining_parents[node] -= sum(1 for parent in parents if settle_position[parent] != -1 and is_necessary[parent]
+                                                  and (allowed is None or parent in allowed))
+            if search.remaining_parents[node] > 0:
+                continue
+            necessary_parents = [parent for parent in parents if is_necessary[parent]]
+            g_score[node] = sum(g_score[parent] for parent in necessary_parents) + len(necessary_parents) * costs[node]
+            search.predecessors[node] = necessary_parents
+        if g_score[node] < math.inf:
+            search.push(node, g_score[node])
+    search.run()
+
+    # Number the settled nodes densely again, in settle order.
+    search.resettled_nodes = search.expanded_nodes - base_search.expanded_nodes
+    settled_nodes = sorted((node for node in range(len(graph)) if settle_position[node] != -1), key=settle_position.__getitem__)
+    for position, node in enumerate(settled_nodes):
+        settle_position[node] = position
+    search.settle_order = settled_nodes
+    search.expanded_nodes = len(settled_nodes)
+    return search
+
+
+def _start_parents(graph, start_nodes):
+    start_parents = {}
+    for start_node in start_nodes:
+        for child in graph.children(start_node).tolist():
+            start_parents.setdefault(child, []).append(start_node)
+    return start_parents
+
+
+def cheapest_attacks(graph, start_nodes, target_node):
+    """
+    Generate the distinct attacks on the target node in order of cost, cheapest first, with the
+    partitioning of Lawler and Yen extended to AND/OR graphs (the k shortest hyperpaths of
+    Nielsen, Andersen and Pretolani). Stop iterating to stop the search, e.g. with itertools.islice().
+
+    Every attack is an attack subgraph (see AndOrSearch.attack_subgraph()) in which each node is
+    entered through one parent, or through all necessary parents for 'and' nodes. After an attack
+    is generated, one subproblem is made per node n of the attack: the nodes after n keep their
+    parents in the attack and n may not be entered the way it is in the attack. The subproblems
+    share no attack, and together hold every attack except the generated one. The search of a
+    subproblem is repaired from the search of its attack (see repair_search()), so only the
+    descendants of n are searched again.
+
+    The cost of an attack is the cost of its attack subgraph, with every step paid once, like the
+    cost of AndOrSearch.attack_subgraph(). The search of a subproblem finds its attack with the
+    lowest search cost (see AndOrSearch), and the attacks of the subproblems found so far are
+    generated cheapest first, so the first attack is the one of the search without constraints.
+    When the branches of the attacks do not share steps the two costs are equal and the attacks
+    are generated in order of cost. Otherwise a later attack can cost less than an earlier one:
+    finding the attacks in order of the cost with shared steps paid once is NP-hard.
+
+    Parameters:
+    - graph: A CompiledAttackGraph instance.
+    - start_nodes: The index of the node the attacker starts from, or a list of indices.
+    - target_node: The index of the target node.
+
+    Returns:
+    - attacks: A generator of (cost, nodes, edges) tuples like AndOrSearch.attack_subgraph().
+    """
+    search = AndOrSearch(graph, start_nodes, constraints={})
+    search.run()
+    start_parents = _start_parents(graph, search.start_nodes)
+    # Heap of (subgraph cost, search cost, counter, search, attack) entries, one per subproblem.
+    candidates = []
+    counter = 0
+    if search.is_settled(target_node) and search.g_score[target_node] < math.inf:
+        attack = search.attack_subgraph(target_node)
+        heapq.heappush(candidates, (attack[0], search.g_score[target_node], counter, search, attack))
+    while candidates:
+        _, _, _, search, (cost, nodes, edges) = heapq.heappop(candidates)
+        yield cost, nodes, edges
+
+        constraints = dict(search.constraints)
+        # From the target back, so every fixed node is a part of all attacks of the later subproblems.
+        for node in reversed(nodes):
+            predecessors = search.predecessors[node]
+            if predecessors is None:
+                continue
+            # Subproblem: the nodes after this one are fixed, and this one is entered another way.
+            if len(predecessors) == 1:
+                allowed = constraints.get(node)
+                if allowed is None:
+                    allowed = set(graph.parents(node).tolist()) | set(start_parents.get(node, []))
+                forbidden_constraints = {**constraints, node: allowed - {predecessors[0]}}
+            else:
+                forbidden_constraints = {**constraints, node: set()}
+            subproblem = repair_search(search, graph, descendants(graph, [node]), forbidden_constraints)
+            if subproblem.is_settled(target_node) and subproblem.g_score[target_node] < math.inf:
+                counter += 1
+                attack = subproblem.attack_subgraph(target_node)
+                heapq.heappush(candidates, (attack[0], subproblem.g_score[target_node], counter, subproblem, attack))
+            constraints[node] = set(predecessors)
+
+
+def descendants(graph, nodes):
+    """
+    Get the nodes and all their descendants.
+
+    Parameters:
+    - graph: A CompiledAttackGraph instance.
+    - nodes: An iterable of node indices.
+
+    Returns:
+    - descendants: A set of node indices.
+    """
+    view = graph.scalar_view()
+    children_indptr, children_indices = view.children_indptr, view.children_indices
+    found = set(nodes)
+    stack = list(found)
+    while stack:
+        node = stack.pop()
+        for k in range(children_indptr[node], children_indptr[node + 1]):
+            child = children_indices[k]
+            if child not in found:
+                found.add(child)
+                stack.append(child)
+    return found
+
+
+class BidirectionalSearch:
+
+    def __init__(self, graph, start_nodes, target_node):
+        """
+        Bidirectional search for the cheapest attack on one target node. A forward AND/OR search
+        (see AndOrSearch) from the start nodes and a backward Dijkstra search over the parents
+        from the target meet in the middle, so each side only settles the nodes near its own
+        end, instead of the forward search settling every node cheaper than the target.
+
+        The backward search follows the part of the attack where every node is entered through
+        one parent: an 'or' node, or an 'and' node without necessary parents, is expanded to its
+        parents with the cost of the cheapest such chain to the target. An 'and' join needs all
+        its necessary parents, so the backward search stops at it and leaves it to the forward
+        search. An attack is then the attack subgraph of a forward node followed by a chain to the
+        target, and the searches stop when neither side can find a cheaper one, so the attack has
+        the search cost of the forward search alone.
+
+        The speedup is limited to graphs where the attacks on the target are mostly 'or' steps.
+        The backward search does not cross 'and' joins, and an attack through a join that the
+        forward search has not settled can only be bounded by the forward cost, so once the
+        backward frontier reaches the joins the search continues as the forward search and
+        expands about as many nodes as AndOrSearch. If the target itself is an 'and' join, it is
+        the forward search from the start.
+
+        Parameters:
+        - graph: A CompiledAttackGraph instance.
+        - start_nodes: The index of the node the attacker starts from, or a list of indices.
+        - target_node: The index of the target node.
+        """
+        self.graph = graph
+        self.view = graph.scalar_view()
+        self.forward = AndOrSearch(graph, start_nodes)
+        self.target_node = target_node
+        size = len(graph)
+
+        # The cost of the cheapest chain from each node to the target, without the cost of the
+        # node, and the next node of that chain.
+        self.backward_cost = [math.inf] * size
+        self.successors = [None] * size
+        self.backward_settled = [False] * size
+        self.backward_expanded_nodes = 0
+        # Nodes settled by both searches together.
+        self.expanded_nodes = 0
+        # Heap of (backward cost, node) entries with lazy deletion, like AndOrSearch.open_set.
+        self.backward_open_set = []
+        # The 'and' joins settled by the backward search, as (backward cost, node) heap entries.
+        self.joins = []
+        # The children of the attacker node do not list it as a parent.
+        self.start_parents = _start_parents(graph, self.forward.start_nodes)
+
+        # The search cost of the cheapest attack found so far, and the node where the attack
+        # subgraph of the forward search meets the chain to the target.
+        self.cost = math.inf
+        self.meeting_node = None
+        self.backward_cost[target_node] = 0
+        self.backward_open_set.append((0, target_node))
+        self._meet(target_node)
+
+    def _meet(self, node):
+        cost = self.forward.g_score[node] + self.backward_cost[node]
+        if cost < self.cost:
+            self.cost = cost
+            self.meeting_node = node
+
+    def run(self):
+        """
+        Run both searches until the cheapest attack on the target is found, expanding the side
+        with the lower cost first.
+
+        Returns:
+        - bool: True if the target node can be reached.
+        """
+        forward = self.forward
+        backward_open_set = self.backward_open_set
+        joins = self.joins
+        while True:
+            # A forward node that is not settled costs at least forward_cost, so an attack not
+            # found yet costs at least forward_cost plus the cost of a backward node that is not
+            # settled, or of a join that the forward search has not settled.
+            forward_cost = forward.open_priority()
+            if forward_cost == math.inf:
+                break
+            while joins and forward.is_settled(joins[0][1]):
+                heapq.heappop(joins)
+            while backward_open_set and self.backward_settled[backward_open_set[0][1]]:
+                heapq.heappop(backward_open_set)
+            backward_cost = backward_open_set[0][0] if backward_open_set else math.inf
+            join_cost = joins[0][0] if joins else math.inf
+            if forward_cost + min(backward_cost, join_cost) >= self.cost:
+                break
+            # Only the forward search raises the bound of a join.
+            if forward_cost <= backward_cost or join_cost < backward_cost:
+                self._forward_step(forward_cost)
+            else:
+                self._backward_step()
+        if self.cost < math.inf and not forward.is_settled(self.meeting_node):
+            forward.run(self.meeting_node)
+        self.expanded_nodes = forward.expanded_nodes + self.backward_expanded_nodes
+        return self.cost < math.inf
+
+    def _forward_step(self, cost):
+        """
+        Settle the forward nodes of the lowest cost, and meet the backward search at them and at
+        the children they reached.
+        """
+        forward = self.forward
+        children_indptr = self.view.children_indptr
+        children_indices = self.view.children_indices
+        backward_cost = self.backward_cost
+        settled = len(forward.settle_order)
+        forward.run(max_cost=cost)
+        for node in forward.settle_order[settled:]:
+            if backward_cost[node] < math.inf:
+                self._meet(node)
+            for k in range(children_indptr[node], children_indptr[node + 1]):
+                child = children_indices[k]
+                if backward_cost[child] < math.inf:
+                    self._meet(child)
+
+    def _backward_step(self):
+        """
+        Settle the backward node of the lowest cost and expand it to its parents, unless it is an
+        'and' join or a start node.
+        """
+        view = self.view
+        cost, node = heapq.heappop(self.backward_open_set)
+        self.backward_settled[node] = True
+        self.backward_expanded_nodes += 1
+        if not view.is_viable[node] or node in self.forward.start_nodes:
+            return
+        node_type = view.node_type[node]
+        if node_type == compiled_graph.AND and self.forward.necessary_parents[node] > 0:
+            heapq.heappush(self.joins, (cost, node))
+            return
+        if node_type not in (compiled_graph.OR, compiled_graph.AND):
+            return
+
+        parents_indptr = view.parents_indptr
+        parents_indices = view.parents_indices
+        backward_cost = self.backward_cost
+        parent_cost = cost + view.cost[node]
+        parents = [parents_indices[j] for j in range(parents_indptr[node], parents_indptr[node + 1])]
+        for parent in parents + self.start_parents.get(node, []):
+            if parent_cost < backward_cost[parent] and not self.backward_settled[parent]:
+                backward_cost[parent] = parent_cost
+                self.successors[parent] = node
+                heapq.heappush(self.backward_open_set, (parent_cost, parent))
+                self._meet(parent)
+
+    def attack_subgraph(self):
+        """
+        Extract the cheapest attack on the target after run() returned True: the attack subgraph
+        of the forward search, followed by the chain from it to the target. Steps are paid once.
+
+        The chain is followed back from the target. Each node of the chain is entered from the
+        parent with the lowest index among its parents on a cheapest attack, like in the forward
+        search, so the attack is the one that AndOrSearch extracts. A parent with a lower index
+        than the one of the chain that found the attack is only on a cheapest attack if its
+        backward cost ties, and then the forward search is run up to its cost to check it.
+
+        Returns:
+        - cost: The cost of the attack subgraph, see AndOrSearch.attack_subgraph().
+        - nodes: The node indices of the subgraph, the start nodes first and the target last.
+        - edges: A dictionary mapping node indices to the list of their child indices in the subgraph.
+        """
+        forward = self.forward
+        view = self.view
+        costs = view.cost
+        parents_indptr = view.parents_indptr
+        parents_indices = view.parents_indices
+        backward_cost = self.backward_cost
+
+        # The chain that found the attack, from the meeting node to the target.
+        chain_parent = {}
+        node = self.meeting_node
+        while node != self.target_node:
+            chain_parent[self.successors[node]] = node
+            node = self.successors[node]
+
+        chain = []
+        node = self.target_node
+        while not forward.is_settled(node):
+            # The node is on the chain, so its cost is known and it is entered from a parent of this cost.
+            parent_cost = self.cost - backward_cost[node] - costs[node]
+            parent = chain_parent[node]
+            parents = [parents_indices[j] for j in range(parents_indptr[node], parents_indptr[node + 1])]
+            for candidate in sorted(parents + self.start_parents.get(node, [])):
+                if candidate >= parent:
+                    break
+                if backward_cost[candidate] != backward_cost[node] + costs[node]:
+                    continue
+                if not forward.is_settled(candidate) and forward.open_priority() <= parent_cost:
+                    forward.run(max_cost=parent_cost)
+                if forward.is_settled(candidate) and forward.g_score[candidate] == parent_cost:
+                    parent = candidate
+                    break
+            chain.append((parent, node))
+            node = parent
+        self.expanded_nodes = forward.expanded_nodes + self.backward_expanded_nodes
+
+        cost, nodes, edges = forward.attack_subgraph(node)
+        for parent, child in reversed(chain):
+            nodes.append(child)
+            edges.setdefault(parent, []).append(child)
+            cost += costs[child]
+        return cost, nodes, edges
+
+
+class AttackCostMap:
+
+    def __init__(self, graph, start_nodes, search=None):
+        """
+        Cost of the cheapest attack from the start nodes to every node in the attack graph.
+
+        The AND/OR search is run to completion once. Afterwards the cost of any target is a
+        lookup, and its attack subgraph is extracted in time proportional to its size. The
+        cost of a target whose attack is a plain path (no 'and' join with more than one
+        necessary parent) is the settled search cost and is answered in constant time. Other
+        costs are computed from the extracted subgraph on the first lookup and cached.
+
+        Parameters:
+        - graph: A CompiledAttackGraph instance.
+        - start_nodes: The index of the node the attacker starts from, or a list of indices.
+        - search: Optional AndOrSearch from the start nodes that is already run to completion,
+                  e.g. from repair_search().
+        """
+        self.graph = graph
+        if search is None:
+            search = AndOrSearch(graph, start_nodes)
+            search.run()
+        self.search = search
+        self.start_nodes = self.search.start_nodes
+        self.settled_cost = np.array(self.search.g_score, dtype=np.float64)
+        self.settled_cost[np.array(self.search.settle_position) == -1] = math.inf
+        self.has_join = self._find_joins()
+        self._subgraph_costs = {}
+
+    def _find_joins(self):
+        """
+        Mark the nodes whose attack subgraph contains an 'and' node reached through more than
+        one parent. Nodes are visited in settle order, so the predecessors are marked first.
+        """
+        search = self.search
+        has_join = [False] * len(self.graph)
+        for node in search.settle_order:
+            parents = search.predecessors[node]
+            if parents:
+                has_join[node] = len(parents) > 1 or has_join[parents[0]]
+        return has_join
+
+    def is_reachable(self, target_node):
+        """
+        Return True if the attacker can reach the target node index.
+        """
+        return self.search.settle_position[target_node] != -1
+
+    def cost(self, target_node):
+        """
+        Get the cost of the cheapest attack on a node.
+
+        Parameters:
+        - target_node: The target node index.
+
+        Returns:
+        - cost: The cost of the attack subgraph, math.inf if the node can not be reached.
+        """
+        if not self.is_reachable(target_node):
+            return math.inf
+        if not self.has_join[target_node]:
+            return self.search.g_score[target_node]
+        if target_node not in self._subgraph_costs:
+            self._subgraph_costs[target_node] = self.search.attack_subgraph(target_node)[0]
+        return self._subgraph_costs[target_node]
+
+    def attack_subgraph(self, target_node):
+        """
+        Get the attack subgraph of the cheapest attack on a node, see AndOrSearch.attack_subgraph().
+
+        Parameters:
+        - target_node: The target node index.
+
+        Returns:
+        - (cost, nodes, edges): The attack subgraph, or None if the node can not be reached.
+        """
+        if not self.is_reachable(target_node):
+            return None
+        return self.search.attack_subgraph(target_node)
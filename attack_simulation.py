@@ -1,17 +1,27 @@
 import maltoolbox.attackgraph.query
 import maltoolbox
 import maltoolbox.attackgraph.attackgraph
-from py2neo import Node, Relationship
-from collections import deque
-import heapq
-import random
+import math
+import numpy as np
 
 import help_functions
 import constants
+import and_or_search
+import attack_surface
+import compiled_graph
+import defense_analysis
+import exporters
+import heuristics
+import instrumentation
+import monte_carlo
+import neo4j_writer
+import query_engine
+import relevance
+import traversal
 
 class AttackSimulation:
     
-    def __init__(self, attackgraph_instance, attacker, use_ttc=True):
+    def __init__(self, attackgraph_instance, attacker, use_ttc=True, seed=None, ttc_statistic=None, stats=None, prune_unreachable=False, prune_to_target=False):
         """
         Initialize the AttackSimulation instance.
 
@@ -19,18 +29,54 @@ class AttackSimulation:
         - attackgraph_instance: An instance of the AttackGraph class.
         - attacker: An instance of the Attacker class.
         - use_ttc: Boolean indicating whether Time-To-Compromise (TTC) is used. Default is True.
+        - seed: Optional seed of the TTC samples, the same seed gives the same costs.
+        - ttc_statistic: Optional, calculate the TTC costs without sampling: "mean" for the expected
+                         value of the ttc distribution, or a number in [0, 1) for that quantile.
+        - stats: Optional instrumentation.SimulationStats instance that records counters and phase
+                 timings, see set_stats(). Default is no instrumentation.
+        - prune_unreachable: Post-generation pruning of the attack graph: only index, cost and compile
+                             the attack steps the attacker can reach from attacker.node, see
+                             compiled_graph.reachable_nodes(). The attack graph instance is still the
+                             full graph generated by mal-toolbox, so the generation time is the same,
+                             but the memory and setup time of the simulation shrink when the attacker
+                             reaches a small part of a large attack graph. The start node must then
+                             stay within the reachable attack steps, and bfs(), which ignores the
+                             attack graph logic, only explores the reachable ones.
+        - prune_to_target: Restrict dijkstra() and random_path() with a target to the attack steps
+                           that are descendants of the start node and ancestors of the target, see
+                           relevance.TargetRelevance. The statistics of the last pruned query are
+                           stored in self.pruning_stats.
         """
         self.attackgraph_instance = attackgraph_instance
-        self.attackgraph_dictionary = {node.id: node for node in attackgraph_instance.nodes}  # Create a dictionary for quick access to nodes by id
+        self.stats = stats or instrumentation.DISABLED
+        with self.stats.phase("graph_build"):
+            self.nodes = compiled_graph.reachable_nodes([attacker.node]) if prune_unreachable else attackgraph_instance.nodes
+        self.attackgraph_dictionary = {node.id: node for node in self.nodes}  # Create a dictionary for quick access to nodes by id
         self.attacker = attacker
         self.start_node = attacker.node.id
         self.target_node = None
         self.attacker_cost_budget = None
         self.use_ttc = use_ttc
+        self.seed = seed
+        self.ttc_statistic = ttc_statistic
         self.horizon = []
         self.visited = []
-        self.path = {node.id: [] for node in attackgraph_instance.nodes}
-        self.cost_dictionary = self.get_costs()
+        # The path only holds the attack steps with children in the path, see publish_result().
+        self.path = {}
+        self.initial_reached_attack_steps = list(attacker.reached_attack_steps)
+        with self.stats.phase("costs"):
+            self.cost_dictionary = self.get_costs()
+        with self.stats.phase("graph_build"):
+            self.graph = compiled_graph.CompiledAttackGraph(self.nodes, self.cost_dictionary)
+        self.heuristic = None
+        self.prune_to_target = prune_to_target
+        self.relevance = None
+        self.pruning_stats = None
+        self.cost_map = None
+        self.engine = None
+        self.expanded_nodes = 0
+        self.sink = None
+        self.region_costs = {}
 
     def set_target_node(self, target_node_id):
         """
@@ -50,6 +96,24 @@ class AttackSimulation:
         """
         self.start_node = start_node_id
 
+    def set_stats(self, stats):
+        """
+        Set the instrumentation of the simulation.
+
+        Parameters:
+        - stats: An instrumentation.SimulationStats instance, or None to disable the instrumentation.
+        """
+        self.stats = stats or instrumentation.DISABLED
+
+    def set_sink(self, sink):
+        """
+        Set the sink for the Neo4j uploads.
+
+        Parameters:
+        - sink: A background_sink.BackgroundSink instance, or None to upload in the calling thread.
+        """
+        self.sink = sink
+
     def set_attacker_cost_budget(self, attacker_cost_budget):
         """
         Set the attacker's cost budget for the simulation.
@@ -92,25 +156,32 @@ class AttackSimulation:
         dict = {}
         for i, node in enumerate(self.horizon):
             dict[i+1] = [node.id, node.type, str(maltoolbox.attackgraph.query.is_node_traversable_by_attacker(node, self.attacker))]
+        self.stats.count("traversability_checks", len(self.horizon))
         return dict
 
     def step_by_step_attack_simulation(self, neo4j_graph_connection):
         """
         Traverse the attack graph step by step. 
+
+        The path and horizon are uploaded to Neo4j at the start, and after every compromised
+        attack step only the changes are written (see neo4j_writer.Neo4jSync).
         
         Parameters:
         - neo4j_graph_connection: The Neo4j Graph instance.
         """
         self.attacker.reached_attack_steps = [self.attackgraph_dictionary[self.start_node]]
-        self.horizon = maltoolbox.attackgraph.query.get_attack_surface(self.attackgraph_instance, self.attacker)
+        surface = attack_surface.AttackSurface(self.graph, self.graph.index[self.start_node])
+        self.horizon = [self.attackgraph_dictionary[node_id] for node_id in self.graph.ids(surface.horizon)]
         self.visited = self.attacker.reached_attack_steps
 
         # Add all children nodes to the path attribute.     
-        for node in self.attackgraph_instance.nodes:
+        for node in self.nodes:
             self.path[node.id] = node.children.copy()
 
         # Upload attacker path and horizon.
-        self.upload_graph_to_neo4j(neo4j_graph_connection, add_horizon=True)
+        neo4j_sync = neo4j_writer.Neo4jSync(neo4j_writer.Neo4jBatchWriter(neo4j_graph_connection, stats=self.stats))
+        self.write_to_neo4j(neo4j_sync.reset)
+        self.write_to_neo4j(neo4j_sync.update, *self.get_neo4j_graph(add_horizon=True))
             
         # Begin step by step attack simulation.
         while True:
@@ -132,15 +203,16 @@ class AttackSimulation:
                 attacked_node = self.attackgraph_dictionary[attacked_node_id]
 
                 # Update horizon if the node can be visited.
-                if attacked_node in self.horizon:
+                if self.graph.index[attacked_node_id] in surface:
                     # Update the path.
                     self.attacker.reached_attack_steps.append(attacked_node)
                     self.visited = self.attacker.reached_attack_steps
-                    self.horizon = maltoolbox.attackgraph.query.get_attack_surface(self.attackgraph_instance, self.attacker)
-                    self.horizon = [node for node in self.horizon if node != attacked_node]
+                    surface.compromise(self.graph.index[attacked_node_id])
+                    self.stats.count("attack_surface_updates")
+                    self.horizon = [self.attackgraph_dictionary[node_id] for node_id in self.graph.ids(surface.horizon)]
                    
-                    # Upload attacker path and horizon.
-                    self.upload_graph_to_neo4j(neo4j_graph_connection, add_horizon=True)
+                    # Upload the changes of the attacker path and horizon.
+                    self.write_to_neo4j(neo4j_sync.update, *self.get_neo4j_graph(add_horizon=True))
                     print("Attack step was compromised.")
                 else:
                     print("The node does not exist in the attack surface")
@@ -150,34 +222,42 @@ class AttackSimulation:
                 # Return.
                 return
     
-    def create_neo4j_node(self, neo4j_graph_connection, set_of_nodes, neo4j_node_dict, is_horizon_node=False):
-        for node in set_of_nodes:
-            if not node.id in neo4j_node_dict.keys():
-                asset_and_id = node.id.split(':')
-                asset_and_id = asset_and_id[0] + ':' + asset_and_id[1]
-                neo4j_node = Node(
-                    str(asset_and_id),
-                    str(is_horizon_node),
-                    is_horizon_node = is_horizon_node,
-                    name = node.name,
-                    full_name = node.id,
-                    type = node.type,
-                    ttc = str(node.ttc),
-                    cost = str(self.cost_dictionary[node.id]) if node.name != "firstSteps" else None,
-                    is_necessary = str(node.is_necessary),
-                    is_viable = str(node.is_viable),
-                )
-                neo4j_graph_connection.create(neo4j_node)
-                neo4j_node_dict[node.id] = neo4j_node
-        return neo4j_node_dict
-        
-    def upload_graph_to_neo4j(self, neo4j_graph_connection, add_horizon=False):
+    def get_neo4j_node(self, node, is_horizon_node=False):
+        """
+        Get the labels and properties of the Neo4j node of an attack step.
+
+        Parameters:
+        - node: The AttackGraphNode instance.
+        - is_horizon_node: Boolean indicating whether the node is in the horizon.
+
+        Returns:
+        - labels: The labels, the asset and its id (e.g. 'Application:0') and is_horizon_node.
+        - properties: A dictionary with the properties of the node.
+        """
+        asset_and_id = node.id.split(':')
+        asset_and_id = asset_and_id[0] + ':' + asset_and_id[1]
+        properties = {
+            "is_horizon_node": is_horizon_node,
+            "name": node.name,
+            "full_name": node.id,
+            "type": node.type,
+            "ttc": str(node.ttc),
+            "cost": str(self.cost_dictionary[node.id]) if node.name != "firstSteps" else None,
+            "is_necessary": str(node.is_necessary),
+            "is_viable": str(node.is_viable)
+            }
+        return [str(asset_and_id), str(is_horizon_node)], properties
+
+    def upload_graph_to_neo4j(self, neo4j_graph_connection, add_horizon=False, batch_size=neo4j_writer.DEFAULT_BATCH_SIZE):
         """
         Uploads the traversed path and attacker horizon (optional) by the attacker to the Neo4j database.
+        The database is cleared first, and the nodes and relationships are written in batches with
+        neo4j_writer.Neo4jBatchWriter.
 
         Parameters:
         - neo4j_graph_connection: The Neo4j Graph instance.
         - add_horizon: Flag which if True, adds on the horizon to Neo4j.
+        - batch_size: The maximum number of nodes or relationships written per transaction.
 
         Notes:
         - The function assumes the existence of the following variables:
@@ -186,218 +266,435 @@ class AttackSimulation:
             - self.attackgraph_dictionary: A dictionary representing the attack graph.
             - self.path: A dictionary containing the path.
         """
-        
-        nodes = {}
-        neo4j_graph_connection.delete_all()
-       
-       # Build attack steps for Neo4j from all visited nodes.
-        nodes = self.create_neo4j_node(neo4j_graph_connection, self.visited, nodes)
+        writer = neo4j_writer.Neo4jBatchWriter(neo4j_graph_connection, batch_size, self.stats)
+        self.write_to_neo4j(writer.replace_all, *self.get_neo4j_graph(add_horizon))
+
+    def write_to_neo4j(self, write, *args):
+        """
+        Call a Neo4j write function, on the background thread of the sink if a sink is set (see
+        set_sink()), so the simulation does not wait for the upload.
+        """
+        if self.sink is None:
+            self.timed_write(write, *args)
+        else:
+            self.sink.submit(self.timed_write, write, *args)
+
+    def timed_write(self, write, *args):
+        with self.stats.phase("upload"):
+            write(*args)
+
+    def get_neo4j_graph(self, add_horizon=False):
+        """
+        Build the Neo4j nodes and relationships of the traversed path and attacker horizon (optional).
+
+        Parameters:
+        - add_horizon: Flag which if True, adds on the horizon.
+
+        Returns:
+        - nodes: A dictionary with attack step ids as keys and (labels, properties) tuples as values.
+        - relationships: A list of (from id, to id) tuples, edges from horizon nodes are left out.
+        """
+        return dict(self.iter_result_nodes(add_horizon)), list(self.iter_result_relationships(add_horizon))
+
+    def get_result_node_ids(self, add_horizon=False):
+        """
+        Map the ids of the visited nodes and horizon nodes (optional) to is_horizon_node.
+        """
+        node_ids = {}
+        for node in self.visited:
+            node_ids.setdefault(node.id, False)
         if self.horizon and add_horizon:
-            nodes = self.create_neo4j_node(neo4j_graph_connection, self.horizon, nodes, is_horizon_node=True)
+            for node in self.horizon:
+                node_ids.setdefault(node.id, True)
+        return node_ids
+
+    def iter_result_nodes(self, add_horizon=False):
+        """
+        Generate the nodes of the traversed path and attacker horizon (optional) one at a time.
 
-        # Add edges to the attack graph in Neo4j.
+        Parameters:
+        - add_horizon: Flag which if True, adds on the horizon.
+
+        Returns:
+        - nodes: A generator of (attack step id, (labels, properties)) tuples, see get_neo4j_node().
+        """
+        for node_id, is_horizon_node in self.get_result_node_ids(add_horizon).items():
+            yield node_id, self.get_neo4j_node(self.attackgraph_dictionary[node_id], is_horizon_node)
+
+    def iter_result_relationships(self, add_horizon=False):
+        """
+        Generate the edges of the traversed path one at a time, except edges from horizon nodes.
+
+        Parameters:
+        - add_horizon: Flag which if True, adds on the edges to the horizon.
+
+        Returns:
+        - relationships: A generator of (from id, to id) tuples.
+        """
+        node_ids = self.get_result_node_ids(add_horizon)
         for id in self.attackgraph_dictionary.keys():
-            if id in nodes.keys():
-                for link in self.path[id]:
-                    if link.id in nodes.keys():
-                        from_node = nodes[id]
-                        to_node = nodes[link.id]
-                        if (from_node['is_horizon_node'] == False and to_node['is_horizon_node'] == False) or \
-                        (from_node['is_horizon_node'] == False and to_node['is_horizon_node'] == True):
-                            relationship = Relationship(from_node, "Relationship", to_node)
-                            neo4j_graph_connection.create(relationship)
-    
-    def dijkstra(self):
+            if node_ids.get(id) is False:
+                for link in self.path.get(id, ()):
+                    if link.id in node_ids:
+                        yield id, link.id
+
+    def export_result(self, exporter, add_horizon=False, chunk_size=exporters.DEFAULT_CHUNK_SIZE):
         """
-        Find the shortest path between two nodes using Dijkstra's algorithm with added 
-        conditions for processing 'and' nodes.
+        Stream the traversed path and attacker horizon (optional) to a file exporter, e.g. to skip
+        Neo4j in batch runs. The nodes have the same labels and properties as in Neo4j.
+
+        Parameters:
+        - exporter: An exporter from the exporters module, e.g. exporters.JsonlExporter.
+        - add_horizon: Flag which if True, adds on the horizon.
+        - chunk_size: The number of nodes or edges passed to the exporter at a time.
+        """
+        exporters.export(exporter, self.iter_result_nodes(add_horizon), self.iter_result_relationships(add_horizon), chunk_size)
+
+    def dijkstra(self, use_a_star=False, bidirectional=False):
+        """
+        Find the cheapest attack from the start node to the target node with the generalized
+        Dijkstra search for AND/OR graphs (see and_or_search.AndOrSearch). An 'and' node is
+        reached when all its necessary parents are reached, and the path is the deduplicated
+        attack subgraph leading to the target.
         Note: mal-toolbox attack surface is not used in this function!
+
+        If use_a_star is True, the search is an A* search guided by the landmark heuristic
+        (see heuristics.LandmarkHeuristic), which is a lower bound of the cost to the target.
+        If bidirectional is True, a forward search from the start node and a backward search from
+        the target meet in the middle (see and_or_search.BidirectionalSearch), with the same cost.
+        It only expands fewer nodes when the attacks on the target are mostly 'or' steps.
+        The bidirectional search is not pruned with prune_to_target, its backward search only
+        visits ancestors of the target anyway.
+        The number of expanded nodes is stored in self.expanded_nodes, the sum of both searches
+        for the bidirectional search.
+
+        Parameters:
+        - use_a_star: Boolean indicating whether the landmark heuristic is used. Default is False.
+        - bidirectional: Boolean indicating whether the bidirectional search is used, it can not
+                         be combined with use_a_star. Default is False.
         
         Returns:
-        - cost: Total cost of the path.
+        - cost: Total cost of the path, 0 if the target can not be reached.
         """
-        node_ids = list(self.attackgraph_dictionary.keys())
-        open_set = []
-        heapq.heappush(open_set, (0, self.start_node))
-        came_from = {key: [] for key in node_ids}
+        if use_a_star and bidirectional:
+            raise ValueError("The bidirectional search can not use the A* heuristic.")
+        self.reset_result()
+        graph = self.graph
+        start_node = graph.index[self.start_node]
+        target_node = graph.index.get(self.target_node)
+        if target_node is None:
+            return 0
+        if bidirectional:
+            return self.bidirectional_dijkstra(start_node, target_node)
+
+        h_score = None
+        if use_a_star:
+            with self.stats.phase("heuristic"):
+                h_score = self.get_heuristic().estimate(target_node)
+        relevant = self.get_relevant_nodes(start_node, target_node)
+        if relevant is not None:
+            # Nodes with an infinite estimate are not entered by the search.
+            h_score = np.where(relevant, 0 if h_score is None else h_score, math.inf)
+        if h_score is not None:
+            h_score = h_score.tolist()
+        with self.stats.phase("search"):
+            search = and_or_search.AndOrSearch(graph, start_node, h_score)
+            found = search.run(target_node)
+        self.stats.count_search(search)
+        self.expanded_nodes = search.expanded_nodes
+        if not found:
+            return 0
+
+        with self.stats.phase("reconstruction"):
+            cost, nodes, edges = search.attack_subgraph(target_node)
+            self.publish_result(nodes, edges, nodes)
+        return cost
 
-        # The g_score is a map with large values.
-        g_score = dict.fromkeys(node_ids, 10000)
-        g_score[self.start_node] = 0
+    def bidirectional_dijkstra(self, start_node, target_node):
+        with self.stats.phase("search"):
+            search = and_or_search.BidirectionalSearch(self.graph, start_node, target_node)
+            found = search.run()
+        self.stats.count_search(search.forward)
+        self.expanded_nodes = search.expanded_nodes
+        if not found:
+            return 0
+
+        with self.stats.phase("reconstruction"):
+            cost, nodes, edges = search.attack_subgraph()
+            self.publish_result(nodes, edges, nodes)
+        return cost
 
-        # Estimated score between each node and target.
-        h_score = dict.fromkeys(node_ids, 0)
-    
-        # For node n, f_score[n] = g_score[n] + h_score(n). f_score[n] represents our current best guess as to
-        # how cheap a path could be from start to finish if it goes through n.
-        f_score = dict.fromkeys(node_ids, 0)
-        f_score[self.start_node] = h_score[self.start_node]
-        
-        costs = self.cost_dictionary
-        costs_copy = costs.copy()
-        current_node = self.start_node
-        while len(open_set) > 0:
-            # The current_node is the node in open_set having the lowest f_score value.
-            _, current_node = heapq.heappop(open_set)
-
-            # Stop when target node is found.
-            if current_node == self.target_node:
-                self.cost_dictionary = costs_copy
-                return self.reconstruct_path(came_from, current_node, costs_copy)[0]
-
-            # Iterate over the attack surface nodes.
-            current_neighbors = self.attackgraph_dictionary[current_node].children
-            for neighbor in current_neighbors:  
-                tentative_g_score = g_score[current_node] + costs[neighbor.id]
-
-                # Try the neighbor node with a lower g_score than the previous node.
-                if tentative_g_score < g_score[neighbor.id]:
-
-                    # Add the node to the path.
-                    if maltoolbox.attackgraph.query.is_node_traversable_by_attacker(neighbor, self.attacker):
-                        came_from[neighbor.id].append(current_node)
-                        g_score[neighbor.id] = tentative_g_score
-                        f_score[neighbor.id] = tentative_g_score + h_score[neighbor.id] # TODO calculate the h_score for all nodes
-                        self.attacker.reached_attack_steps.append(neighbor)
-                        if neighbor.id not in open_set:
-                            heapq.heappush(open_set, (f_score[neighbor.id], neighbor.id))
-
-                    # If 'and' node was not added to the path,
-                    # update the node cost and keep track of the path.
-                    elif neighbor.type == 'and':
-                        costs[neighbor.id] = tentative_g_score
-                        came_from[neighbor.id].append(current_node)
-
-                # If a necessary 'and' node was not added to the path and g_scores are equal,
-                # update the node cost and keep track of the path.
-                elif neighbor.type == 'and' and self.attackgraph_dictionary[current_node].is_necessary == True:
-                    costs[neighbor.id] = tentative_g_score
-                    came_from[neighbor.id].append(current_node)
-        return 0
-
-    def reconstruct_path(self, came_from, current, costs):
-        """
-        Reconstructs the backwards attack path from the start node to the given node with recursion.
-
-        This method is used in the context of a Djikstra's algorithm to reconstruct
-        the optimal path from the target node to the start node, considering a set
-        of costs associated with each node in the path.
+    def reset_result(self):
+        """
+        Clear the result of the previous algorithm run: the visited nodes, the path, the horizon and
+        the attack steps the attacker reached since the simulation was created. Called at the start
+        of every algorithm, so that running a second query on the same instance gives the same
+        result as on a new instance.
+        """
+        self.visited = []
+        self.path = {}
+        self.horizon = []
+        self.attacker.reached_attack_steps = list(self.initial_reached_attack_steps)
+
+    def query_engine(self):
+        """
+        Get a query_engine.QueryEngine for the attack graph and cost dictionary, to run stateless
+        queries, e.g. from many threads, without changing the simulation. The engine is built on
+        the first call and shares the landmark heuristic with the simulation.
+
+        Return:
+        - engine: A query_engine.QueryEngine instance.
+        """
+        if self.engine is None:
+            self.engine = query_engine.QueryEngine(self.graph, self.heuristic)
+        return self.engine
+
+    def defense_analysis(self):
+        """
+        Get a defense_analysis.DefenseAnalysis from the start node, to see how enabling or disabling
+        defenses changes the attack costs without generating the attack graph again.
+
+        Return:
+        - analysis: A defense_analysis.DefenseAnalysis instance, sharing the cost map of the simulation.
+        """
+        return defense_analysis.DefenseAnalysis(self.graph, self.graph.index[self.start_node], self.get_cost_map())
+
+    def cheapest_attacks(self):
+        """
+        Generate the distinct attacks from the start node on the target node, cheapest first, see
+        and_or_search.cheapest_attacks(). The attacks are found lazily, take the first k with
+        itertools.islice(). The simulation state is not changed.
+
+        Returns:
+        - attacks: A generator of (cost, path) tuples, where the path maps the attack step ids in
+                   the attack subgraph to the ids of their children in it.
+        """
+        graph = self.graph
+        target_node = graph.index.get(self.target_node)
+        if target_node is None:
+            return
+        for cost, nodes, edges in and_or_search.cheapest_attacks(graph, graph.index[self.start_node], target_node):
+            yield cost, {graph.node_ids[node]: graph.ids(edges.get(node, [])) for node in nodes}
+
+    def get_heuristic(self):
+        """
+        Get the landmark heuristic for the attack graph and cost dictionary. The landmarks
+        are precomputed on the first call and reused by all later A* searches.
+
+        Return:
+        - heuristic: A heuristics.LandmarkHeuristic instance.
+        """
+        if self.heuristic is None:
+            self.heuristic = heuristics.LandmarkHeuristic(self.graph)
+        return self.heuristic
+
+    def get_relevance(self):
+        """
+        Get the strongly connected components and the condensed graph of the attack graph, used to
+        prune the searches with prune_to_target. They are computed on the first call.
+
+        Return:
+        - relevance: A relevance.TargetRelevance instance.
+        """
+        if self.relevance is None:
+            self.relevance = relevance.TargetRelevance(self.graph)
+        return self.relevance
+
+    def get_relevant_nodes(self, start_node, target_node):
+        """
+        Mark the attack steps that can be on an attack from the start node on the target node, if
+        prune_to_target is set. The pruning statistics are stored in self.pruning_stats.
 
         Parameters:
-        - came_from: A dictionary mapping nodes to their predecessors in the optimal path.
-        - current: The node for which the path needs to be reconstructed.
-        - costs: A dictionary containing the costs associated with each node.
+        - start_node: The start node index.
+        - target_node: The target node index, or None.
 
         Returns:
-        - cost: The total cost of the reconstructed path.
-        - old_current: The last node in the reconstructed path.
-        """
-        cost = 0
-        visited_set = set()
-        if current != self.start_node:
-            # Reconstruct the path backwards from current until the start node is reached.
-            while current in came_from.keys() and current != self.start_node:
-                old_current = current
-                # Get all parent nodes to current in the path.
-                current = came_from[current]
-                # Condition for 'and' nodes.       
-                if len(current) > 1:
-                    for node in current:
-                        if self.attackgraph_dictionary[node].is_necessary == True:
-                            path_cost, _= self.reconstruct_path(came_from, node, costs)
-                            cost += path_cost + costs[old_current]
-                            self.path[node].append(self.attackgraph_dictionary[old_current])
-                            visited_set.add(old_current)
-                            self.visited.append(self.attackgraph_dictionary[old_current])
-                    break
-                # Condition for 'or' nodes.
-                else:
-                    current = current[0]
-                    if old_current not in visited_set:
-                        visited_set.add(old_current)
-                        self.visited.append(self.attackgraph_dictionary[old_current])
-                        if self.attackgraph_dictionary[old_current] not in self.path[current]:
-                            cost += costs[old_current]
-                    if self.attackgraph_dictionary[old_current] not in self.path[current]:
-                        self.path[current].append(self.attackgraph_dictionary[old_current])
-                
-            self.visited.append(self.attackgraph_dictionary[self.start_node])
-            visited_set.add(self.start_node)
-        return cost, old_current
+        - relevant: A NumPy bool array with the relevant node indices True, or None if the
+                    search is not pruned.
+        """
+        if not self.prune_to_target or target_node is None:
+            return None
+        with self.stats.phase("pruning"):
+            relevant, self.pruning_stats = self.get_relevance().relevant_nodes(start_node, target_node)
+        self.stats.count("pruned_nodes", self.pruning_stats.nodes - self.pruning_stats.relevant_nodes)
+        return relevant
+
+    def get_cost_map(self):
+        """
+        Get the cost of the cheapest attack from the start node to every attack step. The search
+        is run to completion once per start node, see and_or_search.AttackCostMap. The simulation
+        state (visited, path and the attacker's reached attack steps) is not changed.
+
+        Return:
+        - cost_map: An and_or_search.AttackCostMap instance.
+        """
+        start_node = self.graph.index[self.start_node]
+        if self.cost_map is None or self.cost_map.start_nodes != [start_node]:
+            with self.stats.phase("search"):
+                self.cost_map = and_or_search.AttackCostMap(self.graph, start_node)
+            self.stats.count_search(self.cost_map.search)
+        return self.cost_map
+
+    def get_costs_to_targets(self, target_node_ids):
+        """
+        Get the cost of the cheapest attack on each of the target nodes, without a new search per target.
+
+        Parameters:
+        - target_node_ids: An iterable of attack step ids.
+
+        Returns:
+        - costs: A dictionary with the attack step ids as keys and the costs as values.
+                 Attack steps that can not be reached have the cost math.inf.
+        """
+        cost_map = self.get_cost_map()
+        return {node_id: cost_map.cost(self.graph.index[node_id]) for node_id in target_node_ids}
+
+    def get_attack_path_to_target(self, target_node_id):
+        """
+        Get the cheapest attack on a target node from the cost map.
+
+        Parameters:
+        - target_node_id: The attack step id of the target.
+
+        Returns:
+        - cost: The cost of the attack, or None if the target can not be reached.
+        - path: A dictionary mapping the attack step ids in the attack subgraph to the ids of their children in it.
+        """
+        attack_subgraph = self.get_cost_map().attack_subgraph(self.graph.index[target_node_id])
+        if attack_subgraph is None:
+            return None, {}
+        cost, nodes, edges = attack_subgraph
+        node_ids = self.graph.node_ids
+        return cost, {node_ids[node]: self.graph.ids(edges.get(node, [])) for node in nodes}
+
+    def publish_result(self, visited, path, reached_order):
+        """
+        Translate the integer result of an algorithm back to attack graph nodes. This is
+        the only place where the algorithms touch the AttackGraphNode objects.
+
+        Parameters:
+        - visited: A list of visited node indices, appended to self.visited.
+        - path: A dictionary mapping node indices to their child indices in the path,
+                appended to self.path.
+        - reached_order: A list of newly reached node indices, appended to the attacker's
+                         reached attack steps.
+        """
+        node_ids = self.graph.node_ids
+        self.visited.extend(self.attackgraph_dictionary[node_ids[i]] for i in visited)
+        for parent, children in path.items():
+            self.path.setdefault(node_ids[parent], []).extend(self.attackgraph_dictionary[node_ids[i]] for i in children)
+        # Note: mal-toolbox shares the reached attack steps list with the attacker entry points
+        # and the children of the attacker node, so a new list is assigned instead of extending it.
+        self.attacker.reached_attack_steps = self.attacker.reached_attack_steps + [self.attackgraph_dictionary[node_ids[i]] for i in reached_order]
 
     def get_costs(self):
         """
         There is no cost attribute in the attack graph, the attack step costs are calculated separately. 
         If use_ttc is False, an existing json file with costs are loaded as a dictionary. If use_ttc is True,
-        the costs are calculated from samples drawn from the ttc distribution of the attack steps.
+        the costs are calculated from samples drawn from the ttc distribution of the attack steps, or
+        from the closed form of the distribution if a ttc_statistic is set.
 
         Return:
         - cost_dictionary: A dictionary containing all attack step ids as keys, and the cost as values.
         """
         if self.use_ttc == False:
             cost_dictionary = help_functions.load_costs_from_file()
+        elif self.use_ttc == True and self.ttc_statistic is not None:
+            cost_dictionary = self.get_analytic_cost_from_ttc()
         elif self.use_ttc == True:
             cost_dictionary = self.get_cost_from_ttc()
         return cost_dictionary
 
     def get_cost_from_ttc(self):
-        cost_dictionary = {}
-        for attackgraph_node in self.attackgraph_instance.nodes:
-            ttc = attackgraph_node.ttc
-            if ttc == None:
-                cost_dictionary[attackgraph_node.id] = 0
-            elif ttc != None:
-                cost_dictionary[attackgraph_node.id] = help_functions.cost_from_ttc(ttc, 100)
-        return cost_dictionary
+        """
+        Calculate the cost of every attack step as the mean of 100 samples from its ttc distribution.
+        Attack steps without a ttc distribution have cost 0.
+
+        Return:
+        - cost_dictionary: A dictionary containing all attack step ids as keys, and the cost as values.
+        """
+        nodes = self.nodes
+        costs = help_functions.costs_from_ttc([node.ttc for node in nodes], 100, self.seed)
+        return dict(zip([node.id for node in nodes], costs.tolist()))
     
+    def get_analytic_cost_from_ttc(self):
+        """
+        Calculate the cost of every attack step from its ttc distribution without sampling, see
+        help_functions.analytic_costs_from_ttc(). Attack steps without a ttc distribution have cost 0.
+
+        Return:
+        - cost_dictionary: A dictionary containing all attack step ids as keys, and the cost as values.
+        """
+        nodes = self.nodes
+        costs = help_functions.analytic_costs_from_ttc([node.ttc for node in nodes], self.ttc_statistic)
+        return dict(zip([node.id for node in nodes], costs.tolist()))
+
     def random_path(self):
         """
         Generate a random attack path in the attack graph, considering attacker cost budget and/or target node.
 
         This method explores a random path in the attack graph from the start node.
         It uses a random selection strategy among the attack surface nodes, considering the attacker's cost budget
-        and searching for a specific target node if provided.
+        and searching for a specific target node if provided. With prune_to_target, the path only
+        enters attack steps that can lead to the target node.
 
         Returns:
         - cost: The total cost of the random path.
         """
-        self.attacker.reached_attack_steps = [self.attackgraph_dictionary[self.start_node]]
-        self.visited = self.attacker.reached_attack_steps
-        self.horizon = maltoolbox.attackgraph.query.get_attack_surface(self.attackgraph_instance, self.attacker)       
-        horizon_set = {node.id for node in self.horizon}
-        visited_set = {node.id for node in self.visited}
-
-        costs = self.cost_dictionary
-        cost = 0
-        while len(horizon_set-visited_set) > 0:
-            node = random.choice(list(self.horizon))
-
-            # Attack unvisited node in the horizon.
-            if node not in self.visited:
-
-                # Check if the cost is within cost budget (if the cost budget was specified).
-                if self.attacker_cost_budget != None and cost+costs[node.id] > self.attacker_cost_budget:
-                    break
-                
-                # Find a parent node and update path.
-                parent_node_id = self.start_node
-                for parent_node in node.parents:
-                    if parent_node in self.attacker.reached_attack_steps:
-                        parent_node_id = parent_node.id
-                        break
-                self.path[parent_node_id].append(node)
-                self.visited.append(node)
-                visited_set.add(node.id)
-                self.attacker.reached_attack_steps.append(node)
-                cost += costs[node.id]
-
-                # Check if the target node was selected (if the target node was specified).
-                if self.target_node != None and node.id == self.target_node:
-                    break
-                
-                # Update attack surface.
-                self.horizon = maltoolbox.attackgraph.query.get_attack_surface(self.attackgraph_instance, self.attacker)
-                horizon_set = {node.id for node in self.horizon}
+        self.reset_result()
+        graph = self.graph
+        start_node = graph.index[self.start_node]
+        target_node = graph.index.get(self.target_node)
+        relevant = self.get_relevant_nodes(start_node, target_node)
+        with self.stats.phase("search"):
+            cost, reached_order, path, horizon = traversal.random_path(graph, start_node, target_node, self.attacker_cost_budget,
+                                                                       allowed=None if relevant is None else relevant.tolist())
+        self.stats.count("attack_surface_updates", len(reached_order))
+
+        with self.stats.phase("reconstruction"):
+            self.attacker.reached_attack_steps = []
+            self.horizon = [self.attackgraph_dictionary[node_id] for node_id in graph.ids(horizon)]
+            self.publish_result([], path, reached_order)
+            self.visited = self.attacker.reached_attack_steps
+        return cost
+
+    def monte_carlo_random_path(self, rollouts=1000, seed=0, max_workers=1):
+        """
+        Run many seeded random paths from the start node in one call and aggregate them, see
+        monte_carlo.monte_carlo_random_path(). The target node and attacker cost budget of the
+        simulation are used, and the simulation state is not changed.
+
+        Parameters:
+        - rollouts: The number of random paths.
+        - seed: The master seed, the same seed gives the same result.
+        - max_workers: The number of worker processes. Default is 1, the calling process.
+
+        Returns:
+        - result: A monte_carlo.MonteCarloResult with the probability of reaching the target,
+                  the cost distribution and the compromise frequency of every attack step.
+        """
+        return monte_carlo.monte_carlo_random_path(self.graph, self.graph.index[self.start_node], self.graph.index.get(self.target_node),
+                                                   self.attacker_cost_budget, rollouts, seed, max_workers)
+
+    def budget_region(self):
+        """
+        Find all attack steps the attacker can reach from the start node within the attacker cost
+        budget, each settled once at its minimal cost (see and_or_search.budget_region()). Unlike
+        bfs(), the paths are not enumerated and 'and' steps need all their necessary parents.
+
+        The minimal cost of every attack step in the region is stored in self.region_costs.
+
+        Returns:
+        - cost: The total cost of the attack subgraph that reaches the whole region.
+        """
+        self.reset_result()
+        graph = self.graph
+        with self.stats.phase("search"):
+            cost, nodes, costs, edges = and_or_search.budget_region(graph, graph.index[self.start_node], self.attacker_cost_budget, self.stats)
+        with self.stats.phase("reconstruction"):
+            self.region_costs = {graph.node_ids[node]: node_cost for node, node_cost in costs.items()}
+            self.publish_result(nodes, edges, [])
         return cost
 
     def bfs(self):
@@ -412,18 +709,10 @@ class AttackSimulation:
         Returns:
         - cost: The total cost of the paths explored within the attacker's cost budget.
         """
-        # Start BFS from the start node with distance 0.
-        node = self.attackgraph_dictionary[self.start_node]
-        queue = deque([(node, 0)])  
-        self.visited = [node]
-        costs = self.cost_dictionary
-        while queue:
-            node, cost = queue.popleft()
-            # Explore the horizon of the current node.
-            for child_node in node.children:
-                next_cost = cost + costs[child_node.id]
-                if next_cost <= self.attacker_cost_budget:
-                    self.visited.append(child_node)
-                    queue.append((child_node, next_cost))
-                    self.path[node.id].append(child_node)
+        self.reset_result()
+        with self.stats.phase("search"):
+            cost, visited, path = traversal.bfs(self.graph, self.graph.index[self.start_node], self.attacker_cost_budget)
+        self.stats.count("bfs_queue_pops", len(visited))
+        with self.stats.phase("reconstruction"):
+            self.publish_result(visited, path, [])
         return cost
@@ -0,0 +1,99 @@
+import compiled_graph
+
+
+class AttackSurface:
+
+    def __init__(self, graph, start_nodes, allowed=None):
+        """
+        Incrementally maintained attack surface (horizon) of an attacker on a compiled graph.
+
+        The horizon holds the nodes that are not reached yet and that
+        maltoolbox.attackgraph.query.get_attack_surface() would return: viable 'or' children of
+        reached nodes, and viable 'and' children whose necessary parents are all reached. Instead
+        of recomputing it from every reached node, compromise() only looks at the children of the
+        newly reached node, and every 'and' node keeps a counter of its necessary parents that are
+        not reached yet.
+
+        The horizon is a list with the position of every node tracked, so adding, removing and
+        random.choice(surface.horizon) are O(1).
+
+        Parameters:
+        - graph: A CompiledAttackGraph instance.
+        - start_nodes: The index of the node the attacker starts from, or a list of indices.
+        - allowed: Optional sequence of booleans, a node i with allowed[i] False never enters the
+                   horizon, e.g. from relevance.TargetRelevance.relevant_nodes().
+        """
+        self.graph = graph
+        self.view = graph.scalar_view()
+        self.allowed = allowed
+        size = len(graph)
+        self.reached = [False] * size
+        self.reached_order = []
+        self.horizon = []
+        # Position of each node in self.horizon, -1 if the node is not in the horizon.
+        self.horizon_position = [-1] * size
+        # Number of necessary parents of each node that are not reached yet.
+        self.remaining_parents = graph.necessary_parent_counts().tolist()
+        for start_node in [start_nodes] if isinstance(start_nodes, int) else start_nodes:
+            self.compromise(start_node)
+
+    def __contains__(self, node):
+        return self.horizon_position[node] != -1
+
+    def __len__(self):
+        return len(self.horizon)
+
+    def compromise(self, node):
+        """
+        Mark a node as reached, remove it from the horizon and add the children it enables.
+
+        Parameters:
+        - node: The node index.
+
+        Returns:
+        - added: The node indices that were added to the horizon.
+        """
+        if self.reached[node]:
+            return []
+        view = self.view
+        node_type = view.node_type
+        is_viable = view.is_viable
+        reached = self.reached
+        remaining_parents = self.remaining_parents
+        children_indices = view.children_indices
+        parents_indptr = view.parents_indptr
+        parents_indices = view.parents_indices
+        node_is_necessary = view.is_necessary[node]
+        allowed = self.allowed
+
+        reached[node] = True
+        self.reached_order.append(node)
+        self._remove(node)
+
+        added = []
+        for k in range(view.children_indptr[node], view.children_indptr[node + 1]):
+            child = children_indices[k]
+            # The children of the attacker node do not list it as a parent, and only the parents
+            # are counted by necessary_parent_counts().
+            if node_is_necessary and node_type[child] == compiled_graph.AND and node in parents_indices[parents_indptr[child]:parents_indptr[child + 1]]:
+                remaining_parents[child] -= 1
+            if reached[child] or self.horizon_position[child] != -1 or not is_viable[child]:
+                continue
+            if allowed is not None and not allowed[child]:
+                continue
+            child_type = node_type[child]
+            if child_type == compiled_graph.OR or (child_type == compiled_graph.AND and remaining_parents[child] <= 0):
+                self.horizon_position[child] = len(self.horizon)
+                self.horizon.append(child)
+                added.append(child)
+        return added
+
+    def _remove(self, node):
+        position = self.horizon_position[node]
+        if position == -1:
+            return
+        last = self.horizon.pop()
+        if last != node:
+            self.horizon[position] = last
+            self.horizon_position[last] = position
+        self.horizon_position[node] = -1
@@ -0,0 +1,125 @@
+from collections import namedtuple
+import queue
+import threading
+import time
+
+# Statistics of a BackgroundSink. The latencies are the durations of the writes in seconds.
+SinkStats = namedtuple("SinkStats", [
+    "submitted",
+    "completed",
+    "queue_depth",
+    "max_queue_depth",
+    "mean_latency",
+    "max_latency"
+    ])
+
+# Put in the queue by close() to stop the worker thread.
+_STOP = object()
+
+
+class BackgroundSink:
+
+    def __init__(self, max_queue_size=16):
+        """
+        Run writes, e.g. Neo4j uploads, on a background worker thread in the order they were
+        submitted, so the caller does not wait for the I/O. The queue is bounded: when it is full,
+        submit() blocks until the worker has caught up (back-pressure).
+
+        The sink can be used as a context manager, which closes it and waits for the pending
+        writes on exit. If a write raises an exception, the writes after it are skipped and the
+        exception is raised again by every later submit(), flush() and close().
+
+        Parameters:
+        - max_queue_size: The maximum number of pending writes.
+        """
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.submitted = 0
+        self.completed = 0
+        self.max_queue_depth = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.error = None
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._work, name="BackgroundSink", daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def submit(self, function, *args, **kwargs):
+        """
+        Queue a call of function(*args, **kwargs) on the worker thread. The arguments should not be
+        changed by the caller afterwards.
+        """
+        self._raise_error()
+        if not self.thread.is_alive():
+            raise RuntimeError("The sink is closed.")
+        self.queue.put((function, args, kwargs))
+        with self.lock:
+            self.submitted += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+
+    def flush(self):
+        """
+        Wait until all submitted writes are done.
+        """
+        self.queue.join()
+        self._raise_error()
+
+    def close(self):
+        """
+        Wait for the pending writes and stop the worker thread.
+        """
+        if self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join()
+        self._raise_error()
+
+    def stats(self):
+        """
+        Get the statistics of the sink.
+
+        Returns:
+        - stats: A SinkStats namedtuple.
+        """
+        with self.lock:
+            return SinkStats(
+                submitted=self.submitted,
+                completed=self.completed,
+                queue_depth=self.queue.qsize(),
+                max_queue_depth=self.max_queue_depth,
+                mean_latency=self.total_latency / self.completed if self.completed else 0.0,
+                max_latency=self.max_latency
+            )
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise self.error
+
+    def _work(self):
+        failed = False
+        while True:
+            task = self.queue.get()
+            try:
+                if task is _STOP:
+                    return
+                if failed:
+                    continue
+                function, args, kwargs = task
+                start = time.perf_counter()
+                try:
+                    function(*args, **kwargs)
+                except Exception as error:
+                    self.error = error
+                    failed = True
+                    continue
+                latency = time.perf_counter() - start
+                with self.lock:
+                    self.completed += 1
+                    self.total_latency += latency
+                    self.max_latency = max(self.max_latency, latency)
+            finally:
+                self.queue.task_done()
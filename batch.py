@@ -0,0 +1,126 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import random
+
+import and_or_search
+import heuristics
+import traversal
+
+ALGORITHMS = ["dijkstra", "a_star", "bidirectional", "random_path", "bfs", "budget_region"]
+
+# A query against the loaded attack graph. The entry points are attack step ids, e.g. the
+# attacker node "Attacker:1:firstSteps" or a list of entry point attack steps.
+BatchJob = namedtuple("BatchJob", ["entry_points", "target", "budget", "algorithm", "seed"],
+                      defaults=(None, None, "dijkstra", None))
+
+# The result of a job. The path maps attack step ids to the ids of their children in the path.
+BatchResult = namedtuple("BatchResult", ["job_index", "cost", "target_reached", "expanded_nodes", "path"])
+
+# Graph of the worker process, set once by _initialize_worker().
+_worker_graph = None
+_worker_heuristic = None
+
+
+def run_batch(graph, jobs, max_workers=None, chunksize=1):
+    """
+    Run many jobs against one compiled attack graph, in parallel over a process pool.
+
+    The compiled graph only holds NumPy arrays and lists, and is sent to every worker process
+    once when the worker starts. The jobs themselves are small tuples of ids.
+
+    Parameters:
+    - graph: A CompiledAttackGraph instance with the costs set.
+    - jobs: An iterable of BatchJob instances.
+    - max_workers: The number of worker processes, default is the number of CPUs.
+                   With 1 the jobs are run in the calling process.
+    - chunksize: The number of jobs sent to a worker at a time.
+
+    Returns:
+    - results: A generator of BatchResult instances in the same order as the jobs.
+    """
+    if max_workers == 1:
+        heuristic = None
+        for job_index, job in enumerate(jobs):
+            if job.algorithm == "a_star" and heuristic is None:
+                heuristic = heuristics.LandmarkHeuristic(graph)
+            yield run_job(graph, job, job_index, heuristic)
+        return
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_initialize_worker, initargs=(graph,)) as executor:
+        yield from executor.map(_run_job_in_worker, enumerate(jobs), chunksize=chunksize)
+
+
+def run_job(graph, job, job_index=0, heuristic=None):
+    """
+    Run one job on the compiled attack graph.
+
+    Parameters:
+    - graph: A CompiledAttackGraph instance with the costs set.
+    - job: A BatchJob instance.
+    - job_index: The index of the job, copied to the result.
+    - heuristic: Optional heuristics.LandmarkHeuristic for the graph, built if needed.
+
+    Returns:
+    - result: A BatchResult instance. For 'dijkstra', 'a_star' and 'bidirectional' the cost is 0 if the target
+              can not be reached, like AttackSimulation.dijkstra().
+    """
+    if job.algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown algorithm {job.algorithm}, expected one of {ALGORITHMS}.")
+    entry_points = [job.entry_points] if isinstance(job.entry_points, str) else job.entry_points
+    for node_id in list(entry_points) + ([job.target] if job.target is not None else []):
+        if node_id not in graph.index:
+            raise ValueError(f"Unknown attack step {node_id}.")
+    start_nodes = [graph.index[node_id] for node_id in entry_points]
+    target_node = graph.index[job.target] if job.target is not None else None
+
+    if job.algorithm in ("dijkstra", "a_star", "bidirectional"):
+        if target_node is None:
+            raise ValueError(f"The {job.algorithm} algorithm needs a target.")
+        if job.algorithm == "bidirectional":
+            search = and_or_search.BidirectionalSearch(graph, start_nodes, target_node)
+            if not search.run():
+                return BatchResult(job_index, 0, False, search.expanded_nodes, {})
+            cost, _, edges = search.attack_subgraph()
+            return BatchResult(job_index, cost, True, search.expanded_nodes, _edges_to_ids(graph, edges))
+        h_score = None
+        if job.algorithm == "a_star":
+            heuristic = heuristic or heuristics.LandmarkHeuristic(graph)
+            h_score = heuristic.estimate(target_node).tolist()
+        search = and_or_search.AndOrSearch(graph, start_nodes, h_score)
+        if not search.run(target_node):
+            return BatchResult(job_index, 0, False, search.expanded_nodes, {})
+        cost, _, edges = search.attack_subgraph(target_node)
+        return BatchResult(job_index, cost, True, search.expanded_nodes, _edges_to_ids(graph, edges))
+
+    if job.algorithm == "random_path":
+        cost, reached_order, path, _ = traversal.random_path(graph, start_nodes, target_node, job.budget, random.Random(job.seed))
+        target_reached = target_node is not None and target_node in reached_order
+        return BatchResult(job_index, cost, target_reached, len(reached_order), _edges_to_ids(graph, path))
+
+    if job.budget is None:
+        raise ValueError(f"The {job.algorithm} algorithm needs a budget.")
+    if job.algorithm == "budget_region":
+        cost, nodes, costs, edges = and_or_search.budget_region(graph, start_nodes, job.budget)
+        target_reached = target_node is not None and target_node in costs
+        return BatchResult(job_index, cost, target_reached, len(nodes), _edges_to_ids(graph, edges))
+
+    cost, visited, path = traversal.bfs(graph, start_nodes, job.budget)
+    target_reached = target_node is not None and target_node in visited
+    return BatchResult(job_index, cost, target_reached, len(visited), _edges_to_ids(graph, path))
+
+
+def _edges_to_ids(graph, edges):
+    return {graph.node_ids[parent]: graph.ids(children) for parent, children in edges.items()}
+
+
+def _initialize_worker(graph):
+    global _worker_graph, _worker_heuristic
+    _worker_graph = graph
+    _worker_heuristic = None
+
+
+def _run_job_in_worker(indexed_job):
+    global _worker_heuristic
+    job_index, job = indexed_job
+    if job.algorithm == "a_star" and _worker_heuristic is None:
+        _worker_heuristic = heuristics.LandmarkHeuristic(_worker_graph)
+    return run_job(_worker_graph, job, job_index, _worker_heuristic)
@@ -0,0 +1,126 @@
+"""
+Micro-benchmark of the open set of AttackSimulation.dijkstra().
+
+Compares the IndexedPriorityQueue with the previous heapq plus list membership check, and with
+heapq and lazy deletion of stale entries, on random graphs shaped like an attack graph. Keys are
+rarely lowered on node-weighted graphs, so heapq with lazy deletion is the fastest in pure Python
+and is the open set of and_or_search.AndOrSearch and heuristics.one_to_all_costs().
+
+Run from the repository root with:
+python -m benchmarks.open_set --sizes 1000 5000 20000
+"""
+import argparse
+import heapq
+import math
+import random
+import time
+
+import priority_queue
+
+
+def random_graph(size, fan_out, seed):
+    """
+    Build random children lists and costs in the range 1-10, like assets/costs.json.
+    """
+    rng = random.Random(seed)
+    children = [[rng.randrange(size) for _ in range(fan_out)] for _ in range(size)]
+    costs = [rng.randint(1, 10) for _ in range(size)]
+    return children, costs
+
+
+def heapq_with_list_check(children, costs):
+    """
+    The previous open set: the membership check scans the list of (f, id) tuples and never
+    matches, so improved nodes are pushed again and stale entries are expanded again.
+    """
+    g_score = [math.inf] * len(children)
+    g_score[0] = 0
+    open_set = [(0, 0)]
+    pops = 0
+    while open_set:
+        _, current = heapq.heappop(open_set)
+        pops += 1
+        for neighbor in children[current]:
+            tentative = g_score[current] + costs[neighbor]
+            if tentative < g_score[neighbor]:
+                g_score[neighbor] = tentative
+                if neighbor not in open_set:
+                    heapq.heappush(open_set, (tentative, neighbor))
+    return g_score, pops
+
+
+def heapq_with_lazy_deletion(children, costs):
+    """
+    heapq where stale entries are skipped when they are popped.
+    """
+    g_score = [math.inf] * len(children)
+    g_score[0] = 0
+    open_set = [(0, 0)]
+    pops = 0
+    while open_set:
+        f_score, current = heapq.heappop(open_set)
+        pops += 1
+        if f_score > g_score[current]:
+            continue
+        for neighbor in children[current]:
+            tentative = g_score[current] + costs[neighbor]
+            if tentative < g_score[neighbor]:
+                g_score[neighbor] = tentative
+                heapq.heappush(open_set, (tentative, neighbor))
+    return g_score, pops
+
+
+def indexed_priority_queue(children, costs):
+    """
+    IndexedPriorityQueue with decrease-key, every node is at most once in the open set.
+    """
+    g_score = [math.inf] * len(children)
+    g_score[0] = 0
+    open_set = priority_queue.IndexedPriorityQueue(len(children))
+    open_set.push(0, 0)
+    pops = 0
+    while open_set:
+        _, current = open_set.pop()
+        pops += 1
+        for neighbor in children[current]:
+            tentative = g_score[current] + costs[neighbor]
+            if tentative < g_score[neighbor]:
+                g_score[neighbor] = tentative
+                open_set.decrease_key(neighbor, tentative)
+    return g_score, pops
+
+
+VARIANTS = {
+    "heapq + list check": heapq_with_list_check,
+    "heapq + lazy deletion": heapq_with_lazy_deletion,
+    "indexed priority queue": indexed_priority_queue
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--fan-out", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-list-check-size", type=int, default=20000,
+                        help="skip the quadratic list check variant above this size")
+    args = parser.parse_args()
+
+    print(f"{'nodes':>8} {'variant':<24} {'seconds':>10} {'pops':>10}")
+    for size in args.sizes:
+        children, costs = random_graph(size, args.fan_out, args.seed)
+        reference = None
+        for name, variant in VARIANTS.items():
+            if variant is heapq_with_list_check and size > args.max_list_check_size:
+                continue
+            start = time.perf_counter()
+            g_score, pops = variant(children, costs)
+            seconds = time.perf_counter() - start
+            if reference is None:
+                reference = g_score
+            assert g_score == reference, f"{name} found other costs"
+            print(f"{size:>8} {name:<24} {seconds:>10.4f} {pops:>10}")
+
+
+if __name__ == '__main__':
+    main()
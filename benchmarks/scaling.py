@@ -0,0 +1,217 @@
+"""
+Scaling benchmark of the simulation algorithms on synthetic attack graphs.
+
+Generates attack graphs of the given sizes (see benchmarks.synthetic), times every algorithm and
+measures its peak memory with tracemalloc, and writes the results as JSON. Two result files can
+be compared to flag regressions.
+
+Run from the repository root with:
+python -m benchmarks.scaling --sizes 10000 100000 --output results.json
+python -m benchmarks.scaling --compare baseline.json results.json --threshold 0.25
+"""
+import argparse
+import datetime
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+import and_or_search
+import help_functions
+import heuristics
+import neo4j_writer
+import traversal
+from benchmarks import synthetic
+
+
+class NullNeo4jGraph:
+    """
+    Stand-in for py2neo.Graph that accepts every query, to measure the client side of an upload.
+    """
+
+    def __init__(self):
+        self.queries = 0
+
+    def begin(self):
+        return self
+
+    def commit(self, transaction):
+        pass
+
+    def rollback(self, transaction):
+        pass
+
+    def run(self, cypher, parameters=None):
+        self.queries += 1
+        self.records = [{"key": row["key"], "id": i} for i, row in enumerate(parameters["rows"])] if "RETURN row.key" in cypher else []
+        return self
+
+    def data(self):
+        return self.records
+
+
+def upload(graph, batch_size):
+    writer = neo4j_writer.Neo4jBatchWriter(NullNeo4jGraph(), batch_size)
+    nodes = {node_id: ([node_id.rsplit(':', 1)[0], "False"], {"name": graph.names[i], "full_name": node_id, "cost": str(graph.cost[i])})
+             for i, node_id in enumerate(graph.node_ids)}
+    relationships = [(graph.node_ids[parent], graph.node_ids[child]) for parent in range(len(graph)) for child in graph.children(parent).tolist()]
+    writer.replace_all(nodes, relationships)
+    return {"queries": writer.neo4j_graph_connection.queries}
+
+
+def dijkstra(graph, target_node, h_score=None):
+    search = and_or_search.AndOrSearch(graph, 0, h_score)
+    search.run(target_node)
+    return {"cost": search.attack_subgraph(target_node)[0], "expanded_nodes": search.expanded_nodes}
+
+
+def bidirectional(graph, target_node):
+    search = and_or_search.BidirectionalSearch(graph, 0, target_node)
+    search.run()
+    return {"cost": search.attack_subgraph()[0], "expanded_nodes": search.expanded_nodes,
+            "forward_expanded_nodes": search.forward.expanded_nodes, "backward_expanded_nodes": search.backward_expanded_nodes}
+
+
+def a_star(graph, target_node):
+    heuristic = heuristics.LandmarkHeuristic(graph)
+    return dijkstra(graph, target_node, heuristic.estimate(target_node).tolist())
+
+
+def benchmarks(graph, ttcs, args):
+    """
+    The benchmarks as name: function pairs. The functions return a dictionary of extra results.
+    """
+    target_node = len(graph) - 1
+    return {
+        "ttc_costs": lambda: {"mean": float(help_functions.costs_from_ttc(ttcs, 100, args.seed).mean())},
+        "analytic_ttc_costs": lambda: {"mean": float(help_functions.analytic_costs_from_ttc(ttcs).mean())},
+        "dijkstra": lambda: dijkstra(graph, target_node),
+        "a_star": lambda: a_star(graph, target_node),
+        "bidirectional": lambda: bidirectional(graph, target_node),
+        "cost_map": lambda: {"reachable": int(np.isfinite(and_or_search.AttackCostMap(graph, 0).settled_cost).sum())},
+        "random_path": lambda: {"reached": len(traversal.random_path(graph, 0, target_node, None, random.Random(args.seed))[1])},
+        "bfs": lambda: {"visited": len(traversal.bfs(graph, 0, args.bfs_budget)[1])},
+        "budget_region": lambda: {"nodes": len(and_or_search.budget_region(graph, 0, args.region_budget)[1])},
+        "neo4j_upload": lambda: upload(graph, args.batch_size)
+        }
+
+
+def measure(function, memory):
+    """
+    Time a function, and run it again under tracemalloc to measure its peak memory.
+    """
+    start = time.perf_counter()
+    extra = function()
+    seconds = time.perf_counter() - start
+    peak_memory = None
+    if memory:
+        tracemalloc.start()
+        function()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return seconds, peak_memory, extra
+
+
+def run(args):
+    results = []
+    print(f"{'nodes':>9} {'benchmark':<20} {'seconds':>10} {'peak MiB':>10}")
+    for size in args.sizes:
+        start = time.perf_counter()
+        graph, ttcs = synthetic.synthetic_attack_graph(size, args.fan_out, args.and_ratio, args.locality, seed=args.seed)
+        results.append({"size": size, "benchmark": "generate", "seconds": time.perf_counter() - start,
+                        "peak_memory_bytes": None, "edges": int(len(graph.children_indices))})
+        for name, function in benchmarks(graph, ttcs, args).items():
+            if args.only and name not in args.only:
+                continue
+            if name == "bfs" and size > args.max_bfs_size:
+                continue
+            seconds, peak_memory, extra = measure(function, not args.skip_memory)
+            results.append({"size": size, "benchmark": name, "seconds": seconds, "peak_memory_bytes": peak_memory, **extra})
+            print(f"{size:>9} {name:<20} {seconds:>10.4f} {peak_memory / 2**20 if peak_memory else 0:>10.1f}")
+    return {
+        "metadata": {
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "arguments": {name: value for name, value in vars(args).items() if name not in ("output", "compare")}
+            },
+        "results": results
+        }
+
+
+def compare(baseline, current, threshold):
+    """
+    Compare two result files.
+
+    Parameters:
+    - baseline: The baseline results, as loaded from JSON.
+    - current: The current results, as loaded from JSON.
+    - threshold: The relative slowdown, or peak memory growth, that counts as a regression.
+
+    Returns:
+    - regressions: A list of (size, benchmark, metric, baseline value, current value) tuples.
+    """
+    baseline_results = {(result["size"], result["benchmark"]): result for result in baseline["results"]}
+    regressions = []
+    print(f"{'nodes':>9} {'benchmark':<20} {'seconds':>10} {'ratio':>7} {'memory ratio':>13}")
+    for result in current["results"]:
+        key = (result["size"], result["benchmark"])
+        if key not in baseline_results:
+            continue
+        ratios = []
+        for metric in ["seconds", "peak_memory_bytes"]:
+            old, new = baseline_results[key].get(metric), result.get(metric)
+            if not old or new is None:
+                ratios.append(None)
+                continue
+            ratios.append(new / old)
+            if new / old > 1 + threshold:
+                regressions.append((*key, metric, old, new))
+        flag = " REGRESSION" if regressions and regressions[-1][:2] == key else ""
+        print(f"{key[0]:>9} {key[1]:<20} {result['seconds']:>10.4f} "
+              f"{ratios[0] if ratios[0] is not None else float('nan'):>7.2f} "
+              f"{ratios[1] if ratios[1] is not None else float('nan'):>13.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--fan-out", type=float, default=3)
+    parser.add_argument("--and-ratio", type=float, default=0.2)
+    parser.add_argument("--locality", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bfs-budget", type=int, default=15,
+                        help="bfs enumerates paths, so its work grows exponentially with the budget")
+    parser.add_argument("--max-bfs-size", type=int, default=100000, help="skip bfs above this size")
+    parser.add_argument("--region-budget", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=neo4j_writer.DEFAULT_BATCH_SIZE)
+    parser.add_argument("--only", nargs="+", help="run only these benchmarks")
+    parser.add_argument("--skip-memory", action="store_true", help="do not measure the peak memory")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="compare two result files")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="relative slowdown or memory growth flagged as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as file:
+            baseline = json.load(file)
+        with open(args.compare[1]) as file:
+            current = json.load(file)
+        regressions = compare(baseline, current, args.threshold)
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}.")
+        sys.exit(1 if regressions else 0)
+
+    results = run(args)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Synthetic attack graphs of configurable size, fan-out and AND/OR ratio.
+
+The graphs are shaped like coreLang attack graphs: node 0 is the attacker node, and the parents of
+an attack step are mostly steps close to it (steps of the same or a nearby asset), with a few
+long-range edges. Every step can be reached from the attacker node.
+"""
+import numpy as np
+
+import compiled_graph
+import help_functions
+
+TTC_NAMES = list(help_functions.TTC_DISTRIBUTIONS)
+
+
+def synthetic_attack_graph(size, fan_out=3, and_ratio=0.2, locality=20, ttc_ratio=0.3, seed=0):
+    """
+    Generate a random attack graph.
+
+    Parameters:
+    - size: The number of nodes, including the attacker node.
+    - fan_out: The mean number of parents of an attack step (and so the mean number of children).
+    - and_ratio: The fraction of attack steps of type 'and'. An 'and' step has at least 2 parents
+                 if possible.
+    - locality: The mean distance, in node indices, between an attack step and its parents.
+    - ttc_ratio: The fraction of attack steps with a named TTC distribution, the others have none.
+    - seed: The seed of the random generator.
+
+    Returns:
+    - graph: A CompiledAttackGraph instance with costs in the range 1-10, like assets/costs.json,
+             and cost 0 for the attacker node.
+    - ttcs: A list with the ttc of every node, for help_functions.costs_from_ttc().
+    """
+    rng = np.random.default_rng(seed)
+    node_type = np.where(rng.random(size) < and_ratio, compiled_graph.AND, compiled_graph.OR).astype(np.int8)
+    node_type[0] = compiled_graph.OR
+
+    # Parents of node i are drawn from the nodes before it, so every node is reachable.
+    parent_counts = 1 + rng.poisson(max(fan_out - 1, 0), size)
+    parent_counts[node_type == compiled_graph.AND] = np.maximum(parent_counts[node_type == compiled_graph.AND], 2)
+    parent_counts[0] = 0
+    owners = np.repeat(np.arange(size, dtype=np.int64), parent_counts)
+    parents = np.maximum(owners - rng.geometric(1 / max(locality, 1), len(owners)), 0)
+    edges = np.unique(owners * size + parents)
+    owners, parents = edges // size, edges % size
+
+    arrays = {
+        "node_ids": np.array([f"Synthetic:{i}:step" for i in range(size)], dtype=np.str_),
+        "names": np.array(["firstSteps"] + [f"step{i}" for i in range(1, size)], dtype=np.str_),
+        "node_type": node_type,
+        "is_necessary": np.ones(size, dtype=np.bool_),
+        "is_viable": np.ones(size, dtype=np.bool_),
+        "cost": rng.integers(1, 11, size).astype(np.float64),
+        "missing_necessary_parent": np.zeros(size, dtype=np.bool_)
+        }
+    arrays["cost"][0] = 0
+    arrays["parents_indptr"], arrays["parents_indices"] = _csr(owners, parents, size)
+    order = np.argsort(parents, kind="stable")
+    arrays["children_indptr"], arrays["children_indices"] = _csr(parents[order], owners[order], size)
+    graph = compiled_graph.CompiledAttackGraph.from_arrays(arrays)
+
+    has_ttc = rng.random(size) < ttc_ratio
+    names = rng.integers(0, len(TTC_NAMES), size)
+    ttcs = [{'type': 'function', 'name': TTC_NAMES[names[i]], 'arguments': []} if has_ttc[i] and i > 0 else None for i in range(size)]
+    return graph, ttcs
+
+
+def _csr(rows, columns, size):
+    """
+    Build CSR arrays from edges sorted by row.
+    """
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(rows, minlength=size))
+    return indptr, columns.astype(np.int32)
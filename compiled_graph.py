@@ -0,0 +1,278 @@
+from collections import namedtuple
+import copy
+import numpy as np
+
+# Integer codes for the attack graph node types.
+OR = 0
+AND = 1
+DEFENSE = 2
+EXIST = 3
+NOT_EXIST = 4
+
+NODE_TYPE_CODES = {
+    "or": OR,
+    "and": AND,
+    "defense": DEFENSE,
+    "exist": EXIST,
+    "notExist": NOT_EXIST
+    }
+
+# Plain Python list mirrors of the arrays, used in the scalar hot loops of the algorithms.
+ScalarView = namedtuple("ScalarView", [
+    "children_indptr",
+    "children_indices",
+    "parents_indptr",
+    "parents_indices",
+    "node_type",
+    "is_necessary",
+    "is_viable",
+    "cost"
+    ])
+
+
+# The NumPy arrays of a compiled graph, see CompiledAttackGraph.to_arrays().
+ARRAY_NAMES = [
+    "children_indptr",
+    "children_indices",
+    "parents_indptr",
+    "parents_indices",
+    "node_type",
+    "is_necessary",
+    "is_viable",
+    "cost",
+    "missing_necessary_parent"
+    ]
+
+
+class CompiledAttackGraph:
+
+    def __init__(self, nodes, cost_dictionary=None):
+        """
+        Compile the attack graph nodes into an integer indexed graph.
+
+        The node ids are mapped to dense integers in the order of the node list. Children and
+        parents are stored as NumPy CSR arrays (indptr, indices), and the node type, necessity,
+        viability and cost are stored as typed arrays. No mal-toolbox objects are kept, so the
+        compiled graph is cheap to copy and pickle.
+
+        The nodes can be a part of the attack graph, e.g. from reachable_nodes(). Edges to nodes
+        outside of it are dropped, and an 'and' node with a necessary parent outside of it is not
+        viable, since that parent can never be reached. Such nodes are marked in
+        missing_necessary_parent, so the viability stays lowered when it is calculated again from
+        the parents, see defense_analysis.DefenseAnalysis.
+
+        Parameters:
+        - nodes: The AttackGraphNode instances, e.g. attackgraph_instance.nodes.
+        - cost_dictionary: A dictionary with attack step ids as keys and the cost as values.
+                           Missing attack steps have cost 0.
+        """
+        nodes = list(nodes)
+        self.node_ids = [node.id for node in nodes]
+        self.index = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        self.names = [node.name for node in nodes]
+
+        self.children_indptr, self.children_indices = self._build_csr(
+            [[self.index[child.id] for child in node.children if child.id in self.index] for node in nodes])
+        self.parents_indptr, self.parents_indices = self._build_csr(
+            [[self.index[parent.id] for parent in node.parents if parent.id in self.index] for node in nodes])
+
+        # Unknown node types are stored as -1 and are never traversable.
+        self.node_type = np.array([NODE_TYPE_CODES.get(node.type, -1) for node in nodes], dtype=np.int8)
+        self.is_necessary = np.array([bool(node.is_necessary) for node in nodes], dtype=np.bool_)
+        self.missing_necessary_parent = np.array([node.type == "and" and self._has_missing_necessary_parent(node) for node in nodes], dtype=np.bool_)
+        self.is_viable = np.array([bool(node.is_viable) for node in nodes], dtype=np.bool_) & ~self.missing_necessary_parent
+        self.cost = np.zeros(len(nodes), dtype=np.float64)
+        if cost_dictionary is not None:
+            self.set_costs(cost_dictionary)
+        self._scalar_view = None
+
+    def _has_missing_necessary_parent(self, node):
+        return any(parent.is_necessary and parent.id not in self.index for parent in node.parents)
+
+    @staticmethod
+    def _build_csr(adjacency):
+        """
+        Build CSR arrays from a list of neighbour index lists.
+
+        Parameters:
+        - adjacency: A list where element i holds the neighbour indices of node i.
+
+        Returns:
+        - indptr: Array where the neighbours of node i are indices[indptr[i]:indptr[i+1]].
+        - indices: The concatenated neighbour indices.
+        """
+        indptr = np.zeros(len(adjacency) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(neighbours) for neighbours in adjacency])
+        indices = np.fromiter((i for neighbours in adjacency for i in neighbours), dtype=np.int32, count=int(indptr[-1]))
+        return indptr, indices
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def __getstate__(self):
+        # The scalar view is a cache, it is rebuilt on first use instead of being pickled.
+        state = self.__dict__.copy()
+        state["_scalar_view"] = None
+        return state
+
+    def to_arrays(self):
+        """
+        Get the compiled graph as a dictionary of NumPy arrays, e.g. to save it with numpy.save().
+
+        Returns:
+        - arrays: A dictionary with the arrays of ARRAY_NAMES, and the node ids and names as string arrays.
+        """
+        arrays = {name: getattr(self, name) for name in ARRAY_NAMES}
+        arrays["node_ids"] = np.array(self.node_ids, dtype=np.str_)
+        arrays["names"] = np.array(self.names, dtype=np.str_)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """
+        Create a compiled graph from the arrays of to_arrays() without the attack graph. The arrays
+        are used as they are, so memory-mapped arrays are not read into memory.
+
+        Parameters:
+        - arrays: A dictionary like the one returned by to_arrays().
+
+        Returns:
+        - graph: A CompiledAttackGraph instance.
+        """
+        graph = cls.__new__(cls)
+        graph.node_ids = arrays["node_ids"].tolist()
+        graph.index = {node_id: i for i, node_id in enumerate(graph.node_ids)}
+        graph.names = arrays["names"].tolist()
+        for name in ARRAY_NAMES:
+            setattr(graph, name, arrays[name])
+        graph._scalar_view = None
+        return graph
+
+    def with_costs(self, cost):
+        """
+        Get a copy of the graph with other costs. The copy shares all other arrays with the graph.
+
+        Parameters:
+        - cost: A sequence with the cost of every node.
+
+        Returns:
+        - graph: A CompiledAttackGraph instance.
+        """
+        graph = copy.copy(self)
+        graph.cost = np.asarray(cost, dtype=np.float64)
+        graph._scalar_view = None
+        return graph
+
+    def read_only(self):
+        """
+        Get a copy of the graph that can be shared by threads. The copy shares the arrays with the
+        graph through read-only NumPy views, so set_costs() on the graph does not change it, and
+        its scalar view is built up front.
+
+        Returns:
+        - graph: A CompiledAttackGraph instance.
+        """
+        graph = copy.copy(self)
+        for name in ARRAY_NAMES:
+            array = getattr(self, name).view()
+            array.flags.writeable = False
+            setattr(graph, name, array)
+        graph._scalar_view = None
+        graph.scalar_view()
+        return graph
+
+    def set_costs(self, cost_dictionary):
+        """
+        Set the cost array from a cost dictionary.
+
+        Parameters:
+        - cost_dictionary: A dictionary with attack step ids as keys and the cost as values.
+        """
+        self.cost = np.array([cost_dictionary.get(node_id, 0) for node_id in self.node_ids], dtype=np.float64)
+        self._scalar_view = None
+
+    def children(self, index):
+        """
+        Return the child indices of a node.
+        """
+        return self.children_indices[self.children_indptr[index]:self.children_indptr[index + 1]]
+
+    def parents(self, index):
+        """
+        Return the parent indices of a node.
+        """
+        return self.parents_indices[self.parents_indptr[index]:self.parents_indptr[index + 1]]
+
+    def necessary_parent_counts(self):
+        """
+        Count the necessary parents of every node.
+
+        Returns:
+        - counts: A NumPy array with the number of necessary parents of each node.
+        """
+        owners = np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.parents_indptr))
+        return np.bincount(owners, weights=self.is_necessary[self.parents_indices], minlength=len(self)).astype(np.int64)
+
+    def ids(self, indices):
+        """
+        Translate node indices back to attack step ids.
+
+        Parameters:
+        - indices: An iterable of node indices.
+
+        Returns:
+        - list: The attack step ids.
+        """
+        return [self.node_ids[i] for i in indices]
+
+    def scalar_view(self):
+        """
+        Return plain list copies of the arrays. Indexing a Python list with a Python int is much
+        faster than indexing a NumPy array, so the per-node loops of the algorithms use this view.
+        The view is built once and cached.
+
+        Returns:
+        - ScalarView: A namedtuple with the CSR arrays and the typed node arrays as lists.
+        """
+        if self._scalar_view is None:
+            self._scalar_view = ScalarView(
+                children_indptr=self.children_indptr.tolist(),
+                children_indices=self.children_indices.tolist(),
+                parents_indptr=self.parents_indptr.tolist(),
+                parents_indices=self.parents_indices.tolist(),
+                node_type=self.node_type.tolist(),
+                is_necessary=self.is_necessary.tolist(),
+                is_viable=self.is_viable.tolist(),
+                cost=self.cost.tolist()
+            )
+        return self._scalar_view
+
+
+def reachable_nodes(start_nodes):
+    """
+    Collect the attack graph nodes that can be reached from the start nodes, without visiting the
+    rest of the attack graph. Only the children of viable 'or' and 'and' nodes are followed, the
+    nodes an attacker can enter. An 'and' node is collected when one of its parents is, so the
+    result can hold 'and' nodes that are not reachable, CompiledAttackGraph marks the ones with a
+    necessary parent outside the result as not viable.
+
+    The defenses that are parents of the collected nodes are added last, so the defenses can be
+    enabled in a defense_analysis.DefenseAnalysis. Their other children are not collected, so
+    disabling an enabled defense does not make the attack steps behind it reachable.
+
+    Parameters:
+    - start_nodes: The AttackGraphNode instances the attacker starts from, e.g. [attacker.node].
+
+    Returns:
+    - nodes: The reachable AttackGraphNode instances in breadth first order, the start nodes
+             first, followed by the defenses.
+    """
+    nodes = list(start_nodes)
+    seen = {node.id for node in nodes}
+    for node in nodes:
+        for child in node.children:
+            if child.id not in seen and child.is_viable and child.type in ("or", "and"):
+                seen.add(child.id)
+                nodes.append(child)
+    defenses = {parent.id: parent for node in nodes for parent in node.parents if parent.type == "defense" and parent.id not in seen}
+    return nodes + list(defenses.values())
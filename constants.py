@@ -10,7 +10,8 @@ ATTACK_OPTIONS = {
     "1": "step by step attack",
     "2": "shortest path with dijkstra",
     "3": "random path",
-    "4": "breadth first search"
+    "4": "breadth first search",
+    "5": "attack steps within the cost budget"
     }
 
 # Used in AttackSimulation.step_by_step_attack_simulation().
@@ -29,3 +30,4 @@ DBNAME = "neo4j"
 MODEL_FILE = "assets/model.json"
 COST_FILE = "assets/costs.json"
 MAR_ARCHIVE = "assets/org.mal-lang.coreLang-1.0.0.mar"
+GRAPH_CACHE_DIR = "cache"
@@ -0,0 +1,196 @@
+from collections import namedtuple
+import math
+import numpy as np
+
+import and_or_search
+import compiled_graph
+
+# The effect of a defense on the targets, see DefenseAnalysis.rank_defenses(). The costs map the
+# target ids to the cost of the cheapest attack with the defense, math.inf if it is not reachable.
+# The resettled nodes are the number of nodes the incremental search settled for the defense.
+DefenseImpact = namedtuple("DefenseImpact", ["defense", "impact", "costs", "resettled_nodes"])
+
+
+class DefenseAnalysis:
+
+    def __init__(self, graph, start_nodes, cost_map=None):
+        """
+        What-if analysis of defenses on a compiled attack graph: how do the attack costs change if
+        a defense is enabled or disabled, without generating the attack graph again.
+
+        Enabling or disabling a defense changes its viability and necessity like
+        maltoolbox.attackgraph.analyzers.apriori.calculate_viability_and_necessity() does for a
+        defense status of 1.0 or 0.0. The change is propagated to the descendants of the defense
+        only, and the attack costs are updated with and_or_search.repair_search(), which only
+        searches the nodes whose viability or necessity changed and their descendants.
+
+        The graph must have the viability and necessity of calculate_viability_and_necessity(),
+        a defense is enabled if it is not viable.
+
+        Parameters:
+        - graph: A CompiledAttackGraph instance with the costs set. It is not changed.
+        - start_nodes: The index of the node the attacker starts from, or a list of indices.
+        - cost_map: Optional and_or_search.AttackCostMap of the graph and start nodes.
+        """
+        self.graph = graph
+        self.cost_map = cost_map or and_or_search.AttackCostMap(graph, start_nodes)
+        self.start_nodes = self.cost_map.start_nodes
+        # The nodes whose viability or necessity differ from the analysis this one was derived from,
+        # and those nodes with all their descendants.
+        self.changed_nodes = []
+        self.affected_nodes = set()
+
+    def defenses(self):
+        """
+        Get the defense ids of the graph.
+        """
+        return [self.graph.node_ids[i] for i in np.flatnonzero(self.graph.node_type == compiled_graph.DEFENSE)]
+
+    def is_enabled(self, defense):
+        """
+        Return True if the defense id is enabled.
+        """
+        return not self.graph.is_viable[self.defense_index(defense)]
+
+    def defense_index(self, defense):
+        index = self.graph.index.get(defense)
+        if index is None or self.graph.node_type[index] != compiled_graph.DEFENSE:
+            raise ValueError(f"Unknown defense {defense}.")
+        return index
+
+    def cost(self, target):
+        """
+        Get the cost of the cheapest attack on a target id, math.inf if it can not be reached.
+        """
+        return self.cost_map.cost(self.graph.index[target])
+
+    def with_defenses(self, defenses):
+        """
+        Enable or disable defenses. The analysis is not changed, a new one is returned.
+
+        Parameters:
+        - defenses: A dictionary with defense ids as keys and True to enable or False to disable
+                    the defense as values, or an iterable of defense ids to enable.
+
+        Returns:
+        - analysis: A DefenseAnalysis instance with the defenses set.
+        """
+        if not isinstance(defenses, dict):
+            defenses = {defense: True for defense in defenses}
+        is_viable = self.graph.is_viable.copy()
+        is_necessary = self.graph.is_necessary.copy()
+        toggled = []
+        for defense, enabled in defenses.items():
+            index = self.defense_index(defense)
+            if is_viable[index] == enabled:
+                is_viable[index] = not enabled
+                is_necessary[index] = enabled
+                toggled.append(index)
+
+        graph = self.graph.with_costs(self.graph.cost)
+        graph.is_viable = is_viable
+        graph.is_necessary = is_necessary
+        changed_nodes = self._propagate(graph, toggled)
+        affected_nodes = and_or_search.descendants(self.graph, changed_nodes)
+        search = and_or_search.repair_search(self.cost_map.search, graph, affected_nodes)
+        analysis = DefenseAnalysis(graph, self.start_nodes, and_or_search.AttackCostMap(graph, self.start_nodes, search))
+        analysis.changed_nodes = changed_nodes
+        analysis.affected_nodes = affected_nodes
+        return analysis
+
+    def rank_defenses(self, candidates, targets):
+        """
+        Rank defenses by how much enabling each of them, one at a time, raises the cost of
+        attacking the targets. Every candidate is evaluated incrementally from this analysis, and a
+        candidate whose descendants do not contain a target is not searched at all.
+
+        Parameters:
+        - candidates: An iterable of defense ids.
+        - targets: An iterable of target attack step ids.
+
+        Returns:
+        - impacts: A list of DefenseImpact, the largest impact first. The impact is the sum of
+                   the cost increases of the targets, math.inf if a reachable target becomes
+                   unreachable.
+        """
+        targets = list(targets)
+        target_nodes = {self.graph.index[target] for target in targets}
+        base_costs = {target: self.cost(target) for target in targets}
+        impacts = []
+        for defense in candidates:
+            index = self.defense_index(defense)
+            if self.is_enabled(defense) or not target_nodes & and_or_search.descendants(self.graph, [index]):
+                impacts.append(DefenseImpact(defense, 0, base_costs, 0))
+                continue
+            analysis = self.with_defenses([defense])
+            costs = {target: analysis.cost(target) for target in targets}
+            impact = sum(costs[target] - base_costs[target] for target in targets if base_costs[target] != math.inf)
+            impacts.append(DefenseImpact(defense, impact, costs, analysis.cost_map.search.resettled_nodes))
+        impacts.sort(key=lambda defense_impact: -defense_impact.impact)
+        return impacts
+
+    @staticmethod
+    def _propagate(graph, toggled):
+        """
+        Update the viability and necessity of the descendants of the toggled nodes, with the rules
+        of calculate_viability_and_necessity(): an 'or' node is viable if a parent is viable and
+        necessary if all parents are necessary, an 'and' node is viable if all parents are viable
+        and necessary if a parent is necessary.
+
+        The flags of the descendants are reset to True and lowered until nothing changes, the
+        same greatest fixed point that calculate_viability_and_necessity() reaches. An 'and' node
+        with a necessary parent outside of a partial graph (see
+        CompiledAttackGraph.missing_necessary_parent) stays not viable and necessary.
+
+        Returns:
+        - changed_nodes: The toggled nodes and the nodes whose viability or necessity changed.
+        """
+        view = graph.scalar_view()
+        children_indptr, children_indices = view.children_indptr, view.children_indices
+        parents_indptr, parents_indices = view.parents_indptr, view.parents_indices
+        node_type = view.node_type
+        is_viable = view.is_viable
+        is_necessary = view.is_necessary
+        missing_necessary_parent = graph.missing_necessary_parent
+        old_viable = is_viable.copy()
+        old_necessary = is_necessary.copy()
+
+        # The 'or' and 'and' descendants, the other node types do not inherit the flags.
+        cone = []
+        seen = set(toggled)
+        stack = list(toggled)
+        while stack:
+            node = stack.pop()
+            for k in range(children_indptr[node], children_indptr[node + 1]):
+                child = children_indices[k]
+                if child not in seen and node_type[child] in (compiled_graph.OR, compiled_graph.AND):
+                    seen.add(child)
+                    cone.append(child)
+                    stack.append(child)
+        in_cone = set(cone)
+        for node in cone:
+            is_viable[node] = True
+            is_necessary[node] = True
+
+        work = list(cone)
+        while work:
+            node = work.pop()
+            parents = [parents_indices[j] for j in range(parents_indptr[node], parents_indptr[node + 1])]
+            if not parents:
+                continue
+            if node_type[node] == compiled_graph.OR:
+                viable = any(is_viable[parent] for parent in parents)
+                necessary = all(is_necessary[parent] for parent in parents)
+            else:
+                viable = all(is_viable[parent] for parent in parents) and not missing_necessary_parent[node]
+                necessary = any(is_necessary[parent] for parent in parents) or missing_necessary_parent[node]
+            if (viable, necessary) != (is_viable[node], is_necessary[node]):
+                is_viable[node] = is_viable[node] and viable
+                is_necessary[node] = is_necessary[node] and necessary
+                work.extend(child for child in children_indices[children_indptr[node]:children_indptr[node + 1]] if child in in_cone)
+
+        changed_nodes = list(toggled) + [node for node in cone if is_viable[node] != old_viable[node] or is_necessary[node] != old_necessary[node]]
+        graph.is_viable = np.array(is_viable, dtype=np.bool_)
+        graph.is_necessary = np.array(is_necessary, dtype=np.bool_)
+        graph._scalar_view = None
+        return changed_nodes
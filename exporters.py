@@ -0,0 +1,212 @@
+from itertools import islice
+import json
+from xml.sax.saxutils import escape, quoteattr
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def export(exporter, nodes, relationships, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream nodes and relationships to an exporter in chunks, the nodes first, and close it.
+
+    Parameters:
+    - exporter: An exporter instance, e.g. JsonlExporter.
+    - nodes: An iterable of (node id, (labels, properties)) tuples, see AttackSimulation.get_neo4j_node().
+    - relationships: An iterable of (from id, to id) tuples.
+    - chunk_size: The number of nodes or relationships passed to the exporter at a time.
+    """
+    with exporter:
+        for chunk in chunks(nodes, chunk_size):
+            exporter.write_nodes(chunk)
+        for chunk in chunks(relationships, chunk_size):
+            exporter.write_relationships(chunk)
+
+
+def chunks(rows, chunk_size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Exporter:
+
+    def __init__(self, path):
+        """
+        Base class of the file exporters. The nodes are written with write_nodes() before the
+        relationships are written with write_relationships(), one call per chunk.
+
+        Parameters:
+        - path: The output file.
+        """
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, 'w', encoding='utf-8')
+        self.write_header()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.write_footer()
+        finally:
+            self.file.close()
+
+    def write_header(self):
+        pass
+
+    def write_footer(self):
+        pass
+
+    def write_nodes(self, nodes):
+        raise NotImplementedError
+
+    def write_relationships(self, relationships):
+        raise NotImplementedError
+
+
+class JsonlExporter(Exporter):
+    """
+    One JSON object per line: {"kind": "node", "id": ..., "labels": [...], <properties>} for the
+    nodes and {"kind": "relationship", "from": ..., "to": ...} for the relationships.
+    """
+
+    def write_nodes(self, nodes):
+        self.file.write("".join(json.dumps({"kind": "node", "id": node_id, "labels": labels, **properties}) + "\n"
+                                for node_id, (labels, properties) in nodes))
+
+    def write_relationships(self, relationships):
+        self.file.write("".join(json.dumps({"kind": "relationship", "from": from_id, "to": to_id}) + "\n"
+                                for from_id, to_id in relationships))
+
+
+class GraphMLExporter(Exporter):
+    """
+    GraphML with the labels and properties as node data. The data keys are declared from the
+    properties of the first node.
+    """
+
+    GRAPHML_TYPES = {bool: "boolean", int: "long", float: "double"}
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.keys = None
+
+    def write_header(self):
+        self.file.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                        '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+
+    def declare_keys(self, properties):
+        self.keys = ["labels"] + list(properties)
+        declarations = ['  <key id="labels" for="node" attr.name="labels" attr.type="string"/>\n']
+        for name, value in properties.items():
+            graphml_type = self.GRAPHML_TYPES.get(type(value), "string")
+            declarations.append(f'  <key id={quoteattr(name)} for="node" attr.name={quoteattr(name)} attr.type="{graphml_type}"/>\n')
+        self.file.write("".join(declarations) + '  <graph id="attack_graph" edgedefault="directed">\n')
+
+    def write_nodes(self, nodes):
+        lines = []
+        for node_id, (labels, properties) in nodes:
+            if self.keys is None:
+                self.declare_keys(properties)
+            lines.append(f'    <node id={quoteattr(node_id)}>\n')
+            lines.append(f'      <data key="labels">{escape(":".join(labels))}</data>\n')
+            for name, value in properties.items():
+                if value is not None:
+                    value = str(value).lower() if isinstance(value, bool) else str(value)
+                    lines.append(f'      <data key={quoteattr(name)}>{escape(value)}</data>\n')
+            lines.append('    </node>\n')
+        self.file.write("".join(lines))
+
+    def write_relationships(self, relationships):
+        if self.keys is None:
+            self.declare_keys({})
+        self.file.write("".join(f'    <edge source={quoteattr(from_id)} target={quoteattr(to_id)}/>\n'
+                                for from_id, to_id in relationships))
+
+    def write_footer(self):
+        if self.keys is None:
+            self.declare_keys({})
+        self.file.write('  </graph>\n</graphml>\n')
+
+
+class DotExporter(Exporter):
+    """
+    Graphviz DOT with the node name as label and the properties as node attributes.
+    Horizon nodes are drawn dashed.
+    """
+
+    def write_header(self):
+        self.file.write("digraph attack_graph {\n")
+
+    def write_nodes(self, nodes):
+        lines = []
+        for node_id, (labels, properties) in nodes:
+            attributes = {"label": properties.get("name", node_id)}
+            attributes.update((name, value) for name, value in properties.items() if value is not None)
+            if properties.get("is_horizon_node"):
+                attributes["style"] = "dashed"
+            lines.append(f"  {dot_id(node_id)} [{', '.join(f'{name}={dot_id(value)}' for name, value in attributes.items())}];\n")
+        self.file.write("".join(lines))
+
+    def write_relationships(self, relationships):
+        self.file.write("".join(f"  {dot_id(from_id)} -> {dot_id(to_id)};\n" for from_id, to_id in relationships))
+
+    def write_footer(self):
+        self.file.write("}\n")
+
+
+def dot_id(value):
+    """
+    Quote a value as a DOT identifier.
+    """
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+class ParquetExporter:
+
+    def __init__(self, path):
+        """
+        Two Parquet files, <path>.nodes.parquet with the id, labels and properties of the nodes
+        and <path>.relationships.parquet with the from and to ids. Every chunk is written as a
+        row group. Requires pyarrow.
+
+        Parameters:
+        - path: The path of the output files without the extension.
+        """
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as error:
+            raise ImportError("The Parquet exporter requires pyarrow, install it with 'pip install pyarrow'.") from error
+        self.pyarrow = pyarrow
+        self.parquet = pyarrow.parquet
+        self.nodes_path = path + ".nodes.parquet"
+        self.relationships_path = path + ".relationships.parquet"
+        self.writers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for writer in self.writers.values():
+            writer.close()
+
+    def write_table(self, path, rows):
+        if path not in self.writers:
+            table = self.pyarrow.Table.from_pylist(rows)
+            # Columns without any value in the first chunk are stored as strings.
+            schema = self.pyarrow.schema([field.with_type(self.pyarrow.string()) if self.pyarrow.types.is_null(field.type) else field
+                                          for field in table.schema])
+            self.writers[path] = self.parquet.ParquetWriter(path, schema)
+        writer = self.writers[path]
+        writer.write_table(self.pyarrow.Table.from_pylist(rows, schema=writer.schema))
+
+    def write_nodes(self, nodes):
+        self.write_table(self.nodes_path, [{"id": node_id, "labels": labels, **properties} for node_id, (labels, properties) in nodes])
+
+    def write_relationships(self, relationships):
+        self.write_table(self.relationships_path, [{"from": from_id, "to": to_id} for from_id, to_id in relationships])
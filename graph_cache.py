@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import maltoolbox
+import maltoolbox.attackgraph.analyzers.apriori
+import maltoolbox.attackgraph.attackgraph
+import maltoolbox.language.classes_factory
+import maltoolbox.language.specification
+import maltoolbox.model.model
+
+import compiled_graph
+import constants
+
+# Part of the cache key, change it when the layout of the cached arrays changes.
+CACHE_VERSION = "3"
+
+
+def cache_key(mar_file, model_file):
+    """
+    Hash the contents of the MAR archive and the model file, together with the cache version and
+    the mal-toolbox version that generates the attack graph.
+
+    Parameters:
+    - mar_file: Path to the MAR archive.
+    - model_file: Path to the model file.
+
+    Returns:
+    - key: A hexadecimal SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{CACHE_VERSION}:{maltoolbox.__version__}".encode())
+    for path in [mar_file, model_file]:
+        digest.update(b"\0")
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_attack_graph(mar_file, model_file):
+    """
+    Generate the attack graph of a model like main.py does: load the language and the model,
+    generate the attack graph, attach the attackers of the model and calculate the viability and
+    necessity of the nodes.
+
+    Parameters:
+    - mar_file: Path to the MAR archive.
+    - model_file: Path to the model file.
+
+    Returns:
+    - attackgraph: A mal-toolbox AttackGraph instance.
+    - model: The mal-toolbox Model instance.
+    """
+    lang_spec = maltoolbox.language.specification.load_language_specification_from_mar(mar_file)
+    lang_classes_factory = maltoolbox.language.classes_factory.LanguageClassesFactory(lang_spec)
+    lang_classes_factory.create_classes()
+    model = maltoolbox.model.model.Model("model", lang_spec, lang_classes_factory)
+    model.load_from_file(model_file)
+    attackgraph = maltoolbox.attackgraph.attackgraph.AttackGraph()
+    attackgraph.generate_graph(lang_spec, model)
+    attackgraph.attach_attackers(model)
+    maltoolbox.attackgraph.analyzers.apriori.calculate_viability_and_necessity(attackgraph)
+    return attackgraph, model
+
+
+def save_graph(graph, directory, ttcs=None):
+    """
+    Save a compiled graph as one .npy file per array. The directory is written next to its final
+    place and renamed, so a reader never sees a partly written cache entry.
+
+    Parameters:
+    - graph: A CompiledAttackGraph instance.
+    - directory: The directory of the cache entry.
+    - ttcs: Optional list with the ttc of every node, saved as JSON.
+    """
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    temporary_directory = tempfile.mkdtemp(dir=parent)
+    try:
+        for name, array in graph.to_arrays().items():
+            np.save(os.path.join(temporary_directory, name + ".npy"), array)
+        if ttcs is not None:
+            with open(os.path.join(temporary_directory, "ttcs.json"), 'w') as file:
+                json.dump(ttcs, file)
+        os.replace(temporary_directory, directory)
+    except OSError:
+        # Another process saved the same entry first.
+        shutil.rmtree(temporary_directory, ignore_errors=True)
+        if not os.path.isdir(directory):
+            raise
+
+
+def load_graph(directory):
+    """
+    Load a compiled graph saved with save_graph(). The arrays are memory-mapped read-only, set the
+    costs with CompiledAttackGraph.set_costs().
+
+    Parameters:
+    - directory: The directory of the cache entry.
+
+    Returns:
+    - graph: A CompiledAttackGraph instance.
+    """
+    arrays = {}
+    for name in compiled_graph.ARRAY_NAMES + ["node_ids", "names"]:
+        arrays[name] = np.load(os.path.join(directory, name + ".npy"), mmap_mode='r')
+    return compiled_graph.CompiledAttackGraph.from_arrays(arrays)
+
+
+def load_ttcs(directory):
+    """
+    Load the ttcs saved with save_graph(), e.g. for help_functions.costs_from_ttc().
+
+    Parameters:
+    - directory: The directory of the cache entry.
+
+    Returns:
+    - ttcs: A list with the ttc of every node.
+    """
+    with open(os.path.join(directory, "ttcs.json")) as file:
+        return json.load(file)
+
+
+def cache_entry(mar_file=constants.MAR_ARCHIVE, model_file=constants.MODEL_FILE, cache_dir=constants.GRAPH_CACHE_DIR):
+    """
+    Get the cache entry of a model, and generate it with build_attack_graph() if it does not exist.
+    The cache entry is keyed by the contents of the MAR archive and the model file, so it is
+    rebuilt when either of them changes.
+
+    Parameters:
+    - mar_file: Path to the MAR archive.
+    - model_file: Path to the model file.
+    - cache_dir: The cache directory.
+
+    Returns:
+    - directory: The directory of the cache entry, see load_graph() and load_ttcs().
+    """
+    directory = os.path.join(cache_dir, cache_key(mar_file, model_file))
+    if not os.path.isdir(directory):
+        attackgraph, _ = build_attack_graph(mar_file, model_file)
+        save_graph(compiled_graph.CompiledAttackGraph(attackgraph.nodes), directory, [node.ttc for node in attackgraph.nodes])
+    return directory
+
+
+def load_or_build_graph(mar_file=constants.MAR_ARCHIVE, model_file=constants.MODEL_FILE, cache_dir=constants.GRAPH_CACHE_DIR):
+    """
+    Load the compiled attack graph of a model from the cache, or generate it and save it in the
+    cache first, see cache_entry().
+
+    The cached graph holds the structure, node types, viability and necessity of the attack graph,
+    but no costs and no mal-toolbox objects. It is meant for the queries on compiled graphs, e.g.
+    batch.run_batch() and monte_carlo.monte_carlo_random_path().
+
+    Parameters:
+    - mar_file: Path to the MAR archive.
+    - model_file: Path to the model file.
+    - cache_dir: The cache directory.
+
+    Returns:
+    - graph: A CompiledAttackGraph instance with all costs 0.
+    """
+    return load_graph(cache_entry(mar_file, model_file, cache_dir))
@@ -0,0 +1,193 @@
+"""
+Headless batch runner: run the jobs of a JSONL file without any input() prompts.
+
+Every line of the job file is a JSON object with the fields below, all optional except where noted:
+- id: Copied to the result line.
+- mar, model: The MAR archive and the model file, default are the files of constants.py.
+- entry_points: A list of attack step ids, or of [asset id, [attack step names]] pairs like
+                help_functions.add_entry_points_to_attacker(). Default is the attacker node.
+- attacker: The id of the attacker in the model whose node is used when there are no entry_points,
+            default is the first attacker.
+- algorithm: One of batch.ALGORITHMS, default is 'dijkstra'.
+- target: The target attack step id, needed by 'dijkstra' and 'a_star'.
+- budget: The attacker cost budget, needed by 'bfs' and 'budget_region'.
+- seed: The seed of 'random_path' and of the 'ttc' cost mode.
+- cost_mode: 'file' for the costs of the cost file (default), 'ttc' for costs sampled from the ttc
+             distributions, 'mean' or a quantile in [0, 1) for the closed form of the distributions.
+- costs: The cost file of the 'file' cost mode, default is constants.COST_FILE.
+
+The attack graph of a model is loaded once from the graph cache (see graph_cache.py) and shared by
+all jobs on that model. One JSON result line is written per job, in the order of the jobs, with the
+fields id, job_index, cost, target_reached, expanded_nodes, path and seconds, or id, job_index and
+error if the job failed.
+
+Run from the repository root with:
+python headless.py jobs.jsonl --output results.jsonl
+"""
+import argparse
+import json
+import sys
+import time
+
+import batch
+import constants
+import graph_cache
+import help_functions
+import heuristics
+
+COST_MODES = ["file", "ttc", "mean"]
+
+
+class HeadlessRunner:
+
+    def __init__(self, cache_dir=constants.GRAPH_CACHE_DIR):
+        """
+        Runs jobs against cached attack graphs. The graphs, costs and heuristics are kept between
+        jobs, so jobs on the same model and costs only pay for their own query.
+
+        Parameters:
+        - cache_dir: The graph cache directory.
+        """
+        self.cache_dir = cache_dir
+        # Graph cache directory, graph and model JSON per (mar, model) pair.
+        self.models = {}
+        # Graph with costs and A* heuristic per (mar, model, cost mode, seed, cost file).
+        self.costed_graphs = {}
+        self.heuristics = {}
+
+    def load_model(self, mar_file, model_file):
+        key = (mar_file, model_file)
+        if key not in self.models:
+            directory = graph_cache.cache_entry(mar_file, model_file, self.cache_dir)
+            with open(model_file) as file:
+                model_json = json.load(file)
+            self.models[key] = (directory, graph_cache.load_graph(directory), model_json)
+        return self.models[key]
+
+    def costed_graph(self, mar_file, model_file, cost_mode, seed, cost_file):
+        """
+        Get the graph of a model with the costs of a cost mode, see the module docstring.
+        """
+        key = (mar_file, model_file, cost_mode, seed if cost_mode == "ttc" else None, cost_file if cost_mode == "file" else None)
+        if key not in self.costed_graphs:
+            directory, graph, _ = self.load_model(mar_file, model_file)
+            if cost_mode == "file":
+                with open(cost_file) as file:
+                    cost_dictionary = json.load(file)
+                cost = [cost_dictionary.get(node_id, 0) for node_id in graph.node_ids]
+            elif cost_mode == "ttc":
+                cost = help_functions.costs_from_ttc(graph_cache.load_ttcs(directory), 100, seed)
+            else:
+                cost = help_functions.analytic_costs_from_ttc(graph_cache.load_ttcs(directory), cost_mode)
+            self.costed_graphs[key] = graph.with_costs(cost)
+        return key, self.costed_graphs[key]
+
+    def entry_points(self, graph, model_json, job):
+        """
+        Resolve the entry points of a job to attack step ids.
+        """
+        entry_points = job.get("entry_points")
+        if entry_points is None:
+            attackers = model_json.get("attackers", {})
+            if not attackers:
+                raise ValueError("The model has no attackers, set the entry_points of the job.")
+            attacker_id = str(job.get("attacker", next(iter(attackers))))
+            if attacker_id not in attackers:
+                raise ValueError(f"Unknown attacker {attacker_id}.")
+            return [f"Attacker:{attacker_id}:firstSteps"]
+        node_ids = []
+        for entry_point in entry_points:
+            if isinstance(entry_point, str):
+                node_ids.append(entry_point)
+                continue
+            asset_id, attack_steps = entry_point
+            asset = model_json["assets"].get(str(asset_id))
+            if asset is None:
+                raise ValueError(f"Unknown asset {asset_id}.")
+            node_ids.extend(f"{asset['metaconcept']}:{asset_id}:{attack_step}" for attack_step in attack_steps)
+        return node_ids
+
+    def run_job(self, job, job_index=0):
+        """
+        Run one job.
+
+        Parameters:
+        - job: A job dictionary, see the module docstring.
+        - job_index: The index of the job, copied to the result.
+
+        Returns:
+        - result: The result dictionary.
+        """
+        start = time.perf_counter()
+        mar_file = job.get("mar", constants.MAR_ARCHIVE)
+        model_file = job.get("model", constants.MODEL_FILE)
+        cost_mode = job.get("cost_mode", "file")
+        if cost_mode not in COST_MODES and not isinstance(cost_mode, (int, float)):
+            raise ValueError(f"Unknown cost mode {cost_mode!r}, use one of {COST_MODES} or a quantile in [0, 1).")
+        _, _, model_json = self.load_model(mar_file, model_file)
+        key, graph = self.costed_graph(mar_file, model_file, cost_mode, job.get("seed"), job.get("costs", constants.COST_FILE))
+        algorithm = job.get("algorithm", "dijkstra")
+        if algorithm == "a_star" and key not in self.heuristics:
+            self.heuristics[key] = heuristics.LandmarkHeuristic(graph)
+        batch_job = batch.BatchJob(self.entry_points(graph, model_json, job), job.get("target"), job.get("budget"), algorithm, job.get("seed"))
+        result = batch.run_job(graph, batch_job, job_index, self.heuristics.get(key))
+        return {
+            "id": job.get("id"),
+            "job_index": job_index,
+            "cost": result.cost,
+            "target_reached": result.target_reached,
+            "expanded_nodes": result.expanded_nodes,
+            "path": result.path,
+            "seconds": time.perf_counter() - start
+            }
+
+    def run(self, lines):
+        """
+        Run the jobs of a JSONL file. A job that fails gives a result with an error, the other
+        jobs still run.
+
+        Parameters:
+        - lines: An iterable of lines, e.g. an open job file. Empty lines are skipped.
+
+        Returns:
+        - results: A generator of result dictionaries in the same order as the jobs.
+        """
+        job_index = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            job = {}
+            try:
+                job = json.loads(line)
+                yield self.run_job(job, job_index)
+            except (ValueError, KeyError, TypeError, OSError) as error:
+                yield {"id": job.get("id") if isinstance(job, dict) else None, "job_index": job_index, "error": str(error)}
+            job_index += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("jobs", help="the JSONL job file, '-' for stdin")
+    parser.add_argument("--output", help="write the results to this JSONL file instead of stdout")
+    parser.add_argument("--cache-dir", default=constants.GRAPH_CACHE_DIR)
+    args = parser.parse_args()
+
+    runner = HeadlessRunner(args.cache_dir)
+    jobs = sys.stdin if args.jobs == "-" else open(args.jobs)
+    output = open(args.output, 'w') if args.output else sys.stdout
+    failed = 0
+    try:
+        for result in runner.run(jobs):
+            failed += "error" in result
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+    finally:
+        if jobs is not sys.stdin:
+            jobs.close()
+        if output is not sys.stdout:
+            output.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
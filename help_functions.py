@@ -1,5 +1,6 @@
 from typing import List
 import json
+import math
 import random
 import numpy as np
 
@@ -62,53 +63,158 @@ def load_costs_from_file():
         # Handle file not found or invalid JSON
         return {}
 
-def cost_from_ttc(ttc, num_samples=100):
-    sum_of_samples = 0
-    distribution = ttc['name']
-    for _ in range(num_samples):
-        sample = 0
-        if distribution == "EasyAndCertain":
-            # Generate sample for EasyAndCertain distribution.
-            sample = process_sample({'Exponential': 1})
-        elif distribution == "EasyAndUncertain":
-            # Generate sample for EasyAndUncertain distribution.
-            sample = process_sample({'Exponential': 1, 'Bernoulli': 0.5})
-        elif distribution == "HardAndCertain":
-            # Generate sample for HardAndCertain distribution.
-            sample = process_sample({'Exponential': 0.1})
-        elif distribution == "HardAndUncertain":
-            # Generate sample for HardAndUncertain distribution.
-            sample = process_sample({'Exponential': 0.1, 'Bernoulli': 0.5})
-        elif distribution == "VeryHardAndCertain":
-            # Generate sample for VeryHardAndCertain distribution.
-            sample = process_sample({'Exponential': 0.01})
-        elif distribution == "VeryHardAndUncertain":
-            # Generate sample for VeryHardAndUncertain distribution.
-            sample = process_sample({'Exponential': 0.01, 'Bernoulli': 0.5})
-        elif distribution == "Exponential":
-            # Generate sample for custom Exponential distribution.
-            scale = float(ttc['arguments'][0])
-            sample = process_sample({'Exponential': scale})
-        sum_of_samples += sample
-
-    cost = sum_of_samples / num_samples
-    return cost
-
-def process_sample(distribution):
-    MAX_COST = 500
-    # Generate a random sample for the given distribution
+# Samples of the uncertain distributions that fail the Bernoulli trial get this cost.
+MAX_COST = 500
+
+# Sampling distributions of the named TTC distributions: the rate of the exponential distribution
+# and, for the uncertain ones, the probability of the Bernoulli trial that gives MAX_COST.
+TTC_DISTRIBUTIONS = {
+    "EasyAndCertain": {'Exponential': 1},
+    "EasyAndUncertain": {'Exponential': 1, 'Bernoulli': 0.5},
+    "HardAndCertain": {'Exponential': 0.1},
+    "HardAndUncertain": {'Exponential': 0.1, 'Bernoulli': 0.5},
+    "VeryHardAndCertain": {'Exponential': 0.01},
+    "VeryHardAndUncertain": {'Exponential': 0.01, 'Bernoulli': 0.5}
+    }
+
+def ttc_distribution(ttc):
+    """
+    Get the sampling distribution of a ttc.
+
+    Arguments:
+    ttc             - the ttc of an attack step, e.g. {'name': 'Exponential', 'arguments': [0.1]}.
+
+    Return:
+    distribution    - a dictionary like the values of TTC_DISTRIBUTIONS, or None if the ttc is
+                      empty or has no known distribution (the cost is 0).
+    """
+    if not ttc or 'name' not in ttc:
+        return None
+    if ttc['name'] == "Exponential":
+        return {'Exponential': float(ttc['arguments'][0])}
+    return TTC_DISTRIBUTIONS.get(ttc['name'])
+
+def sample_distribution(distribution, size, rng):
+    """
+    Draw samples from a sampling distribution in one call.
+
+    Arguments:
+    distribution    - a dictionary like the values of TTC_DISTRIBUTIONS.
+    size            - the shape of the sample array.
+    rng             - a numpy.random.Generator instance.
+
+    Return:
+    samples         - a numpy array of samples.
+    """
+    samples = rng.exponential(scale=1/distribution['Exponential'], size=size)
+    if 'Bernoulli' in distribution:
+        # Mixture of exponential and constant distribution.
+        samples[rng.random(size) < distribution['Bernoulli']] = MAX_COST
+    return samples
+
+def costs_from_ttc(ttcs, num_samples=100, seed=None):
+    """
+    Calculate the cost of many attack steps as the mean of samples drawn from their ttc distribution.
+    The attack steps are grouped by distribution, and the samples of a group are drawn in one call.
+
+    Arguments:
+    ttcs            - a list of ttcs, see ttc_distribution().
+    num_samples     - the number of samples per attack step.
+    seed            - optional seed or numpy.random.Generator, the same seed gives the same costs.
+
+    Return:
+    costs           - a numpy array with the cost of each ttc.
+    """
+    rng = np.random.default_rng(seed)
+    groups = {}
+    for i, ttc in enumerate(ttcs):
+        distribution = ttc_distribution(ttc)
+        if distribution is not None:
+            groups.setdefault(tuple(sorted(distribution.items())), []).append(i)
+
+    costs = np.zeros(len(ttcs), dtype=np.float64)
+    for distribution, indices in groups.items():
+        samples = sample_distribution(dict(distribution), (len(indices), num_samples), rng)
+        costs[indices] = samples.mean(axis=1)
+    return costs
+
+def distribution_mean(distribution):
+    """
+    Calculate the expected value of a sampling distribution.
+
+    Arguments:
+    distribution    - a dictionary like the values of TTC_DISTRIBUTIONS.
+
+    Return:
+    mean            - the expected value of a sample.
+    """
+    mean = 1/distribution['Exponential']
     if 'Bernoulli' in distribution:
-        # Mixture of exponential and constant distribution
         prob = distribution['Bernoulli']
-        scale = distribution['Exponential']
-        scale = 1/scale
-        sample = np.random.exponential(scale=scale) if np.random.choice([0, 1], p=[prob, 1 - prob]) else MAX_COST
-    else:
-        # Pure exponential distribution
-        scale = distribution['Exponential']
-        scale = 1/scale
-        sample = np.random.exponential(scale=scale)
-    return sample
+        mean = (1 - prob)*mean + prob*MAX_COST
+    return mean
+
+def distribution_quantile(distribution, quantile):
+    """
+    Calculate a quantile of a sampling distribution from the inverse of its distribution function.
+
+    Arguments:
+    distribution    - a dictionary like the values of TTC_DISTRIBUTIONS.
+    quantile        - the quantile, a number in [0, 1).
+
+    Return:
+    value           - the smallest cost x with P(sample <= x) >= quantile.
+    """
+    rate = distribution['Exponential']
+    prob = distribution.get('Bernoulli', 0)
+    # The exponential part has weight 1 - prob, the constant MAX_COST has weight prob.
+    if quantile < 1 - prob:
+        value = -math.log(1 - quantile/(1 - prob))/rate
+        if value <= MAX_COST or prob == 0:
+            return value
+    if quantile <= (1 - prob)*(1 - math.exp(-rate*MAX_COST)) + prob:
+        return MAX_COST
+    return -math.log(1 - (quantile - prob)/(1 - prob))/rate
+
+def analytic_costs_from_ttc(ttcs, statistic="mean"):
+    """
+    Calculate the cost of many attack steps from the closed form of their ttc distribution, without
+    sampling. The statistic is calculated once per distribution.
+
+    Arguments:
+    ttcs            - a list of ttcs, see ttc_distribution().
+    statistic       - "mean" for the expected value, or a number in [0, 1) for that quantile.
+
+    Return:
+    costs           - a numpy array with the cost of each ttc.
+    """
+    if statistic != "mean" and not (isinstance(statistic, (int, float)) and 0 <= statistic < 1):
+        raise ValueError(f"Unknown ttc statistic {statistic!r}, use 'mean' or a quantile in [0, 1).")
+    table = {}
+    costs = np.zeros(len(ttcs), dtype=np.float64)
+    for i, ttc in enumerate(ttcs):
+        distribution = ttc_distribution(ttc)
+        if distribution is None:
+            continue
+        key = tuple(sorted(distribution.items()))
+        if key not in table:
+            table[key] = distribution_mean(distribution) if statistic == "mean" else distribution_quantile(distribution, statistic)
+        costs[i] = table[key]
+    return costs
+
+def cost_from_ttc(ttc, num_samples=100, seed=None):
+    """
+    Calculate the cost of an attack step as the mean of samples drawn from its ttc distribution.
+
+    Arguments:
+    ttc             - the ttc of the attack step, see ttc_distribution().
+    num_samples     - the number of samples.
+    seed            - optional seed or numpy.random.Generator.
+
+    Return:
+    cost            - the mean of the samples, 0 if the ttc has no known distribution.
+    """
+    return float(costs_from_ttc([ttc], num_samples, seed)[0])
 
 def add_entry_points_to_attacker(model, entry_point_attack_steps, attacker_index=0):
     for asset_id, attack_steps in entry_point_attack_steps:
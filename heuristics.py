@@ -0,0 +1,140 @@
+from collections import deque
+import heapq
+import math
+import numpy as np
+
+
+def one_to_all_costs(graph, source, reverse=False):
+    """
+    Compute the cheapest cost from the source node to all nodes (or from all nodes to the source
+    node if reverse is True), when every node is treated as an 'or' node and entering a node
+    costs graph.cost of that node. This ignores the 'and' logic and viability, so the result is
+    a lower bound of the cost of any attack path between the nodes.
+
+    Parameters:
+    - graph: A CompiledAttackGraph instance.
+    - source: The node index to search from.
+    - reverse: If True, follow parents instead of children.
+
+    Returns:
+    - distances: A NumPy array with the costs, math.inf for nodes that can not be reached.
+    """
+    view = graph.scalar_view()
+    if reverse:
+        indptr, indices = view.parents_indptr, view.parents_indices
+    else:
+        indptr, indices = view.children_indptr, view.children_indices
+    costs = view.cost
+    distances = [math.inf] * len(graph)
+    distances[source] = 0
+    # Stale entries of nodes whose distance was lowered after they were pushed are skipped.
+    open_set = [(0, source)]
+    while open_set:
+        distance, node = heapq.heappop(open_set)
+        if distance > distances[node]:
+            continue
+        # In reverse, the cost of entering the current node is paid when coming from a parent.
+        step_cost = costs[node] if reverse else 0
+        for k in range(indptr[node], indptr[node + 1]):
+            neighbour = indices[k]
+            new_distance = distance + (step_cost if reverse else costs[neighbour])
+            if new_distance < distances[neighbour]:
+                distances[neighbour] = new_distance
+                heapq.heappush(open_set, (new_distance, neighbour))
+    return np.array(distances, dtype=np.float64)
+
+
+class LandmarkHeuristic:
+
+    def __init__(self, graph, number_of_landmarks=8):
+        """
+        ALT (A*, landmarks and the triangle inequality) heuristic for the attack graph.
+
+        For every landmark L the costs d(L, v) and d(v, L) are precomputed once for all nodes v.
+        The triangle inequality then gives two lower bounds of the cost d(v, t) to a target t:
+        d(L, t) - d(L, v) and d(v, L) - d(t, L). The costs are computed on the 'or' relaxation of
+        the graph with the original node costs, so the bound is admissible (and consistent) for
+        the search in AttackSimulation.dijkstra(), where 'and' nodes can only make paths more
+        expensive.
+
+        Parameters:
+        - graph: A CompiledAttackGraph instance. The heuristic is only valid for the costs the
+                 graph had when it was built.
+        - number_of_landmarks: The maximum number of landmarks.
+        """
+        self.graph = graph
+        self.landmarks = self.select_landmarks(number_of_landmarks)
+        self.from_landmark = np.array([one_to_all_costs(graph, landmark) for landmark in self.landmarks]).reshape(len(self.landmarks), len(graph))
+        self.to_landmark = np.array([one_to_all_costs(graph, landmark, reverse=True) for landmark in self.landmarks]).reshape(len(self.landmarks), len(graph))
+
+    def select_landmarks(self, number_of_landmarks):
+        """
+        Select landmarks with the 'farthest' strategy: the next landmark is the node with the
+        largest number of hops (ignoring edge direction) to the landmarks selected so far.
+        Nodes in components without a landmark are selected first.
+
+        Parameters:
+        - number_of_landmarks: The maximum number of landmarks.
+
+        Returns:
+        - landmarks: A list of node indices.
+        """
+        size = len(self.graph)
+        landmarks = []
+        if size == 0:
+            return landmarks
+        # The first search only locates a node on the border of the graph.
+        hops = [math.inf] * size
+        self._update_hops(hops, 0)
+        candidate = max(range(size), key=hops.__getitem__)
+        hops = [math.inf] * size
+        while len(landmarks) < min(number_of_landmarks, size):
+            landmarks.append(candidate)
+            self._update_hops(hops, candidate)
+            candidate = max(range(size), key=hops.__getitem__)
+            if hops[candidate] == 0:
+                break
+        return landmarks
+
+    def _update_hops(self, hops, source):
+        """
+        Lower the number of hops (ignoring edge direction) to the closest landmark with the hops to the source node.
+        """
+        view = self.graph.scalar_view()
+        adjacency = ((view.children_indptr, view.children_indices), (view.parents_indptr, view.parents_indices))
+        hops[source] = 0
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            for indptr, indices in adjacency:
+                for k in range(indptr[node], indptr[node + 1]):
+                    neighbour = indices[k]
+                    if hops[node] + 1 < hops[neighbour]:
+                        hops[neighbour] = hops[node] + 1
+                        queue.append(neighbour)
+
+    def estimate(self, target):
+        """
+        Compute the lower bound of the cost from every node to the target.
+
+        Parameters:
+        - target: The target node index.
+
+        Returns:
+        - h_score: A NumPy array with the estimated costs. Nodes that can not reach the
+                   target get math.inf.
+        """
+        h_score = np.zeros(len(self.graph), dtype=np.float64)
+        if not self.landmarks:
+            return h_score
+        with np.errstate(invalid="ignore"):
+            # d(v, t) >= d(L, t) - d(L, v), informative when L reaches v.
+            from_target = self.from_landmark[:, target][:, None]
+            bound = np.where(np.isfinite(self.from_landmark), from_target - self.from_landmark, 0)
+            h_score = np.maximum(h_score, bound.max(axis=0))
+            # d(v, t) >= d(v, L) - d(t, L), informative when t reaches L.
+            to_target = self.to_landmark[:, target][:, None]
+            bound = np.where(np.isfinite(to_target), self.to_landmark - to_target, 0)
+            h_score = np.maximum(h_score, bound.max(axis=0))
+        h_score[target] = 0
+        return h_score
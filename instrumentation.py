@@ -0,0 +1,143 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+import cProfile
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+
+
+class SimulationStats:
+
+    def __init__(self, enabled=True, profile=False, trace_memory=False):
+        """
+        Counters and phase timings of a simulation, see AttackSimulation.set_stats().
+
+        The counters are added once per algorithm run from the counters the algorithms keep
+        anyway (e.g. AndOrSearch.expanded_nodes), not in the hot loops. A disabled instance
+        (see DISABLED) records nothing, so the instrumentation costs a method call per phase.
+
+        Parameters:
+        - enabled: Record counters and timings.
+        - profile: Also run cProfile during the phases, see profile_report().
+        - trace_memory: Also measure the peak memory of every phase with tracemalloc.
+        """
+        self.enabled = enabled
+        self.counters = Counter()
+        # Total seconds and number of runs of each phase.
+        self.timings = defaultdict(float)
+        self.phase_calls = Counter()
+        # Largest peak memory in bytes of each phase, if trace_memory is True.
+        self.peak_memory = {}
+        self.profiler = cProfile.Profile() if enabled and profile else None
+        self.trace_memory = enabled and trace_memory
+        self.lock = threading.Lock()
+        # True while a phase of the main thread is profiled or traced.
+        self._active = False
+
+    def count(self, name, value=1):
+        """
+        Add a value to a counter.
+        """
+        if self.enabled:
+            with self.lock:
+                self.counters[name] += value
+
+    def count_search(self, search):
+        """
+        Add the counters of an and_or_search.AndOrSearch run.
+        """
+        if self.enabled:
+            with self.lock:
+                self.counters["heap_pushes"] += search.heap_pushes
+                self.counters["heap_pops"] += search.expanded_nodes
+                self.counters["edges_relaxed"] += search.relaxed_edges
+
+    def phase(self, name):
+        """
+        Time a phase of the simulation, e.g. with stats.phase("search"): ...
+
+        Parameters:
+        - name: The phase, e.g. "graph_build", "costs", "search", "reconstruction" or "upload".
+        """
+        if not self.enabled:
+            return nullcontext()
+        return self._phase(name)
+
+    @contextmanager
+    def _phase(self, name):
+        # Profiling and memory tracing are process wide, so only the outermost phase enables them.
+        outermost = threading.current_thread() is threading.main_thread() and not self._active
+        # Tracing started by the caller, e.g. benchmarks/scaling.py, is left running and its peak
+        # is not reset, so the peak of the phase then includes the caller's earlier peak.
+        started_tracing = False
+        if outermost:
+            self._active = True
+            if self.trace_memory and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            if self.profiler is not None:
+                self.profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            if outermost:
+                if self.profiler is not None:
+                    self.profiler.disable()
+                if self.trace_memory:
+                    peak_memory = tracemalloc.get_traced_memory()[1]
+                    if started_tracing:
+                        tracemalloc.stop()
+                    self.peak_memory[name] = max(self.peak_memory.get(name, 0), peak_memory)
+                self._active = False
+            with self.lock:
+                self.timings[name] += seconds
+                self.phase_calls[name] += 1
+
+    def profile_report(self, limit=20, sort="cumulative"):
+        """
+        Get the cProfile report of the profiled phases.
+
+        Parameters:
+        - limit: The number of functions in the report.
+        - sort: The pstats sort key.
+
+        Returns:
+        - report: The report as text, or an empty string if profiling is not enabled.
+        """
+        if self.profiler is None:
+            return ""
+        stream = io.StringIO()
+        pstats.Stats(self.profiler, stream=stream).sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+    def as_dict(self):
+        """
+        Get the stats as a dictionary, e.g. to save them as JSON.
+        """
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "timings": dict(self.timings),
+                "phase_calls": dict(self.phase_calls),
+                "peak_memory": dict(self.peak_memory)
+                }
+
+    def reset(self):
+        """
+        Clear all counters and timings.
+        """
+        with self.lock:
+            self.counters.clear()
+            self.timings.clear()
+            self.phase_calls.clear()
+            self.peak_memory.clear()
+        if self.profiler is not None:
+            self.profiler = cProfile.Profile()
+
+
+# Shared disabled instance, the default of AttackSimulation.
+DISABLED = SimulationStats(enabled=False)
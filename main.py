@@ -7,6 +7,7 @@ import maltoolbox.language.classes_factory
 import maltoolbox.attackgraph.analyzers.apriori
 
 from attack_simulation import AttackSimulation
+import background_sink
 import constants
 import help_functions
 
@@ -50,56 +51,77 @@ def main():
     print("The model and attackgraph is uploaded to Neo4j.")
 
     # Create AttackSimulation.
-    attack_simulation = AttackSimulation(attackgraph, attacker, use_ttc=False) 
+    # Only the attack steps the attacker can reach are compiled.
+    attack_simulation = AttackSimulation(attackgraph, attacker, use_ttc=False, prune_unreachable=True, prune_to_target=True)
 
-    # Display algorithm options.
-    attack_options = list(constants.ATTACK_OPTIONS.keys())
-    print(f"{constants.PINK}Choose any of the options below. If you want to exit, press any key.{constants.STANDARD}")
-    help_functions.print_dictionary(constants.ATTACK_OPTIONS) 
-    user_input = input(f"Which simulation? {attack_options}:")
+    # Upload the results to Neo4j on a background thread, so the simulation does not wait for it.
+    with background_sink.BackgroundSink() as sink:
+        attack_simulation.set_sink(sink)
+
+        # Display algorithm options.
+        attack_options = list(constants.ATTACK_OPTIONS.keys())
+        print(f"{constants.PINK}Choose any of the options below. If you want to exit, press any key.{constants.STANDARD}")
+        help_functions.print_dictionary(constants.ATTACK_OPTIONS) 
+        user_input = input(f"Which simulation? {attack_options}:")
     
-    if user_input == attack_options[0]:
-        # Traverse attack graph step by step.
-        print(f"{constants.PINK}{constants.ATTACK_OPTIONS[user_input]}{constants.STANDARD}")
-        attack_simulation.step_by_step_attack_simulation(neo4j_graph_connection)
-        attack_simulation.upload_graph_to_neo4j(neo4j_graph_connection, add_horizon=True)
-
-    elif user_input == attack_options[1]:
-        # Traverse attack graph with modified Dijkstra's algorithm - to get the shortest path.
-        print(f"{constants.PINK}{constants.ATTACK_OPTIONS[user_input]}{constants.STANDARD}")
-        target_node_id = input("Enter the target node id: ")
-        if target_node_id in attack_simulation.attackgraph_dictionary.keys():
-            attack_simulation.set_target_node(target_node_id)
-            cost = attack_simulation.dijkstra()
-            print("The cost for the attacker for traversing the path", cost)
-            attack_simulation.upload_graph_to_neo4j(neo4j_graph_connection, add_horizon=False)
+        if user_input == attack_options[0]:
+            # Traverse attack graph step by step.
+            print(f"{constants.PINK}{constants.ATTACK_OPTIONS[user_input]}{constants.STANDARD}")
+            attack_simulation.step_by_step_attack_simulation(neo4j_graph_connection)
+
+        elif user_input == attack_options[1]:
+            # Traverse attack graph with modified Dijkstra's algorithm - to get the shortest path.
+            print(f"{constants.PINK}{constants.ATTACK_OPTIONS[user_input]}{constants.STANDARD}")
+            target_node_id = input("Enter the target node id: ")
+            if target_node_id in attack_simulation.attackgraph_dictionary.keys():
+                attack_simulation.set_target_node(target_node_id)
+                cost = attack_simulation.dijkstra(use_a_star=True)
+                print("The cost for the attacker for traversing the path", cost)
+                print("The number of expanded nodes", attack_simulation.expanded_nodes)
+                print("The number of attack steps that can lead to the target", attack_simulation.pruning_stats.relevant_nodes)
+                attack_simulation.upload_graph_to_neo4j(neo4j_graph_connection, add_horizon=False)
 
-    elif user_input == attack_options[2]:
-        # Traverse attack graph with random algorithm - to get a random path.
-        # It is optional to enter a target and attacker cost budget.
-        print(f"{constants.PINK}{constants.ATTACK_OPTIONS[user_input]}{constants.STANDARD}")
-        target_node_id = input("Enter the target node id (or press enter): ")
-        if target_node_id in attack_simulation.attackgraph_dictionary.keys():
-            attack_simulation.set_target_node(target_node_id)
-        attacker_cost_budget = input("Enter the attacker cost budget as integer (or press enter): ")
-        if attacker_cost_budget != '':
-            attack_simulation.set_attacker_cost_budget(int(attacker_cost_budget))
-        cost = attack_simulation.random_path()
-        if attack_simulation.target_node != None and attack_simulation.target_node in attack_simulation.visited:
-            print("The target was found.")
-        print("The cost for the attacker for traversing the path", cost)
-        attack_simulation.upload_graph_to_neo4j(neo4j_graph_connection, add_horizon=False)
-
-    elif user_input == attack_options[3]:
-        # Traverse attack graph with breadth first search to retrieve the subgraph within the attacker
-        # cost budget.
-        print(f"{constants.PINK}{constants.ATTACK_OPTIONS[user_input]}{constants.STANDARD}")
-        attacker_cost_budget = input("Enter the attacker cost budget as integer: ")
-        if attacker_cost_budget != '':
-            attack_simulation.set_attacker_cost_budget(int(attacker_cost_budget))
-            cost = attack_simulation.bfs()
+        elif user_input == attack_options[2]:
+            # Traverse attack graph with random algorithm - to get a random path.
+            # It is optional to enter a target and attacker cost budget.
+            print(f"{constants.PINK}{constants.ATTACK_OPTIONS[user_input]}{constants.STANDARD}")
+            target_node_id = input("Enter the target node id (or press enter): ")
+            if target_node_id in attack_simulation.attackgraph_dictionary.keys():
+                attack_simulation.set_target_node(target_node_id)
+            attacker_cost_budget = input("Enter the attacker cost budget as integer (or press enter): ")
+            if attacker_cost_budget != '':
+                attack_simulation.set_attacker_cost_budget(int(attacker_cost_budget))
+            cost = attack_simulation.random_path()
+            if attack_simulation.target_node != None and attack_simulation.target_node in attack_simulation.visited:
+                print("The target was found.")
             print("The cost for the attacker for traversing the path", cost)
             attack_simulation.upload_graph_to_neo4j(neo4j_graph_connection, add_horizon=False)
 
+        elif user_input == attack_options[3]:
+            # Traverse attack graph with breadth first search to retrieve the subgraph within the attacker
+            # cost budget.
+            print(f"{constants.PINK}{constants.ATTACK_OPTIONS[user_input]}{constants.STANDARD}")
+            attacker_cost_budget = input("Enter the attacker cost budget as integer: ")
+            if attacker_cost_budget != '':
+                attack_simulation.set_attacker_cost_budget(int(attacker_cost_budget))
+                cost = attack_simulation.bfs()
+                print("The cost for the attacker for traversing the path", cost)
+                attack_simulation.upload_graph_to_neo4j(neo4j_graph_connection, add_horizon=False)
+
+        elif user_input == attack_options[4]:
+            # Find all attack steps within the attacker cost budget, each at its minimal cost.
+            print(f"{constants.PINK}{constants.ATTACK_OPTIONS[user_input]}{constants.STANDARD}")
+            attacker_cost_budget = input("Enter the attacker cost budget as integer: ")
+            if attacker_cost_budget != '':
+                attack_simulation.set_attacker_cost_budget(int(attacker_cost_budget))
+                cost = attack_simulation.budget_region()
+                print("The number of attack steps within the cost budget", len(attack_simulation.region_costs))
+                print("The total cost for the attacker for reaching all of them", cost)
+                attack_simulation.upload_graph_to_neo4j(neo4j_graph_connection, add_horizon=False)
+
+    # The sink waits for the uploads when it is closed.
+    stats = sink.stats()
+    print(f"Neo4j uploads: {stats.completed}, mean latency {stats.mean_latency:.3f} s, max latency {stats.max_latency:.3f} s, max queue depth {stats.max_queue_depth}")
+
 if __name__=='__main__':
     main()
@@ -0,0 +1,132 @@
+from concurrent.futures import ProcessPoolExecutor
+import math
+import os
+import random
+import numpy as np
+
+import traversal
+
+DEFAULT_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+# Graph of the worker process, set once by _initialize_worker().
+_worker_graph = None
+
+
+class MonteCarloResult:
+
+    def __init__(self, graph, costs, target_reached, compromise_counts, quantiles=DEFAULT_QUANTILES):
+        """
+        Aggregate statistics of random path rollouts.
+
+        Parameters:
+        - graph: The CompiledAttackGraph the rollouts were run on.
+        - costs: A NumPy array with the cost of every rollout.
+        - target_reached: A NumPy bool array, True for the rollouts that reached the target.
+        - compromise_counts: A NumPy array with the number of rollouts that compromised each node.
+        - quantiles: The quantiles of the cost distribution to compute.
+        """
+        self.graph = graph
+        self.rollouts = len(costs)
+        self.costs = costs
+        self.target_reached = target_reached
+        self.target_probability = float(target_reached.mean()) if self.rollouts else 0.0
+        self.mean_cost = float(costs.mean()) if self.rollouts else math.nan
+        self.cost_quantiles = self._quantiles(costs, quantiles)
+        # The cost distribution of the rollouts that reached the target.
+        self.target_cost_quantiles = self._quantiles(costs[target_reached], quantiles)
+        self.compromise_frequency = compromise_counts / max(self.rollouts, 1)
+
+    @staticmethod
+    def _quantiles(costs, quantiles):
+        if len(costs) == 0:
+            return {q: math.nan for q in quantiles}
+        return dict(zip(quantiles, np.quantile(costs, quantiles).tolist()))
+
+    def step_frequencies(self):
+        """
+        Get the compromise frequency of every attack step compromised in at least one rollout.
+
+        Returns:
+        - frequencies: A dictionary with attack step ids as keys and the fraction of rollouts
+                       that compromised the attack step as values.
+        """
+        nodes = np.flatnonzero(self.compromise_frequency)
+        return dict(zip(self.graph.ids(nodes), self.compromise_frequency[nodes].tolist()))
+
+
+def rollout_seed(seed, rollout):
+    """
+    The seed of one rollout, derived from the master seed and the rollout number only, so the
+    results do not depend on how the rollouts are split over processes.
+    """
+    return int(np.random.SeedSequence(seed, spawn_key=(rollout,)).generate_state(1)[0])
+
+
+def run_rollouts(graph, start_nodes, target_node, attacker_cost_budget, seed, first_rollout, rollouts):
+    """
+    Run a chunk of random path rollouts.
+
+    Returns:
+    - costs: A NumPy array with the cost of every rollout.
+    - target_reached: A NumPy bool array, True for the rollouts that reached the target.
+    - compromise_counts: A NumPy array with the number of rollouts that compromised each node.
+    """
+    costs = np.empty(rollouts, dtype=np.float64)
+    target_reached = np.zeros(rollouts, dtype=np.bool_)
+    reached_nodes = []
+    for i in range(rollouts):
+        rng = random.Random(rollout_seed(seed, first_rollout + i))
+        cost, reached_order, _, _ = traversal.random_path(graph, start_nodes, target_node, attacker_cost_budget, rng)
+        costs[i] = cost
+        target_reached[i] = target_node is not None and reached_order[-1] == target_node
+        reached_nodes.append(np.array(reached_order, dtype=np.int64))
+    compromise_counts = np.bincount(np.concatenate(reached_nodes) if reached_nodes else np.empty(0, dtype=np.int64), minlength=len(graph))
+    return costs, target_reached, compromise_counts
+
+
+def monte_carlo_random_path(graph, start_nodes, target_node=None, attacker_cost_budget=None, rollouts=1000,
+                            seed=0, max_workers=1, quantiles=DEFAULT_QUANTILES):
+    """
+    Estimate how likely an attacker reaches the target with many seeded random path rollouts
+    (see traversal.random_path()) in one call.
+
+    Every rollout gets its own random generator derived from the master seed and the rollout
+    number, so the result is the same for a given seed whatever the number of processes. The
+    per-rollout results are collected in NumPy arrays and aggregated once.
+
+    Parameters:
+    - graph: A CompiledAttackGraph instance with the costs set.
+    - start_nodes: The index of the node the attacker starts from, or a list of indices.
+    - target_node: Optional index of the target node.
+    - attacker_cost_budget: Optional cost budget.
+    - rollouts: The number of rollouts.
+    - seed: The master seed.
+    - max_workers: The number of worker processes, None for the number of CPUs. With 1 the
+                   rollouts run in the calling process.
+    - quantiles: The quantiles of the cost distribution to compute.
+
+    Returns:
+    - result: A MonteCarloResult instance.
+    """
+    if max_workers == 1 or rollouts < 2:
+        chunks = [run_rollouts(graph, start_nodes, target_node, attacker_cost_budget, seed, 0, rollouts)]
+    else:
+        max_workers = max_workers or os.cpu_count() or 1
+        bounds = np.linspace(0, rollouts, num=min(max_workers, rollouts) + 1, dtype=np.int64).tolist()
+        arguments = [(start_nodes, target_node, attacker_cost_budget, seed, first, last - first) for first, last in zip(bounds, bounds[1:])]
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_initialize_worker, initargs=(graph,)) as executor:
+            chunks = list(executor.map(_run_rollouts_in_worker, arguments))
+
+    costs = np.concatenate([chunk[0] for chunk in chunks])
+    target_reached = np.concatenate([chunk[1] for chunk in chunks])
+    compromise_counts = np.sum([chunk[2] for chunk in chunks], axis=0)
+    return MonteCarloResult(graph, costs, target_reached, compromise_counts, quantiles)
+
+
+def _initialize_worker(graph):
+    global _worker_graph
+    _worker_graph = graph
+
+
+def _run_rollouts_in_worker(arguments):
+    return run_rollouts(_worker_graph, *arguments)
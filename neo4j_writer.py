@@ -0,0 +1,221 @@
+DEFAULT_BATCH_SIZE = 1000
+
+
+class Neo4jBatchWriter:
+
+    def __init__(self, neo4j_graph_connection, batch_size=DEFAULT_BATCH_SIZE, stats=None):
+        """
+        Bulk writer for Neo4j. Nodes and relationships are sent as parameter lists to UNWIND Cypher
+        queries, one explicit transaction per chunk of batch_size rows, instead of one round trip
+        per node and relationship.
+
+        Parameters:
+        - neo4j_graph_connection: The Neo4j Graph instance, or any object with the begin(),
+                                  commit(transaction) and rollback(transaction) methods of
+                                  py2neo.Graph, whose transactions have run(cypher, parameters).
+        - batch_size: The maximum number of rows per transaction.
+        - stats: Optional instrumentation.SimulationStats instance that counts the round trips.
+        """
+        if batch_size < 1:
+            raise ValueError("The batch size must be at least 1.")
+        self.neo4j_graph_connection = neo4j_graph_connection
+        self.batch_size = batch_size
+        self.stats = stats
+
+    def run(self, cypher, parameters=None):
+        """
+        Run a Cypher query in its own explicit transaction.
+
+        Returns:
+        - records: The records returned by the query as a list of dictionaries.
+        """
+        transaction = self.neo4j_graph_connection.begin()
+        try:
+            records = transaction.run(cypher, parameters).data()
+        except BaseException:
+            self.neo4j_graph_connection.rollback(transaction)
+            raise
+        self.neo4j_graph_connection.commit(transaction)
+        if self.stats is not None:
+            self.stats.count("neo4j_round_trips")
+        return records
+
+    def delete_all(self):
+        """
+        Delete all nodes and relationships, batch_size nodes per transaction.
+        """
+        cypher = "MATCH (n) WITH n LIMIT $limit DETACH DELETE n RETURN count(*) AS deleted"
+        while True:
+            records = self.run(cypher, {"limit": self.batch_size})
+            if not records or records[0]["deleted"] < self.batch_size:
+                break
+
+    def replace_all(self, nodes, relationships):
+        """
+        Delete everything in the database and write the nodes and relationships, see create_nodes()
+        and create_relationships().
+        """
+        self.delete_all()
+        self.create_relationships(relationships, self.create_nodes(nodes))
+
+    def create_nodes(self, nodes):
+        """
+        Create nodes. Cypher labels can not be parameters, so the nodes are grouped by their labels
+        and every group is created with its own UNWIND query.
+
+        Parameters:
+        - nodes: A dictionary with a key for each node (e.g. the attack step id) as keys and
+                 (labels, properties) tuples as values. Properties that are None are not set.
+
+        Returns:
+        - neo4j_ids: A dictionary mapping the node keys to the internal Neo4j ids of the created nodes.
+        """
+        groups = {}
+        for key, (labels, properties) in nodes.items():
+            groups.setdefault(tuple(labels), []).append({"key": key, "properties": properties})
+
+        neo4j_ids = {}
+        for labels, rows in groups.items():
+            cypher = f"UNWIND $rows AS row CREATE (n{''.join(':' + escape_name(label) for label in labels)}) " \
+                     "SET n = row.properties RETURN row.key AS key, id(n) AS id"
+            for chunk in self.chunks(rows):
+                for record in self.run(cypher, {"rows": chunk}):
+                    neo4j_ids[record["key"]] = record["id"]
+        return neo4j_ids
+
+    def create_relationships(self, relationships, neo4j_ids, relationship_type="Relationship"):
+        """
+        Create relationships between nodes created with create_nodes().
+
+        Parameters:
+        - relationships: A list of (from_key, to_key) tuples with node keys.
+        - neo4j_ids: The dictionary returned by create_nodes().
+        - relationship_type: The type of the relationships.
+        """
+        rows = [{"from": neo4j_ids[from_key], "to": neo4j_ids[to_key]} for from_key, to_key in relationships]
+        cypher = "UNWIND $rows AS row MATCH (a) WHERE id(a) = row.from MATCH (b) WHERE id(b) = row.to " \
+                 f"CREATE (a)-[:{escape_name(relationship_type)}]->(b)"
+        for chunk in self.chunks(rows):
+            self.run(cypher, {"rows": chunk})
+
+    def update_nodes(self, changes, neo4j_ids):
+        """
+        Replace the properties, and optionally the labels, of nodes created with create_nodes().
+
+        Parameters:
+        - changes: A dictionary with node keys as keys and (old labels, labels, properties) tuples as values.
+        - neo4j_ids: The dictionary returned by create_nodes().
+        """
+        groups = {}
+        for key, (old_labels, labels, properties) in changes.items():
+            removed_labels = tuple(label for label in old_labels if label not in labels)
+            added_labels = tuple(label for label in labels if label not in old_labels)
+            groups.setdefault((removed_labels, added_labels), []).append({"id": neo4j_ids[key], "properties": properties})
+
+        for (removed_labels, added_labels), rows in groups.items():
+            cypher = "UNWIND $rows AS row MATCH (n) WHERE id(n) = row.id SET n = row.properties"
+            if removed_labels:
+                cypher += f" REMOVE n{''.join(':' + escape_name(label) for label in removed_labels)}"
+            if added_labels:
+                cypher += f" SET n{''.join(':' + escape_name(label) for label in added_labels)}"
+            for chunk in self.chunks(rows):
+                self.run(cypher, {"rows": chunk})
+
+    def delete_nodes(self, keys, neo4j_ids):
+        """
+        Delete nodes created with create_nodes(), together with their relationships.
+        """
+        rows = [neo4j_ids[key] for key in keys]
+        for chunk in self.chunks(rows):
+            self.run("UNWIND $ids AS node_id MATCH (n) WHERE id(n) = node_id DETACH DELETE n", {"ids": chunk})
+
+    def delete_relationships(self, relationships, neo4j_ids, relationship_type="Relationship"):
+        """
+        Delete relationships created with create_relationships().
+        """
+        rows = [{"from": neo4j_ids[from_key], "to": neo4j_ids[to_key]} for from_key, to_key in relationships]
+        cypher = f"UNWIND $rows AS row MATCH (a)-[r:{escape_name(relationship_type)}]->(b) " \
+                 "WHERE id(a) = row.from AND id(b) = row.to DELETE r"
+        for chunk in self.chunks(rows):
+            self.run(cypher, {"rows": chunk})
+
+    def chunks(self, rows):
+        for i in range(0, len(rows), self.batch_size):
+            yield rows[i:i + self.batch_size]
+
+
+def escape_name(name):
+    """
+    Quote a label or relationship type for Cypher, e.g. Application:0 becomes `Application:0`.
+    """
+    return "`" + str(name).replace("`", "``") + "`"
+
+
+class Neo4jSync:
+
+    def __init__(self, writer):
+        """
+        Keep the Neo4j database in sync with a graph that changes a little at a time, e.g. the path
+        and horizon of the step by step attack simulation. The published nodes and relationships
+        are tracked, and update() only writes the difference to the new graph.
+
+        Parameters:
+        - writer: A Neo4jBatchWriter instance.
+        """
+        self.writer = writer
+        # The published nodes, node keys as keys and (labels, properties) tuples as values.
+        self.nodes = {}
+        self.neo4j_ids = {}
+        self.relationships = set()
+
+    def reset(self):
+        """
+        Delete everything in the database and forget the published graph.
+        """
+        self.writer.delete_all()
+        self.nodes = {}
+        self.neo4j_ids = {}
+        self.relationships = set()
+
+    def update(self, nodes, relationships):
+        """
+        Write the difference between the published graph and a new graph.
+
+        Parameters:
+        - nodes: A dictionary with node keys as keys and (labels, properties) tuples as values,
+                 see Neo4jBatchWriter.create_nodes().
+        - relationships: An iterable of (from_key, to_key) tuples.
+
+        Returns:
+        - delta: A dictionary with the number of created, updated and deleted nodes and created and
+                 deleted relationships.
+        """
+        relationships = set(relationships)
+        deleted_nodes = [key for key in self.nodes if key not in nodes]
+        created_nodes = {key: node for key, node in nodes.items() if key not in self.nodes}
+        updated_nodes = {key: (self.nodes[key][0], labels, properties) for key, (labels, properties) in nodes.items()
+                         if key in self.nodes and self.nodes[key] != (labels, properties)}
+        # Deleting a node also deletes its relationships.
+        deleted_keys = set(deleted_nodes)
+        self.relationships = {(from_key, to_key) for from_key, to_key in self.relationships
+                              if from_key not in deleted_keys and to_key not in deleted_keys}
+        deleted_relationships = self.relationships - relationships
+        created_relationships = relationships - self.relationships
+
+        self.writer.delete_relationships(deleted_relationships, self.neo4j_ids)
+        self.writer.delete_nodes(deleted_nodes, self.neo4j_ids)
+        for key in deleted_nodes:
+            del self.neo4j_ids[key]
+        self.neo4j_ids.update(self.writer.create_nodes(created_nodes))
+        self.writer.update_nodes(updated_nodes, self.neo4j_ids)
+        self.writer.create_relationships(created_relationships, self.neo4j_ids)
+
+        self.nodes = dict(nodes)
+        self.relationships = relationships
+        return {
+            "created_nodes": len(created_nodes),
+            "updated_nodes": len(updated_nodes),
+            "deleted_nodes": len(deleted_nodes),
+            "created_relationships": len(created_relationships),
+            "deleted_relationships": len(deleted_relationships)
+            }
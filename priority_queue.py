@@ -0,0 +1,138 @@
+class IndexedPriorityQueue:
+
+    def __init__(self, capacity):
+        """
+        Binary min-heap over the integer items 0..capacity-1, e.g. the node indices of a
+        CompiledAttackGraph. Every item is at most once in the heap and its position is
+        tracked, which gives O(1) membership tests and O(log n) decrease-key. Items with
+        equal priority are popped in increasing item order, like heapq with (priority, item)
+        tuples.
+
+        Parameters:
+        - capacity: The number of distinct items.
+        """
+        # Heap of (priority, item) tuples, the tuple comparison gives the tie-breaking on the item.
+        self.heap = []
+        # Position of each item in self.heap, -1 if the item is not in the heap.
+        self.positions = [-1] * capacity
+        # Number of items added and of priorities lowered, see instrumentation.SimulationStats.
+        self.inserts = 0
+        self.decreases = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, item):
+        return self.positions[item] != -1
+
+    def priority(self, item):
+        """
+        Return the current priority of an item in the heap.
+        """
+        return self.heap[self.positions[item]][0]
+
+    def push(self, item, priority):
+        """
+        Add an item, or change the priority of an item that is already in the heap.
+
+        Parameters:
+        - item: The item (integer below the capacity).
+        - priority: The priority, lower priorities are popped first.
+        """
+        position = self.positions[item]
+        if position == -1:
+            self.inserts += 1
+            self.heap.append((priority, item))
+            self._sift_up(len(self.heap) - 1)
+        else:
+            old_priority = self.heap[position][0]
+            self.heap[position] = (priority, item)
+            if priority < old_priority:
+                self._sift_up(position)
+            elif priority > old_priority:
+                self._sift_down(position)
+
+    def decrease_key(self, item, priority):
+        """
+        Lower the priority of an item. The item is added if it is not in the heap, and
+        nothing happens if the new priority is not lower.
+
+        Parameters:
+        - item: The item (integer below the capacity).
+        - priority: The new priority.
+
+        Returns:
+        - bool: True if the item was added or its priority lowered.
+        """
+        position = self.positions[item]
+        if position == -1:
+            self.inserts += 1
+            self.heap.append((priority, item))
+            self._sift_up(len(self.heap) - 1)
+            return True
+        if priority >= self.heap[position][0]:
+            return False
+        self.decreases += 1
+        self.heap[position] = (priority, item)
+        self._sift_up(position)
+        return True
+
+    def peek(self):
+        """
+        Return the item with the lowest priority without removing it.
+
+        Returns:
+        - (priority, item): A tuple with the priority and the item.
+        """
+        return self.heap[0]
+
+    def pop(self):
+        """
+        Remove and return the item with the lowest priority.
+
+        Returns:
+        - (priority, item): A tuple with the priority and the item.
+        """
+        heap = self.heap
+        entry = heap[0]
+        last = heap.pop()
+        self.positions[entry[1]] = -1
+        if heap:
+            heap[0] = last
+            self._sift_down(0)
+        return entry
+
+    def _sift_up(self, position):
+        heap = self.heap
+        positions = self.positions
+        entry = heap[position]
+        while position > 0:
+            parent_position = (position - 1) >> 1
+            parent = heap[parent_position]
+            if not entry < parent:
+                break
+            heap[position] = parent
+            positions[parent[1]] = position
+            position = parent_position
+        heap[position] = entry
+        positions[entry[1]] = position
+
+    def _sift_down(self, position):
+        heap = self.heap
+        positions = self.positions
+        size = len(heap)
+        entry = heap[position]
+        child_position = 2 * position + 1
+        while child_position < size:
+            right_position = child_position + 1
+            if right_position < size and heap[right_position] < heap[child_position]:
+                child_position = right_position
+            child = heap[child_position]
+            if not child < entry:
+                break
+            heap[position] = child
+            positions[child[1]] = position
+            position = child_position
+            child_position = 2 * position + 1
+        heap[position] = entry
+        positions[entry[1]] = position
@@ -0,0 +1,131 @@
+from collections import namedtuple
+import random
+import threading
+
+import and_or_search
+import heuristics
+import traversal
+
+# The result of one query. The nodes are the attack step ids the query reached, and the path maps
+# attack step ids to the ids of their children in the path.
+QueryResult = namedtuple("QueryResult", ["cost", "target_reached", "expanded_nodes", "nodes", "path"])
+
+
+class QueryEngine:
+
+    def __init__(self, graph, heuristic=None):
+        """
+        Stateless queries against one compiled attack graph, safe to run from many threads.
+
+        The engine holds a read-only copy of the graph (see CompiledAttackGraph.read_only()) and
+        its scalar view, built once. A query only allocates its own search state and returns a
+        QueryResult, nothing is written to the engine, the graph or mal-toolbox objects, so a
+        warm engine can be shared by concurrent queries. The landmark heuristic of the A* queries
+        is built once, by the first A* query.
+
+        Parameters:
+        - graph: A CompiledAttackGraph instance with the costs set.
+        - heuristic: Optional heuristics.LandmarkHeuristic for the graph, e.g. from AttackSimulation.get_heuristic().
+        """
+        self.graph = graph.read_only()
+        self._heuristic = heuristic
+        self._lock = threading.Lock()
+
+    def get_heuristic(self):
+        """
+        Get the landmark heuristic of the graph, built on the first call.
+        """
+        if self._heuristic is None:
+            with self._lock:
+                if self._heuristic is None:
+                    self._heuristic = heuristics.LandmarkHeuristic(self.graph)
+        return self._heuristic
+
+    def start_nodes(self, entry_points):
+        """
+        Translate entry points to node indices.
+
+        Parameters:
+        - entry_points: An attack step id, e.g. the attacker node id, or a list of attack step ids.
+
+        Returns:
+        - start_nodes: A list of node indices.
+        """
+        entry_points = [entry_points] if isinstance(entry_points, str) else entry_points
+        return [self.node_index(node_id) for node_id in entry_points]
+
+    def node_index(self, node_id):
+        if node_id not in self.graph.index:
+            raise ValueError(f"Unknown attack step {node_id}.")
+        return self.graph.index[node_id]
+
+    def shortest_path(self, entry_points, target, use_a_star=False):
+        """
+        Find the cheapest attack on the target, see AttackSimulation.dijkstra().
+
+        Parameters:
+        - entry_points: The attack step id the attacker starts from, or a list of attack step ids.
+        - target: The attack step id of the target.
+        - use_a_star: Boolean indicating whether the landmark heuristic is used.
+
+        Returns:
+        - result: A QueryResult, with cost 0 and no nodes if the target can not be reached.
+        """
+        start_nodes = self.start_nodes(entry_points)
+        target_node = self.node_index(target)
+        h_score = self.get_heuristic().estimate(target_node).tolist() if use_a_star else None
+        search = and_or_search.AndOrSearch(self.graph, start_nodes, h_score)
+        if not search.run(target_node):
+            return QueryResult(0, False, search.expanded_nodes, [], {})
+        cost, nodes, edges = search.attack_subgraph(target_node)
+        return QueryResult(cost, True, search.expanded_nodes, self.graph.ids(nodes), self._edges_to_ids(edges))
+
+    def costs_to_targets(self, entry_points, targets):
+        """
+        Get the cost of the cheapest attack on each of the targets with one search, see
+        AttackSimulation.get_costs_to_targets().
+
+        Returns:
+        - costs: A dictionary with the target ids as keys and the costs as values, math.inf if
+                 the target can not be reached.
+        """
+        cost_map = and_or_search.AttackCostMap(self.graph, self.start_nodes(entry_points))
+        return {target: cost_map.cost(self.node_index(target)) for target in targets}
+
+    def random_path(self, entry_points, target=None, attacker_cost_budget=None, seed=None):
+        """
+        Generate a random attack path, see AttackSimulation.random_path(). Every query has its own
+        random generator, so the same seed gives the same path in any thread.
+
+        Returns:
+        - result: A QueryResult whose nodes are the reached attack steps in order.
+        """
+        target_node = self.node_index(target) if target is not None else None
+        cost, reached_order, path, _ = traversal.random_path(self.graph, self.start_nodes(entry_points), target_node,
+                                                             attacker_cost_budget, random.Random(seed))
+        target_reached = target_node is not None and target_node in reached_order
+        return QueryResult(cost, target_reached, len(reached_order), self.graph.ids(reached_order), self._edges_to_ids(path))
+
+    def budget_region(self, entry_points, attacker_cost_budget):
+        """
+        Find all attack steps within the attacker cost budget, see AttackSimulation.budget_region().
+
+        Returns:
+        - result: A QueryResult whose nodes are the attack steps in the region in settle order.
+        """
+        cost, nodes, _, edges = and_or_search.budget_region(self.graph, self.start_nodes(entry_points), attacker_cost_budget)
+        return QueryResult(cost, None, len(nodes), self.graph.ids(nodes), self._edges_to_ids(edges))
+
+    def bfs(self, entry_points, attacker_cost_budget):
+        """
+        Breadth-First Search within the attacker cost budget, see AttackSimulation.bfs().
+
+        Returns:
+        - result: A QueryResult whose nodes are the visited attack steps.
+        """
+        cost, visited, path = traversal.bfs(self.graph, self.start_nodes(entry_points), attacker_cost_budget)
+        return QueryResult(cost, None, len(visited), self.graph.ids(visited), self._edges_to_ids(path))
+
+    def _edges_to_ids(self, edges):
+        node_ids = self.graph.node_ids
+        return {node_ids[parent]: self.graph.ids(children) for parent, children in edges.items()}
@@ -0,0 +1,157 @@
+from collections import namedtuple
+import numpy as np
+
+# The size of the graph and of the cones of one query, see TargetRelevance.relevant_nodes().
+PruningStats = namedtuple("PruningStats", [
+    "nodes",
+    "components",
+    "descendant_nodes",
+    "ancestor_nodes",
+    "relevant_nodes",
+    "relevant_components"
+    ])
+
+
+def strongly_connected_components(graph):
+    """
+    Find the strongly connected components of the graph with an iterative version of Tarjan's
+    algorithm, following the children of every node.
+
+    Parameters:
+    - graph: A CompiledAttackGraph instance.
+
+    Returns:
+    - component: A list with the component index of every node. Components are numbered in
+                 reverse topological order: the children of a component have lower indices.
+    - number_of_components: The number of components.
+    """
+    view = graph.scalar_view()
+    children_indptr = view.children_indptr
+    children_indices = view.children_indices
+    size = len(graph)
+    order = [-1] * size
+    low = [0] * size
+    on_stack = [False] * size
+    component = [-1] * size
+    stack = []
+    visited = 0
+    number_of_components = 0
+
+    for root in range(size):
+        if order[root] != -1:
+            continue
+        order[root] = low[root] = visited
+        visited += 1
+        stack.append(root)
+        on_stack[root] = True
+        # Depth first search with an explicit stack of (node, next child position) pairs.
+        work = [(root, children_indptr[root])]
+        while work:
+            node, k = work[-1]
+            if k < children_indptr[node + 1]:
+                work[-1] = (node, k + 1)
+                child = children_indices[k]
+                if order[child] == -1:
+                    order[child] = low[child] = visited
+                    visited += 1
+                    stack.append(child)
+                    on_stack[child] = True
+                    work.append((child, children_indptr[child]))
+                elif on_stack[child] and order[child] < low[node]:
+                    low[node] = order[child]
+                continue
+            work.pop()
+            if work and low[node] < low[work[-1][0]]:
+                low[work[-1][0]] = low[node]
+            if low[node] == order[node]:
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component[member] = number_of_components
+                    if member == node:
+                        break
+                number_of_components += 1
+    return component, number_of_components
+
+
+class TargetRelevance:
+
+    def __init__(self, graph):
+        """
+        Find the part of the attack graph that matters for a target. Only a node that is a
+        descendant of the start nodes and an ancestor of the target can be on an attack on the
+        target, so the searches can be restricted to the intersection of the two cones without
+        changing the cheapest attack.
+
+        The strongly connected components and the condensed graph, a DAG with one node per
+        component, are computed once. A query then walks the condensed graph, which has no
+        cycles and fewer edges, and maps the components back to the nodes.
+
+        The cones are structural, they follow all edges. The attacker node is a parent of its
+        entry points only through its children, so the condensed graph is built from the children.
+
+        Parameters:
+        - graph: A CompiledAttackGraph instance.
+        """
+        self.graph = graph
+        component, self.number_of_components = strongly_connected_components(graph)
+        self.component = np.array(component, dtype=np.int64)
+        self.component_sizes = np.bincount(self.component, minlength=self.number_of_components)
+
+        # The edges between different components, each once.
+        owners = np.repeat(np.arange(len(graph), dtype=np.int64), np.diff(graph.children_indptr))
+        sources = self.component[owners]
+        destinations = self.component[graph.children_indices]
+        keys = np.unique(sources[sources != destinations] * self.number_of_components + destinations[sources != destinations])
+        sources, destinations = keys // self.number_of_components, keys % self.number_of_components
+        self.children_indptr, self.children_indices = self._csr(sources, destinations)
+        self.parents_indptr, self.parents_indices = self._csr(destinations, sources)
+
+    def _csr(self, sources, destinations):
+        order = np.argsort(sources, kind="stable")
+        indptr = np.zeros(self.number_of_components + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(np.bincount(sources, minlength=self.number_of_components))
+        return indptr.tolist(), destinations[order].tolist()
+
+    @staticmethod
+    def _cone(indptr, indices, components, size):
+        """
+        Mark the components and everything reachable from them in the condensed graph.
+        """
+        marked = np.zeros(size, dtype=np.bool_)
+        marked[components] = True
+        stack = list(set(components))
+        while stack:
+            component = stack.pop()
+            for k in range(indptr[component], indptr[component + 1]):
+                neighbour = indices[k]
+                if not marked[neighbour]:
+                    marked[neighbour] = True
+                    stack.append(neighbour)
+        return marked
+
+    def relevant_nodes(self, start_nodes, target_node):
+        """
+        Mark the nodes that are descendants of the start nodes and ancestors of the target node.
+
+        Parameters:
+        - start_nodes: The index of the node the attacker starts from, or a list of indices.
+        - target_node: The index of the target node.
+
+        Returns:
+        - relevant: A NumPy bool array, True for the nodes in both cones.
+        - stats: A PruningStats instance.
+        """
+        start_nodes = [start_nodes] if isinstance(start_nodes, int) else list(start_nodes)
+        descendants = self._cone(self.children_indptr, self.children_indices, self.component[start_nodes].tolist(), self.number_of_components)
+        ancestors = self._cone(self.parents_indptr, self.parents_indices, [int(self.component[target_node])], self.number_of_components)
+        relevant_components = descendants & ancestors
+        stats = PruningStats(
+            nodes=len(self.graph),
+            components=self.number_of_components,
+            descendant_nodes=int(self.component_sizes[descendants].sum()),
+            ancestor_nodes=int(self.component_sizes[ancestors].sum()),
+            relevant_nodes=int(self.component_sizes[relevant_components].sum()),
+            relevant_components=int(relevant_components.sum())
+            )
+        return relevant_components[self.component], stats
@@ -1,4 +1,18 @@
 import unittest
+import unittest.mock
+import concurrent.futures
+import importlib.util
+import itertools
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree
+import numpy as np
 import maltoolbox.attackgraph.attackgraph
 import maltoolbox.ingestors.neo4j
 import maltoolbox.model.model
@@ -6,11 +20,27 @@ import maltoolbox.language.specification
 import maltoolbox.language.classes_factory
 import maltoolbox.attackgraph.attacker
 import maltoolbox.attackgraph.query
+import maltoolbox.attackgraph.node
+import maltoolbox.attackgraph.analyzers.apriori
 
 # Custom files.
 import constants
 import help_functions
 from attack_simulation import AttackSimulation
+import and_or_search
+import attack_surface
+import background_sink
+import batch
+from benchmarks import scaling, synthetic
+import compiled_graph
+import defense_analysis
+import exporters
+import graph_cache
+import headless
+import heuristics
+import instrumentation
+import priority_queue
+import relevance
 
 def print_function_name(func):
     def wrapper(*args, **kwargs):
@@ -301,5 +331,1248 @@ class TestAttackSimulation(unittest.TestCase):
                 # Assert
                 self.assertEqual(cost_1, cost_2)
 
+    @print_function_name
+    def test_a_star_on_14_step_path_expands_fewer_nodes(self):
+        # Arrange
+        target_attack_step = "Credentials:9:propagateOneCredentialCompromised"
+        entry_point_attack_steps = [[5, ["attemptCredentialsReuse"]], [6, ["attemptCredentialsReuse", "guessCredentials"]], [0, ["softwareProductAbuse", "attemptFullAccessFromSupplyChainCompromise"]], [8, ["attemptCredentialsReuse"]]]
+        actual_cost = 79
+        self.model = help_functions.add_entry_points_to_attacker(self.model, entry_point_attack_steps)
+        self.attackgraph.attach_attackers(self.model)
+        attacker = self.attackgraph.attackers[0]
+
+        # Act
+        attack_simulation_1 = AttackSimulation(self.attackgraph, attacker, use_ttc=False)
+        attack_simulation_1.set_target_node(target_attack_step)
+        cost_1 = attack_simulation_1.dijkstra()
+        attack_simulation_2 = AttackSimulation(self.attackgraph, attacker, use_ttc=False)
+        attack_simulation_2.set_target_node(target_attack_step)
+        cost_2 = attack_simulation_2.dijkstra(use_a_star=True)
+
+        # Assert
+        self.assertEqual(cost_1, actual_cost)
+        self.assertEqual(cost_2, actual_cost)
+        self.assertLess(attack_simulation_2.expanded_nodes, attack_simulation_1.expanded_nodes)
+
+    @print_function_name
+    def test_bidirectional_search_matches_dijkstra(self):
+        # Arrange
+        # A path through an 'and' step, and a plain path.
+        targets = {"Application:0:fullAccess": 19, "Credentials:9:propagateOneCredentialCompromised": 79}
+        entry_point_attack_steps = [[5, ["attemptCredentialsReuse"]], [6, ["attemptCredentialsReuse", "guessCredentials"]], [0, ["softwareProductAbuse", "attemptFullAccessFromSupplyChainCompromise"]], [8, ["attemptCredentialsReuse"]]]
+        self.model = help_functions.add_entry_points_to_attacker(self.model, entry_point_attack_steps)
+        self.attackgraph.attach_attackers(self.model)
+        attacker = self.attackgraph.attackers[0]
+
+        for target_attack_step, actual_cost in targets.items():
+            # Act
+            attack_simulation_1 = AttackSimulation(self.attackgraph, attacker, use_ttc=False)
+            attack_simulation_1.set_target_node(target_attack_step)
+            cost_1 = attack_simulation_1.dijkstra()
+            attack_simulation_2 = AttackSimulation(self.attackgraph, attacker, use_ttc=False)
+            attack_simulation_2.set_target_node(target_attack_step)
+            cost_2 = attack_simulation_2.dijkstra(bidirectional=True)
+
+            # Assert
+            self.assertEqual(cost_1, actual_cost)
+            self.assertEqual(cost_2, actual_cost)
+            self.assertEqual({node.id for node in attack_simulation_2.visited}, {node.id for node in attack_simulation_1.visited})
+        with self.assertRaises(ValueError):
+            attack_simulation_2.dijkstra(use_a_star=True, bidirectional=True)
+
+    @print_function_name
+    def test_pruned_dijkstra_and_random_path(self):
+        # Arrange
+        target_attack_step = "Credentials:9:propagateOneCredentialCompromised"
+        entry_point_attack_steps = [[5, ["attemptCredentialsReuse"]], [6, ["attemptCredentialsReuse", "guessCredentials"]], [0, ["softwareProductAbuse", "attemptFullAccessFromSupplyChainCompromise"]], [8, ["attemptCredentialsReuse"]]]
+        actual_cost = 79
+        self.model = help_functions.add_entry_points_to_attacker(self.model, entry_point_attack_steps)
+        self.attackgraph.attach_attackers(self.model)
+        attacker = self.attackgraph.attackers[0]
+        stats = instrumentation.SimulationStats()
+
+        # Act
+        attack_simulation_1 = AttackSimulation(self.attackgraph, attacker, use_ttc=False)
+        attack_simulation_1.set_target_node(target_attack_step)
+        cost_1 = attack_simulation_1.dijkstra()
+        attack_simulation_2 = AttackSimulation(self.attackgraph, attacker, use_ttc=False, stats=stats, prune_to_target=True)
+        attack_simulation_2.set_target_node(target_attack_step)
+        cost_2 = attack_simulation_2.dijkstra()
+        visited_2 = {node.id for node in attack_simulation_2.visited}
+        relevant, _ = attack_simulation_2.get_relevance().relevant_nodes(attack_simulation_2.graph.index[attacker.node.id],
+                                                                         attack_simulation_2.graph.index[target_attack_step])
+        random.seed(3)
+        attack_simulation_2.random_path()
+        random_path_visited = {node.id for node in attack_simulation_2.visited}
+
+        # Assert
+        self.assertEqual(cost_1, actual_cost)
+        self.assertEqual(cost_2, actual_cost)
+        self.assertEqual(visited_2, {node.id for node in attack_simulation_1.visited})
+        self.assertLess(attack_simulation_2.expanded_nodes, attack_simulation_1.expanded_nodes)
+        pruning_stats = attack_simulation_2.pruning_stats
+        self.assertEqual(pruning_stats.relevant_nodes, int(relevant.sum()))
+        self.assertLess(pruning_stats.relevant_nodes, min(pruning_stats.descendant_nodes, pruning_stats.ancestor_nodes))
+        self.assertEqual(stats.counters["pruned_nodes"], 2 * (pruning_stats.nodes - pruning_stats.relevant_nodes))
+        self.assertIn(target_attack_step, random_path_visited)
+        self.assertTrue(all(relevant[attack_simulation_2.graph.index[node_id]] for node_id in random_path_visited))
+
+    @print_function_name
+    def test_landmark_heuristic_is_a_lower_bound(self):
+        # Arrange
+        entry_point_attack_steps = [[5, ["attemptCredentialsReuse"]], [6, ["attemptCredentialsReuse", "guessCredentials"]], [0, ["softwareProductAbuse", "attemptFullAccessFromSupplyChainCompromise"]], [8, ["attemptCredentialsReuse"]]]
+        self.model = help_functions.add_entry_points_to_attacker(self.model, entry_point_attack_steps)
+        self.attackgraph.attach_attackers(self.model)
+        attacker = self.attackgraph.attackers[0]
+        attack_simulation = AttackSimulation(self.attackgraph, attacker, use_ttc=False)
+        graph = attack_simulation.graph
+        target = graph.index["Data:4:accessDecryptedData"]
+
+        # Act
+        h_score = attack_simulation.get_heuristic().estimate(target)
+        exact = heuristics.one_to_all_costs(graph, target, reverse=True)
+
+        # Assert
+        self.assertTrue((h_score <= exact).all())
+
+    @print_function_name
+    def test_cost_map_matches_dijkstra_for_every_target(self):
+        # Arrange
+        entry_point_attack_steps = [[5, ["attemptCredentialsReuse"]], [6, ["attemptCredentialsReuse", "guessCredentials"]], [0, ["softwareProductAbuse", "attemptFullAccessFromSupplyChainCompromise"]], [8, ["attemptCredentialsReuse"]]]
+        self.model = help_functions.add_entry_points_to_attacker(self.model, entry_point_attack_steps)
+        self.attackgraph.attach_attackers(self.model)
+        attacker = self.attackgraph.attackers[0]
+        attack_simulation = AttackSimulation(self.attackgraph, attacker, use_ttc=False)
+        target_attack_steps = [node.id for node in self.attackgraph.nodes]
+
+        # Act
+        costs = attack_simulation.get_costs_to_targets(target_attack_steps)
+        cost, path = attack_simulation.get_attack_path_to_target("Application:0:fullAccess")
+
+        # Assert
+        self.assertEqual(costs["Application:0:fullAccess"], 19)
+        self.assertEqual(costs["Credentials:9:propagateOneCredentialCompromised"], 79)
+        self.assertEqual(costs["Credentials:5:extract"], math.inf)
+        self.assertEqual(cost, 19)
+        self.assertEqual(set(path), {"Attacker:1:firstSteps", "Application:0:attemptFullAccessFromSupplyChainCompromise", "Application:0:bypassSupplyChainAuditing", "Application:0:supplyChainAuditingBypassed", "Application:0:fullAccessFromSupplyChainCompromise", "Application:0:fullAccess"})
+        for target_attack_step in target_attack_steps:
+            single_target_simulation = AttackSimulation(self.attackgraph, attacker, use_ttc=False)
+            single_target_simulation.set_target_node(target_attack_step)
+            expected_cost = single_target_simulation.dijkstra() if costs[target_attack_step] != math.inf else math.inf
+            self.assertEqual(costs[target_attack_step], expected_cost)
+
+    @print_function_name
+    def test_pruned_unreachable_simulation_matches_full_graph(self):
+        # Arrange
+        target_attack_steps = ["Application:0:fullAccess", "Credentials:9:propagateOneCredentialCompromised", "Credentials:6:attemptCredentialsReuse", "Credentials:5:extract"]
+        entry_point_attack_steps = [[5, ["attemptCredentialsReuse"]], [6, ["attemptCredentialsReuse", "guessCredentials"]], [0, ["softwareProductAbuse", "attemptFullAccessFromSupplyChainCompromise"]], [8, ["attemptCredentialsReuse"]]]
+        self.model = help_functions.add_entry_points_to_attacker(self.model, entry_point_attack_steps)
+        self.attackgraph.attach_attackers(self.model)
+        attacker = self.attackgraph.attackers[0]
+
+        # Act
+        full_simulation = AttackSimulation(self.attackgraph, attacker, use_ttc=False)
+        reachable_simulation = AttackSimulation(self.attackgraph, attacker, use_ttc=False, prune_unreachable=True)
+        reachable_costs = reachable_simulation.get_costs_to_targets([node_id for node_id in target_attack_steps if node_id in reachable_simulation.graph.index])
+
+        # Assert
+        self.assertLess(len(reachable_simulation.graph), len(full_simulation.graph))
+        full_cost_map = full_simulation.get_cost_map()
+        for node_id in full_simulation.graph.node_ids:
+            if full_cost_map.is_reachable(full_simulation.graph.index[node_id]):
+                self.assertIn(node_id, reachable_simulation.graph.index)
+        self.assertEqual(reachable_costs, {node_id: cost for node_id, cost in full_simulation.get_costs_to_targets(target_attack_steps).items() if cost != math.inf})
+        for target_attack_step in target_attack_steps[:2]:
+            for simulation in [full_simulation, reachable_simulation]:
+                simulation.set_target_node(target_attack_step)
+            self.assertEqual(reachable_simulation.dijkstra(), full_simulation.dijkstra())
+            self.assertEqual({node.id for node in reachable_simulation.visited}, {node.id for node in full_simulation.visited})
+
+    @print_function_name
+    def test_second_query_on_same_simulation(self):
+        # Arrange
+        entry_point_attack_steps = [[5, ["attemptCredentialsReuse"]], [6, ["attemptCredentialsReuse", "guessCredentials"]], [0, ["softwareProductAbuse", "attemptFullAccessFromSupplyChainCompromise"]], [8, ["attemptCredentialsReuse"]]]
+        self.model = help_functions.add_entry_points_to_attacker(self.model, entry_point_attack_steps)
+        self.attackgraph.attach_attackers(self.model)
+        attacker = self.attackgraph.attackers[0]
+        attack_simulation = AttackSimulation(self.attackgraph, attacker, use_ttc=False)
+        attack_simulation.set_target_node("Credentials:9:propagateOneCredentialCompromised")
+        attack_simulation.dijkstra()
+
+        # Act
+        attack_simulation.set_target_node("Application:0:fullAccess")
+        cost = attack_simulation.dijkstra()
+
+        # Assert
+        self.assertEqual(cost, 19)
+        self.assertEqual({node.id for node in attack_simulation.visited}, {"Attacker:1:firstSteps", "Application:0:attemptFullAccessFromSupplyChainCompromise", "Application:0:bypassSupplyChainAuditing", "Application:0:supplyChainAuditingBypassed", "Application:0:fullAccessFromSupplyChainCompromise", "Application:0:fullAccess"})
+        self.assertEqual(cost, sum(attack_simulation.cost_dictionary[child.id] for children in attack_simulation.path.values() for child in children))
+
+    @print_function_name
+    def test_cheapest_attacks_to_target(self):
+        # Arrange
+        target_attack_step = "Identity:10:assume"
+        entry_point_attack_steps = [[5, ["attemptCredentialsReuse"]], [6, ["attemptCredentialsReuse", "guessCredentials"]], [0, ["softwareProductAbuse", "attemptFullAccessFromSupplyChainCompromise"]], [8, ["attemptCredentialsReuse"]]]
+        self.model = help_functions.add_entry_points_to_attacker(self.model, entry_point_attack_steps)
+        self.attackgraph.attach_attackers(self.model)
+        attacker = self.attackgraph.attackers[0]
+        attack_simulation = AttackSimulation(self.attackgraph, attacker, use_ttc=False)
+        attack_simulation.set_target_node(target_attack_step)
+
+        # Act
+        attacks = list(itertools.islice(attack_simulation.cheapest_attacks(), 5))
+        cost = attack_simulation.dijkstra()
+
+        # Assert
+        self.assertEqual(len(attacks), 5)
+        self.assertEqual(attacks[0][0], cost)
+        self.assertEqual(set(attacks[0][1]), {node.id for node in attack_simulation.visited})
+        self.assertEqual([attack_cost for attack_cost, _ in attacks], [45, 93, 95, 101, 103])
+        self.assertEqual(len({frozenset((parent, child) for parent, children in path.items() for child in children) for _, path in attacks}), 5)
+        for _, path in attacks:
+            self.assertIn(target_attack_step, path)
+
+    @print_function_name
+    def test_query_engine_concurrent_queries(self):
+        # Arrange
+        target_attack_steps = ["Application:0:fullAccess", "Credentials:9:propagateOneCredentialCompromised", "Credentials:5:extract", "Credentials:6:use"]
+        entry_point_attack_steps = [[5, ["attemptCredentialsReuse"]], [6, ["attemptCredentialsReuse", "guessCredentials"]], [0, ["softwareProductAbuse", "attemptFullAccessFromSupplyChainCompromise"]], [8, ["attemptCredentialsReuse"]]]
+        self.model = help_functions.add_entry_points_to_attacker(self.model, entry_point_attack_steps)
+        self.attackgraph.attach_attackers(self.model)
+        attacker = self.attackgraph.attackers[0]
+        attack_simulation = AttackSimulation(self.attackgraph, attacker, use_ttc=False)
+        engine = attack_simulation.query_engine()
+        queries = [(target_attack_step, use_a_star) for target_attack_step in target_attack_steps for use_a_star in [False, True]] * 10
+
+        # Act
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda query: engine.shortest_path(attacker.node.id, *query), queries))
+            random_paths = list(executor.map(lambda seed: engine.random_path(attacker.node.id, attacker_cost_budget=20, seed=seed), [1, 1, 2]))
+
+        # Assert
+        costs = attack_simulation.get_costs_to_targets(target_attack_steps)
+        for (target_attack_step, _), result in zip(queries, results):
+            self.assertEqual(result.target_reached, costs[target_attack_step] != math.inf)
+            self.assertEqual(result.cost, costs[target_attack_step] if result.target_reached else 0)
+        self.assertEqual(results[0].nodes[-1], "Application:0:fullAccess")
+        self.assertEqual(random_paths[0], random_paths[1])
+        self.assertEqual(engine.costs_to_targets(attacker.node.id, target_attack_steps), costs)
+        self.assertEqual(attack_simulation.visited, [])
+        with self.assertRaises(ValueError):
+            engine.graph.cost[0] = 1
+        with self.assertRaises(ValueError):
+            engine.shortest_path(attacker.node.id, "Application:0:unknown")
+
+    @print_function_name
+    def test_batch_jobs_in_process_pool(self):
+        # Arrange
+        entry_point_attack_steps = [[5, ["attemptCredentialsReuse"]], [6, ["attemptCredentialsReuse", "guessCredentials"]], [0, ["softwareProductAbuse", "attemptFullAccessFromSupplyChainCompromise"]], [8, ["attemptCredentialsReuse"]]]
+        self.model = help_functions.add_entry_points_to_attacker(self.model, entry_point_attack_steps)
+        self.attackgraph.attach_attackers(self.model)
+        attacker = self.attackgraph.attackers[0]
+        graph = AttackSimulation(self.attackgraph, attacker, use_ttc=False).graph
+        jobs = [
+            batch.BatchJob(attacker.node.id, "Application:0:fullAccess"),
+            batch.BatchJob(attacker.node.id, "Credentials:9:propagateOneCredentialCompromised", algorithm="a_star"),
+            batch.BatchJob(attacker.node.id, "Credentials:5:extract"),
+            batch.BatchJob(["Credentials:6:attemptCredentialsReuse"], "Credentials:6:attemptCredentialsReuse"),
+            batch.BatchJob(attacker.node.id, budget=10, algorithm="random_path", seed=1),
+            batch.BatchJob(attacker.node.id, budget=10, algorithm="bfs")
+            ]
+
+        # Act
+        results = list(batch.run_batch(graph, jobs, max_workers=2))
+        results_in_process = list(batch.run_batch(graph, jobs, max_workers=1))
+
+        # Assert
+        self.assertEqual([result.job_index for result in results], list(range(len(jobs))))
+        self.assertEqual([result.cost for result in results[:4]], [19, 79, 0, 4])
+        self.assertEqual([result.target_reached for result in results[:4]], [True, True, False, True])
+        self.assertLessEqual(results[4].cost, 10)
+        self.assertEqual(results, results_in_process)
+
+    @print_function_name
+    def test_incremental_attack_surface_matches_mal_toolbox(self):
+        # Arrange
+        entry_point_attack_steps = [[5, ["attemptCredentialsReuse"]], [6, ["attemptCredentialsReuse", "guessCredentials"]], [0, ["softwareProductAbuse", "attemptFullAccessFromSupplyChainCompromise"]], [8, ["attemptCredentialsReuse"]]]
+        self.model = help_functions.add_entry_points_to_attacker(self.model, entry_point_attack_steps)
+        self.attackgraph.attach_attackers(self.model)
+        attacker = self.attackgraph.attackers[0]
+        graph = AttackSimulation(self.attackgraph, attacker, use_ttc=False).graph
+        rng = random.Random(3)
+
+        # Act
+        surface = attack_surface.AttackSurface(graph, graph.index[attacker.node.id])
+        attacker.reached_attack_steps = [attacker.node]
+        while len(surface) > 0:
+            expected_horizon = {node.id for node in maltoolbox.attackgraph.query.get_attack_surface(self.attackgraph, attacker)} - {node.id for node in attacker.reached_attack_steps}
+
+            # Assert
+            self.assertEqual(set(graph.ids(surface.horizon)), expected_horizon)
+            node = rng.choice(surface.horizon)
+            surface.compromise(node)
+            attacker.reached_attack_steps.append(self.attackgraph.get_node_by_id(graph.node_ids[node]))
+
+    @print_function_name
+    def test_incremental_attack_surface_matches_mal_toolbox_on_model(self):
+        # Arrange
+        # The model as main.py loads it. The 'and' step Application:0:softwareProductAbuse is a
+        # child of the node of attacker 12, which is not one of its parents.
+        attackgraph, _ = graph_cache.build_attack_graph(constants.MAR_ARCHIVE, constants.MODEL_FILE)
+        attacker = next(attacker for attacker in attackgraph.attackers if attacker.id == "12")
+        graph = compiled_graph.CompiledAttackGraph(attackgraph.nodes)
+        target = attackgraph.get_node_by_id("Application:0:softwareProductAbuse")
+        necessary_parents = [parent for parent in target.parents if parent.is_necessary]
+
+        # Act
+        # Compromise the necessary parents of the 'and' step one by one, then the reachable rest.
+        surface = attack_surface.AttackSurface(graph, graph.index[attacker.node.id])
+        attacker.reached_attack_steps = [attacker.node]
+        rng = random.Random(5)
+        while True:
+            expected_horizon = {node.id for node in maltoolbox.attackgraph.query.get_attack_surface(attackgraph, attacker)} - {node.id for node in attacker.reached_attack_steps}
+
+            # Assert
+            self.assertEqual(set(graph.ids(surface.horizon)), expected_horizon)
+            if necessary_parents:
+                node = necessary_parents.pop()
+            elif len(surface) > 0:
+                node = attackgraph.get_node_by_id(graph.node_ids[rng.choice(surface.horizon)])
+            else:
+                break
+            surface.compromise(graph.index[node.id])
+            attacker.reached_attack_steps.append(node)
+        self.assertIn(target, attacker.reached_attack_steps)
+
+    @print_function_name
+    def test_monte_carlo_random_path_is_reproducible(self):
+        # Arrange
+        target_attack_step = "Application:0:fullAccessFromSupplyChainCompromise"
+        entry_point_attack_steps = [[5, ["attemptCredentialsReuse"]], [6, ["attemptCredentialsReuse", "guessCredentials"]], [0, ["softwareProductAbuse", "attemptFullAccessFromSupplyChainCompromise"]], [8, ["attemptCredentialsReuse"]]]
+        self.model = help_functions.add_entry_points_to_attacker(self.model, entry_point_attack_steps)
+        self.attackgraph.attach_attackers(self.model)
+        attacker = self.attackgraph.attackers[0]
+        attack_simulation = AttackSimulation(self.attackgraph, attacker, use_ttc=False)
+        attack_simulation.set_target_node(target_attack_step)
+        attack_simulation.set_attacker_cost_budget(100)
+
+        # Act
+        result_1 = attack_simulation.monte_carlo_random_path(rollouts=50, seed=7)
+        result_2 = attack_simulation.monte_carlo_random_path(rollouts=50, seed=7, max_workers=2)
+
+        # Assert
+        self.assertEqual(result_1.costs.tolist(), result_2.costs.tolist())
+        self.assertEqual(result_1.target_probability, result_2.target_probability)
+        self.assertTrue((result_1.costs <= 100).all())
+        self.assertGreater(result_1.target_probability, 0)
+        self.assertEqual(result_1.step_frequencies()[attacker.node.id], 1.0)
+        self.assertEqual(result_1.target_probability, result_1.step_frequencies().get(target_attack_step, 0))
+
+    @print_function_name
+    def test_ttc_costs_are_seeded(self):
+        # Arrange
+        self.attackgraph.attach_attackers(self.model)
+        attacker = self.attackgraph.attackers[0]
+
+        # Act
+        cost_dictionary_1 = AttackSimulation(self.attackgraph, attacker, use_ttc=True, seed=3).cost_dictionary
+        cost_dictionary_2 = AttackSimulation(self.attackgraph, attacker, use_ttc=True, seed=3).cost_dictionary
+
+        # Assert
+        self.assertEqual(cost_dictionary_1, cost_dictionary_2)
+        self.assertEqual(cost_dictionary_1[attacker.node.id], 0)
+        for node in self.attackgraph.nodes:
+            if help_functions.ttc_distribution(node.ttc) is None:
+                self.assertEqual(cost_dictionary_1[node.id], 0)
+            else:
+                self.assertGreater(cost_dictionary_1[node.id], 0)
+
+    @print_function_name
+    def test_graph_cache_round_trip_and_rebuild(self):
+        # Arrange
+        with tempfile.TemporaryDirectory() as directory:
+            model_file = os.path.join(directory, "model.json")
+            shutil.copyfile(constants.MODEL_FILE, model_file)
+            cache_dir = os.path.join(directory, "cache")
+
+            # Act
+            graph = graph_cache.load_or_build_graph(constants.MAR_ARCHIVE, model_file, cache_dir)
+            cached_graph = graph_cache.load_or_build_graph(constants.MAR_ARCHIVE, model_file, cache_dir)
+            with open(model_file, 'a') as file:
+                file.write("\n")
+            rebuilt_graph = graph_cache.load_or_build_graph(constants.MAR_ARCHIVE, model_file, cache_dir)
+
+            # Assert
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+            self.assertIsInstance(cached_graph.children_indices, np.memmap)
+            for other_graph in [cached_graph, rebuilt_graph]:
+                self.assertEqual(other_graph.node_ids, graph.node_ids)
+                self.assertEqual(other_graph.names, graph.names)
+                for name in compiled_graph.ARRAY_NAMES:
+                    self.assertTrue(np.array_equal(getattr(other_graph, name), getattr(graph, name)))
+            cached_graph.set_costs({node_id: 1 for node_id in cached_graph.node_ids})
+            self.assertEqual(cached_graph.scalar_view().cost, [1.0] * len(cached_graph))
+
+    @print_function_name
+    def test_headless_runner(self):
+        # Arrange
+        entry_point_attack_steps = [[5, ["attemptCredentialsReuse"]], [0, ["softwareProductAbuse", "attemptFullAccessFromSupplyChainCompromise"]]]
+        entry_points = ["Credentials:5:attemptCredentialsReuse", "Application:0:softwareProductAbuse", "Application:0:attemptFullAccessFromSupplyChainCompromise"]
+        jobs = [
+            {"id": "pairs", "entry_points": entry_point_attack_steps, "target": "Application:0:fullAccess"},
+            {"id": "ids", "entry_points": entry_points, "target": "Application:0:fullAccess", "algorithm": "a_star"},
+            {"id": "ttc", "budget": 20, "algorithm": "budget_region", "cost_mode": "ttc", "seed": 3},
+            {"id": "ttc", "budget": 20, "algorithm": "budget_region", "cost_mode": "ttc", "seed": 3},
+            {"id": "unknown", "target": "Application:0:unknown"}
+            ]
+        with tempfile.TemporaryDirectory() as directory:
+            runner = headless.HeadlessRunner(os.path.join(directory, "cache"))
+
+            # Act
+            results = list(runner.run([json.dumps(job) + "\n" for job in jobs] + ["\n"]))
+
+        # Assert
+        graph = compiled_graph.CompiledAttackGraph(graph_cache.build_attack_graph(constants.MAR_ARCHIVE, constants.MODEL_FILE)[0].nodes,
+                                                   help_functions.load_costs_from_file())
+        expected = batch.run_job(graph, batch.BatchJob(entry_points, "Application:0:fullAccess"))
+        self.assertEqual([result["job_index"] for result in results], list(range(len(jobs))))
+        self.assertEqual(len(runner.models), 1)
+        for result in results[:2]:
+            self.assertEqual((result["cost"], result["target_reached"], result["path"]), (expected.cost, True, expected.path))
+        self.assertEqual(len(runner.costed_graphs), 2)
+        self.assertEqual({key: value for key, value in results[2].items() if key not in ("job_index", "seconds")},
+                         {key: value for key, value in results[3].items() if key not in ("job_index", "seconds")})
+        self.assertEqual(results[4], {"id": "unknown", "job_index": 4, "error": "Unknown attack step Application:0:unknown."})
+
+    @print_function_name
+    def test_upload_graph_to_neo4j_in_batches(self):
+        # Arrange
+        target_attack_step = "Application:0:fullAccess"
+        entry_point_attack_steps = [[5, ["attemptCredentialsReuse"]], [6, ["attemptCredentialsReuse", "guessCredentials"]], [0, ["softwareProductAbuse", "attemptFullAccessFromSupplyChainCompromise"]], [8, ["attemptCredentialsReuse"]]]
+        self.model = help_functions.add_entry_points_to_attacker(self.model, entry_point_attack_steps)
+        self.attackgraph.attach_attackers(self.model)
+        attacker = self.attackgraph.attackers[0]
+        attack_simulation = AttackSimulation(self.attackgraph, attacker, use_ttc=False)
+        attack_simulation.set_target_node(target_attack_step)
+        attack_simulation.dijkstra()
+        neo4j_graph_connection = RecordingNeo4jGraph()
+
+        # Act
+        attack_simulation.upload_graph_to_neo4j(neo4j_graph_connection, batch_size=2)
+
+        # Assert
+        created_nodes = {}
+        relationships = []
+        for cypher, parameters in neo4j_graph_connection.queries:
+            if cypher.startswith("UNWIND"):
+                self.assertLessEqual(len(parameters["rows"]), 2)
+            if "CREATE (n" in cypher:
+                for row in parameters["rows"]:
+                    created_nodes[row["key"]] = (cypher, row["properties"])
+            elif "CREATE (a)" in cypher:
+                relationships.extend(parameters["rows"])
+        self.assertIn("DETACH DELETE", neo4j_graph_connection.queries[0][0])
+        self.assertEqual(set(created_nodes), {node.id for node in attack_simulation.visited})
+        self.assertEqual(len(relationships), sum(len(children) for children in attack_simulation.path.values()))
+        cypher, properties = created_nodes[target_attack_step]
+        self.assertIn("(n:`Application:0`:`False`)", cypher)
+        self.assertEqual(properties["full_name"], target_attack_step)
+        self.assertIsNone(created_nodes[attacker.node.id][1]["cost"])
+        self.assertEqual(neo4j_graph_connection.transactions, len(neo4j_graph_connection.queries))
+
+    @print_function_name
+    def test_step_by_step_writes_only_changes_to_neo4j(self):
+        # Arrange
+        entry_point_attack_steps = [[0, ["softwareProductAbuse", "attemptFullAccessFromSupplyChainCompromise"]]]
+        self.model = help_functions.add_entry_points_to_attacker(self.model, entry_point_attack_steps)
+        self.attackgraph.attach_attackers(self.model)
+        attacker = self.attackgraph.attackers[0]
+        attack_simulation = AttackSimulation(self.attackgraph, attacker, use_ttc=False)
+        neo4j_graph_connection = RecordingNeo4jGraph()
+        commands = iter(["2", "1", "3"])
+        initial_queries = []
+        def read_command(prompt):
+            # Remember the number of queries of the initial upload when the first command is read.
+            if not initial_queries:
+                initial_queries.append(len(neo4j_graph_connection.queries))
+            return next(commands)
+
+        # Act
+        with unittest.mock.patch("builtins.input", side_effect=read_command):
+            attack_simulation.step_by_step_attack_simulation(neo4j_graph_connection)
+        step_queries = neo4j_graph_connection.queries[initial_queries[0]:]
+        neo4j_graph_connection.queries = []
+        attack_simulation.upload_graph_to_neo4j(neo4j_graph_connection, add_horizon=True)
+
+        # Assert
+        self.assertEqual(len(attack_simulation.visited), 2)
+        self.assertFalse(any("DETACH DELETE" in cypher for cypher, _ in step_queries))
+        updated_nodes = [row for cypher, parameters in step_queries if "REMOVE n:`True` SET n:`False`" in cypher for row in parameters["rows"]]
+        self.assertEqual(len(updated_nodes), 1)
+        self.assertEqual(updated_nodes[0]["properties"]["full_name"], attack_simulation.visited[1].id)
+        created_nodes = {row["key"] for cypher, parameters in neo4j_graph_connection.queries if "CREATE (n" in cypher for row in parameters["rows"]}
+        self.assertEqual(created_nodes, {node.id for node in attack_simulation.visited + attack_simulation.horizon})
+
+    @print_function_name
+    def test_upload_graph_to_neo4j_through_background_sink(self):
+        # Arrange
+        target_attack_step = "Application:0:fullAccess"
+        entry_point_attack_steps = [[0, ["softwareProductAbuse", "attemptFullAccessFromSupplyChainCompromise"]]]
+        self.model = help_functions.add_entry_points_to_attacker(self.model, entry_point_attack_steps)
+        self.attackgraph.attach_attackers(self.model)
+        attacker = self.attackgraph.attackers[0]
+        attack_simulation = AttackSimulation(self.attackgraph, attacker, use_ttc=False)
+        attack_simulation.set_target_node(target_attack_step)
+        attack_simulation.dijkstra()
+        neo4j_graph_connection_1 = RecordingNeo4jGraph()
+        neo4j_graph_connection_2 = RecordingNeo4jGraph()
+
+        # Act
+        attack_simulation.upload_graph_to_neo4j(neo4j_graph_connection_1)
+        with background_sink.BackgroundSink() as sink:
+            attack_simulation.set_sink(sink)
+            attack_simulation.upload_graph_to_neo4j(neo4j_graph_connection_2)
+
+        # Assert
+        self.assertEqual(neo4j_graph_connection_1.queries, neo4j_graph_connection_2.queries)
+        self.assertEqual(sink.stats().completed, 1)
+
+    @print_function_name
+    def test_export_result_to_files(self):
+        # Arrange
+        entry_point_attack_steps = [[0, ["softwareProductAbuse", "attemptFullAccessFromSupplyChainCompromise"]]]
+        self.model = help_functions.add_entry_points_to_attacker(self.model, entry_point_attack_steps)
+        self.attackgraph.attach_attackers(self.model)
+        attacker = self.attackgraph.attackers[0]
+        attack_simulation = AttackSimulation(self.attackgraph, attacker, use_ttc=False)
+        attack_simulation.set_target_node("Application:0:fullAccess")
+        attack_simulation.dijkstra()
+        attack_simulation.horizon = [attack_simulation.attackgraph_dictionary[child.id] for node in attack_simulation.visited for child in node.children]
+        nodes, relationships = attack_simulation.get_neo4j_graph(add_horizon=True)
+
+        with tempfile.TemporaryDirectory() as directory:
+            # Act
+            attack_simulation.export_result(exporters.JsonlExporter(os.path.join(directory, "result.jsonl")), add_horizon=True, chunk_size=3)
+            attack_simulation.export_result(exporters.GraphMLExporter(os.path.join(directory, "result.graphml")), add_horizon=True, chunk_size=3)
+            attack_simulation.export_result(exporters.DotExporter(os.path.join(directory, "result.dot")), add_horizon=True, chunk_size=3)
+            with open(os.path.join(directory, "result.jsonl")) as file:
+                rows = [json.loads(line) for line in file]
+            graphml = xml.etree.ElementTree.parse(os.path.join(directory, "result.graphml")).getroot()
+            with open(os.path.join(directory, "result.dot")) as file:
+                dot = file.read()
+
+            # Assert
+            self.assertEqual({row["id"]: (row["labels"], {name: row[name] for name in nodes[row["id"]][1]}) for row in rows if row["kind"] == "node"}, nodes)
+            self.assertEqual([(row["from"], row["to"]) for row in rows if row["kind"] == "relationship"], relationships)
+            namespace = {"g": "http://graphml.graphdrawing.org/xmlns"}
+            self.assertEqual({node.get("id") for node in graphml.iterfind(".//g:node", namespace)}, set(nodes))
+            self.assertEqual([(edge.get("source"), edge.get("target")) for edge in graphml.iterfind(".//g:edge", namespace)], relationships)
+            self.assertEqual(dot.count(" -> "), len(relationships))
+            self.assertTrue(dot.startswith("digraph") and dot.endswith("}\n"))
+            self.assertGreater(len(nodes), len(attack_simulation.visited))
+
+    @print_function_name
+    def test_budget_region_settles_nodes_at_minimal_cost(self):
+        # Arrange
+        entry_point_attack_steps = [[5, ["attemptCredentialsReuse"]], [6, ["attemptCredentialsReuse", "guessCredentials"]], [0, ["softwareProductAbuse", "attemptFullAccessFromSupplyChainCompromise"]], [8, ["attemptCredentialsReuse"]]]
+        self.model = help_functions.add_entry_points_to_attacker(self.model, entry_point_attack_steps)
+        self.attackgraph.attach_attackers(self.model)
+        attacker = self.attackgraph.attackers[0]
+        attack_simulation = AttackSimulation(self.attackgraph, attacker, use_ttc=False)
+        attack_simulation.set_attacker_cost_budget(30)
+        cost_map = attack_simulation.get_cost_map()
+
+        # Act
+        cost = attack_simulation.budget_region()
+
+        # Assert
+        visited = [node.id for node in attack_simulation.visited]
+        self.assertEqual(len(visited), len(set(visited)))
+        self.assertEqual(set(visited), set(attack_simulation.region_costs))
+        graph = attack_simulation.graph
+        for node_id in graph.node_ids:
+            settled_cost = cost_map.settled_cost[graph.index[node_id]]
+            self.assertEqual(node_id in attack_simulation.region_costs, settled_cost <= 30)
+            if node_id in attack_simulation.region_costs:
+                self.assertEqual(attack_simulation.region_costs[node_id], settled_cost)
+        self.assertEqual(cost, sum(graph.cost[graph.index[child.id]] for children in attack_simulation.path.values() for child in children))
+        self.assertTrue(1 < len(visited) < len(graph))
+
+    @print_function_name
+    def test_instrumentation_counters_and_phases(self):
+        # Arrange
+        target_attack_step = "Application:0:fullAccess"
+        entry_point_attack_steps = [[0, ["softwareProductAbuse", "attemptFullAccessFromSupplyChainCompromise"]]]
+        self.model = help_functions.add_entry_points_to_attacker(self.model, entry_point_attack_steps)
+        self.attackgraph.attach_attackers(self.model)
+        attacker = self.attackgraph.attackers[0]
+        stats = instrumentation.SimulationStats(profile=True, trace_memory=True)
+        neo4j_graph_connection = RecordingNeo4jGraph()
+
+        # Act
+        attack_simulation = AttackSimulation(self.attackgraph, attacker, use_ttc=False, stats=stats)
+        attack_simulation.set_target_node(target_attack_step)
+        attack_simulation.dijkstra()
+        attack_simulation.upload_graph_to_neo4j(neo4j_graph_connection)
+        result = stats.as_dict()
+
+        # Assert
+        self.assertEqual(set(result["timings"]), {"costs", "graph_build", "search", "reconstruction", "upload"})
+        self.assertEqual(set(result["peak_memory"]), set(result["timings"]))
+        self.assertEqual(result["counters"]["heap_pops"], attack_simulation.expanded_nodes)
+        self.assertGreaterEqual(result["counters"]["heap_pushes"], result["counters"]["heap_pops"])
+        self.assertGreater(result["counters"]["edges_relaxed"], 0)
+        self.assertEqual(result["counters"]["neo4j_round_trips"], len(neo4j_graph_connection.queries))
+        self.assertIn("and_or_search.py", stats.profile_report(limit=None))
+        self.assertEqual(instrumentation.DISABLED.as_dict(), {"counters": {}, "timings": {}, "phase_calls": {}, "peak_memory": {}})
+
+    @print_function_name
+    def test_memory_tracing_of_the_caller_is_kept(self):
+        # Arrange
+        stats = instrumentation.SimulationStats(trace_memory=True)
+        tracemalloc.start()
+        block = bytearray(10**7)
+        del block
+
+        # Act
+        with stats.phase("search"):
+            pass
+        still_tracing = tracemalloc.is_tracing()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        # Assert
+        self.assertTrue(still_tracing)
+        self.assertGreaterEqual(peak_memory, 10**7)
+        self.assertIn("search", stats.peak_memory)
+
+    @print_function_name
+    def test_compiled_graph_matches_attack_graph(self):
+        # Arrange
+        entry_point_attack_steps = [[5, ["attemptCredentialsReuse"]], [6, ["attemptCredentialsReuse", "guessCredentials"]], [0, ["softwareProductAbuse", "attemptFullAccessFromSupplyChainCompromise"]], [8, ["attemptCredentialsReuse"]]]
+        self.model = help_functions.add_entry_points_to_attacker(self.model, entry_point_attack_steps)
+        self.attackgraph.attach_attackers(self.model)
+        attacker = self.attackgraph.attackers[0]
+
+        # Act
+        attack_simulation = AttackSimulation(self.attackgraph, attacker, use_ttc=False)
+        graph = attack_simulation.graph
+
+        # Assert
+        self.assertEqual(len(graph), len(self.attackgraph.nodes))
+        for node in self.attackgraph.nodes:
+            i = graph.index[node.id]
+            self.assertEqual(graph.ids(graph.children(i)), [child.id for child in node.children])
+            self.assertEqual(graph.ids(graph.parents(i)), [parent.id for parent in node.parents])
+            self.assertEqual(graph.node_type[i], compiled_graph.NODE_TYPE_CODES[node.type])
+            self.assertEqual(graph.is_necessary[i], node.is_necessary)
+            self.assertEqual(graph.is_viable[i], node.is_viable)
+            self.assertEqual(graph.cost[i], attack_simulation.cost_dictionary.get(node.id, 0))
+
+def build_attack_graph_nodes(steps):
+    """
+    Build AttackGraphNode instances from a list of (id, type, parent ids, is_necessary) tuples.
+    """
+    nodes = {}
+    for node_id, node_type, parent_ids, is_necessary in steps:
+        node = maltoolbox.attackgraph.node.AttackGraphNode(id=node_id, type=node_type, name=node_id.split(':')[-1], ttc=None)
+        node.is_necessary = is_necessary
+        for parent_id in parent_ids:
+            node.parents.append(nodes[parent_id])
+            nodes[parent_id].children.append(node)
+        nodes[node_id] = node
+    return list(nodes.values())
+
+class RecordingNeo4jGraph:
+    """
+    Stand-in for py2neo.Graph that records the Cypher queries and parameters of committed
+    transactions, and returns an id for every row of a node creating query.
+    """
+
+    def __init__(self):
+        self.queries = []
+        self.transactions = 0
+
+    def begin(self):
+        return RecordingTransaction(self)
+
+    def commit(self, transaction):
+        self.queries.extend(transaction.queries)
+        self.transactions += 1
+
+    def rollback(self, transaction):
+        pass
+
+class RecordingTransaction:
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.queries = []
+
+    def run(self, cypher, parameters=None):
+        self.queries.append((cypher, parameters))
+        records = []
+        if "RETURN row.key" in cypher:
+            for row in parameters["rows"]:
+                records.append({"key": row["key"], "id": len(self.graph.queries) * 1000 + len(records)})
+        return RecordingCursor(records)
+
+class RecordingCursor:
+
+    def __init__(self, records):
+        self.records = records
+
+    def data(self):
+        return self.records
+
+class TestAndOrSearch(unittest.TestCase):
+
+    @print_function_name
+    def test_deep_and_chain_without_recursion(self):
+        # Arrange
+        depth = 5000
+        steps = [("Asset:0:step0", "or", [], True)]
+        for i in range(1, depth + 1):
+            steps.append((f"Asset:{i}:defense", "defense", [], False))
+            steps.append((f"Asset:0:step{i}", "and", [f"Asset:0:step{i-1}", f"Asset:{i}:defense"], True))
+        graph = compiled_graph.CompiledAttackGraph(build_attack_graph_nodes(steps), {node_id: 1 for node_id, _, _, _ in steps[1:]})
+
+        # Act
+        search = and_or_search.AndOrSearch(graph, graph.index["Asset:0:step0"])
+        found = search.run(graph.index[f"Asset:0:step{depth}"])
+        cost, nodes, _ = search.attack_subgraph(graph.index[f"Asset:0:step{depth}"])
+
+        # Assert
+        self.assertTrue(found)
+        self.assertEqual(cost, depth)
+        self.assertEqual(len(nodes), depth + 1)
+
+    @print_function_name
+    def test_and_entry_point_with_unreachable_necessary_parent(self):
+        # Arrange
+        # The attacker node is not a parent of its entry points, like in mal-toolbox.
+        steps = [("Attacker:1:firstSteps", "or", [], True), ("Asset:0:p1", "or", [], True), ("Asset:0:p2", "or", [], True),
+                 ("Asset:0:x", "and", ["Asset:0:p1", "Asset:0:p2"], True)]
+        nodes = build_attack_graph_nodes(steps)
+        nodes[0].children.extend([nodes[1], nodes[3]])
+        graph = compiled_graph.CompiledAttackGraph(nodes, {"Asset:0:p1": 1, "Asset:0:p2": 1, "Asset:0:x": 1})
+
+        # Act
+        search = and_or_search.AndOrSearch(graph, graph.index["Attacker:1:firstSteps"])
+        found = search.run(graph.index["Asset:0:x"])
+
+        # Assert
+        self.assertFalse(found)
+        self.assertTrue(search.is_settled(graph.index["Asset:0:p1"]))
+        self.assertFalse(search.is_settled(graph.index["Asset:0:x"]))
+        self.assertTrue(all(search.g_score[node] < math.inf for node in search.settle_order))
+
+    @print_function_name
+    def test_shared_steps_are_paid_once(self):
+        # Arrange
+        # Every 'and' step joins two 'or' steps that share the previous 'and' step.
+        depth = 20
+        steps = [("Asset:0:join0", "or", [], True)]
+        for i in range(1, depth + 1):
+            steps.append((f"Asset:0:left{i}", "or", [f"Asset:0:join{i-1}"], True))
+            steps.append((f"Asset:0:right{i}", "or", [f"Asset:0:join{i-1}"], True))
+            steps.append((f"Asset:0:join{i}", "and", [f"Asset:0:left{i}", f"Asset:0:right{i}"], True))
+        graph = compiled_graph.CompiledAttackGraph(build_attack_graph_nodes(steps), {node_id: 1 for node_id, _, _, _ in steps[1:]})
+
+        # Act
+        search = and_or_search.AndOrSearch(graph, graph.index["Asset:0:join0"])
+        search.run()
+        cost, nodes, edges = search.attack_subgraph(graph.index[f"Asset:0:join{depth}"])
+
+        # Assert
+        # Per level: 1 for each 'or' step and 2 for the 'and' step, entered from two parents.
+        self.assertEqual(cost, 4 * depth)
+        self.assertEqual(len(nodes), 3 * depth + 1)
+        self.assertEqual(sum(len(children) for children in edges.values()), 4 * depth)
+
+    @print_function_name
+    def test_cheapest_attacks_through_and_step(self):
+        # Arrange
+        # The target joins a and b, and both can be reached in two ways.
+        steps = [("Asset:0:start", "or", [], True),
+                 ("Asset:0:a1", "or", ["Asset:0:start"], True), ("Asset:0:a2", "or", ["Asset:0:start"], True),
+                 ("Asset:0:a", "or", ["Asset:0:a1", "Asset:0:a2"], True),
+                 ("Asset:0:b1", "or", ["Asset:0:start"], True), ("Asset:0:b2", "or", ["Asset:0:start"], True),
+                 ("Asset:0:b", "or", ["Asset:0:b1", "Asset:0:b2"], True),
+                 ("Asset:0:target", "and", ["Asset:0:a", "Asset:0:b"], True)]
+        costs = {"Asset:0:a1": 1, "Asset:0:a2": 3, "Asset:0:a": 1, "Asset:0:b1": 2, "Asset:0:b2": 5, "Asset:0:b": 1, "Asset:0:target": 1}
+        graph = compiled_graph.CompiledAttackGraph(build_attack_graph_nodes(steps), costs)
+
+        # Act
+        attacks = list(and_or_search.cheapest_attacks(graph, graph.index["Asset:0:start"], graph.index["Asset:0:target"]))
+
+        # Assert
+        self.assertEqual([cost for cost, _, _ in attacks], [7, 9, 10, 12])
+        self.assertEqual({frozenset(graph.ids(nodes)) for _, nodes, _ in attacks},
+                         {frozenset(["Asset:0:start", a, "Asset:0:a", b, "Asset:0:b", "Asset:0:target"])
+                          for a in ["Asset:0:a1", "Asset:0:a2"] for b in ["Asset:0:b1", "Asset:0:b2"]})
+
+    @print_function_name
+    def test_cheapest_attacks_are_the_cheapest_paths_without_and_steps(self):
+        for seed in range(5):
+            # Arrange
+            graph, _ = synthetic.synthetic_attack_graph(25, fan_out=2.5, and_ratio=0, locality=4, seed=seed)
+            target_node = len(graph) - 1
+            path_costs = []
+            stack = [(0, {0}, graph.cost[0])]
+            while stack:
+                node, path, cost = stack.pop()
+                if node == target_node:
+                    path_costs.append(cost)
+                    continue
+                stack.extend((child, path | {child}, cost + graph.cost[child]) for child in graph.children(node).tolist() if child not in path)
+
+            # Act
+            attacks = list(itertools.islice(and_or_search.cheapest_attacks(graph, 0, target_node), 15))
+
+            # Assert
+            self.assertEqual([cost for cost, _, _ in attacks], sorted(path_costs)[:15])
+            self.assertEqual(len({frozenset((parent, child) for parent, children in edges.items() for child in children) for _, _, edges in attacks}), len(attacks))
+
+    @print_function_name
+    def test_bidirectional_search_matches_forward_search(self):
+        for and_ratio in [0, 0.2]:
+            forward_expanded_nodes = 0
+            bidirectional_expanded_nodes = 0
+            for seed in range(3):
+                # Arrange
+                graph, _ = synthetic.synthetic_attack_graph(2000, fan_out=3, and_ratio=and_ratio, locality=1000, seed=seed)
+                target_node = len(graph) - 1
+                forward = and_or_search.AndOrSearch(graph, 0)
+                forward.run(target_node)
+
+                # Act
+                search = and_or_search.BidirectionalSearch(graph, 0, target_node)
+                found = search.run()
+                cost, nodes, edges = search.attack_subgraph()
+
+                # Assert
+                self.assertTrue(found)
+                self.assertEqual(search.cost, forward.g_score[target_node])
+                self.assertEqual(nodes[-1], target_node)
+                if and_ratio == 0:
+                    self.assertEqual(cost, forward.attack_subgraph(target_node)[0])
+                forward_expanded_nodes += forward.expanded_nodes
+                bidirectional_expanded_nodes += search.expanded_nodes
+            if and_ratio == 0:
+                self.assertLess(bidirectional_expanded_nodes, forward_expanded_nodes)
+
+
+    @print_function_name
+    def test_bidirectional_search_falls_back_to_forward_search_at_and_joins(self):
+        for seed in range(5):
+            # Arrange
+            graph, _ = synthetic.synthetic_attack_graph(2000, fan_out=3, and_ratio=0.5, locality=1000, seed=seed)
+            target_node = len(graph) - 1
+            forward = and_or_search.AndOrSearch(graph, 0)
+            forward.run(target_node)
+
+            # Act
+            search = and_or_search.BidirectionalSearch(graph, 0, target_node)
+            search.run()
+
+            # Assert
+            self.assertEqual(search.cost, forward.g_score[target_node])
+            self.assertEqual(search.expanded_nodes, search.forward.expanded_nodes + search.backward_expanded_nodes)
+            # The backward search stops at the joins next to the target, and the forward search
+            # does not expand more than the search without the backward search.
+            self.assertLessEqual(search.backward_expanded_nodes, 10)
+            self.assertLessEqual(search.forward.expanded_nodes, forward.expanded_nodes)
+
+    @print_function_name
+    def test_searches_extract_the_same_attack_with_shared_steps(self):
+        for seed in range(10):
+            # Arrange
+            graph, _ = synthetic.synthetic_attack_graph(60, seed=seed, and_ratio=0.4)
+            # Costs of 1 or 2 make many attacks equally cheap.
+            rng = np.random.default_rng(seed)
+            tied_graph = graph.with_costs(np.concatenate([[0], rng.integers(1, 3, len(graph) - 1)]))
+            for graph in [graph, tied_graph]:
+                cost_map = and_or_search.AttackCostMap(graph, 0)
+                heuristic = heuristics.LandmarkHeuristic(graph)
+                for target_node in range(1, len(graph)):
+                    if not cost_map.is_reachable(target_node):
+                        continue
+
+                    # Act
+                    dijkstra = and_or_search.AndOrSearch(graph, 0)
+                    dijkstra.run(target_node)
+                    a_star = and_or_search.AndOrSearch(graph, 0, heuristic.estimate(target_node).tolist())
+                    a_star.run(target_node)
+                    bidirectional = and_or_search.BidirectionalSearch(graph, 0, target_node)
+                    bidirectional.run()
+
+                    # Assert
+                    # The nodes are in settle order, which differs between the searches.
+                    attacks = [dijkstra.attack_subgraph(target_node), a_star.attack_subgraph(target_node),
+                               bidirectional.attack_subgraph(), cost_map.attack_subgraph(target_node)]
+                    attacks = [(cost, set(nodes), {node: set(children) for node, children in edges.items()}) for cost, nodes, edges in attacks]
+                    self.assertEqual(attacks[1:], attacks[:1] * 3)
+                    self.assertEqual(cost_map.cost(target_node), attacks[0][0])
+
+    @print_function_name
+    def test_cheapest_attacks_are_distinct_and_valid(self):
+        for seed in range(40):
+            # Arrange
+            graph, _ = synthetic.synthetic_attack_graph(30, fan_out=2.5, and_ratio=0.3, locality=5, seed=seed)
+            target_node = len(graph) - 1
+
+            # Act
+            attacks = list(itertools.islice(and_or_search.cheapest_attacks(graph, 0, target_node), 15))
+
+            # Assert
+            costs = [cost for cost, _, _ in attacks]
+            self.assertTrue(all(cost < math.inf for cost in costs))
+            self.assertEqual(costs, [graph.cost[0] + sum(graph.cost[child] for children in edges.values() for child in children) for _, _, edges in attacks])
+            self.assertEqual(len({frozenset((parent, child) for parent, children in edges.items() for child in children) for _, _, edges in attacks}), len(attacks))
+            for _, nodes, edges in attacks:
+                entered_from = {}
+                for parent, children in edges.items():
+                    for child in children:
+                        entered_from.setdefault(child, set()).add(parent)
+                for node in nodes[1:]:
+                    self.assertTrue(entered_from[node] <= set(nodes))
+                    if graph.node_type[node] == compiled_graph.AND:
+                        self.assertEqual(entered_from[node], {parent for parent in graph.parents(node).tolist() if graph.is_necessary[parent]})
+
+
+    @print_function_name
+    def test_first_cheapest_attack_is_the_attack_of_dijkstra(self):
+        for seed, target_node in [(17, 57)] + [(seed, 59) for seed in range(10)]:
+            # Arrange
+            graph, _ = synthetic.synthetic_attack_graph(60, seed=seed, and_ratio=0.4)
+            search = and_or_search.AndOrSearch(graph, 0)
+            search.run(target_node)
+            cost, nodes, _ = search.attack_subgraph(target_node)
+
+            # Act
+            attack_cost, attack_nodes, _ = next(and_or_search.cheapest_attacks(graph, 0, target_node))
+
+            # Assert
+            self.assertEqual(attack_cost, cost)
+            self.assertEqual(set(attack_nodes), set(nodes))
+            self.assertEqual(and_or_search.AttackCostMap(graph, 0).cost(target_node), cost)
+
+
+class TestIndexedPriorityQueue(unittest.TestCase):
+
+    @print_function_name
+    def test_pop_order_with_decrease_key(self):
+        # Arrange
+        open_set = priority_queue.IndexedPriorityQueue(5)
+        for item, priority in [(0, 5), (1, 3), (2, 8), (3, 3), (4, 1)]:
+            open_set.push(item, priority)
+
+        # Act
+        decreased = open_set.decrease_key(2, 2)
+        not_decreased = open_set.decrease_key(0, 6)
+        order = [open_set.pop() for _ in range(len(open_set))]
+
+        # Assert
+        self.assertTrue(decreased)
+        self.assertFalse(not_decreased)
+        self.assertEqual(order, [(1, 4), (2, 2), (3, 1), (3, 3), (5, 0)])
+        self.assertNotIn(0, open_set)
+
+class TestTTCCosts(unittest.TestCase):
+
+    @print_function_name
+    def test_sample_means_match_distribution_means(self):
+        # Arrange
+        ttcs = [{'name': "EasyAndCertain"}, {'name': "HardAndUncertain"}, {'name': "Exponential", 'arguments': [0.5]},
+                {'name': "Enabled"}, {}, None]
+        expected_costs = [1, 0.5*10 + 0.5*help_functions.MAX_COST, 2, 0, 0, 0]
+
+        # Act
+        costs = help_functions.costs_from_ttc(ttcs, num_samples=20000, seed=1)
+
+        # Assert
+        for cost, expected_cost in zip(costs, expected_costs):
+            self.assertAlmostEqual(cost, expected_cost, delta=0.05*expected_cost)
+
+    @print_function_name
+    def test_analytic_costs_match_sample_statistics(self):
+        # Arrange
+        ttcs = [{'name': "EasyAndCertain"}, {'name': "EasyAndUncertain"}, {'name': "HardAndUncertain"},
+                {'name': "VeryHardAndUncertain"}, {'name': "Exponential", 'arguments': [0.5]}, {}]
+        rng = np.random.default_rng(2)
+        samples = [help_functions.sample_distribution(help_functions.ttc_distribution(ttc), 200000, rng) if ttc else np.zeros(1) for ttc in ttcs]
+
+        for statistic in ["mean", 0.1, 0.5, 0.9]:
+            # Act
+            costs = help_functions.analytic_costs_from_ttc(ttcs, statistic)
+
+            # Assert
+            for cost, sample in zip(costs, samples):
+                expected_cost = sample.mean() if statistic == "mean" else np.quantile(sample, statistic)
+                self.assertAlmostEqual(cost, expected_cost, delta=0.02*expected_cost + 0.01)
+
+    @print_function_name
+    def test_analytic_costs_reject_unknown_statistics(self):
+        # Arrange
+        ttcs = [{'name': "EasyAndCertain"}]
+
+        for statistic in ["median", None, 1, -0.5]:
+            # Act and Assert
+            with self.assertRaises(ValueError):
+                help_functions.analytic_costs_from_ttc(ttcs, statistic)
+
+class TestDefenseAnalysis(unittest.TestCase):
+
+    def setUp(self):
+        self.attackgraph, _ = graph_cache.build_attack_graph(constants.MAR_ARCHIVE, constants.MODEL_FILE)
+        self.costs = help_functions.load_costs_from_file()
+        self.graph = compiled_graph.CompiledAttackGraph(self.attackgraph.nodes, self.costs)
+        self.start_node = self.graph.index["Attacker:12:firstSteps"]
+
+    def recompute(self, enabled_defenses):
+        """
+        Compile the attack graph again after calculate_viability_and_necessity() with the defenses.
+        """
+        for node in self.attackgraph.nodes:
+            node.is_viable = True
+            node.is_necessary = True
+            if node.type == "defense":
+                node.defense_status = 1.0 if node.id in enabled_defenses else 0.0
+        maltoolbox.attackgraph.analyzers.apriori.calculate_viability_and_necessity(self.attackgraph)
+        return compiled_graph.CompiledAttackGraph(self.attackgraph.nodes, self.costs)
+
+    @print_function_name
+    def test_incremental_update_matches_recomputation(self):
+        # Arrange
+        analysis = defense_analysis.DefenseAnalysis(self.graph, self.start_node)
+        defenses = analysis.defenses()
+        rng = random.Random(0)
+
+        for _ in range(10):
+            # Act
+            what_if = analysis
+            for _ in range(2):
+                what_if = what_if.with_defenses({defense: rng.random() < 0.5 for defense in rng.sample(defenses, 4)})
+
+            # Assert
+            graph = self.recompute({defense for defense in defenses if what_if.is_enabled(defense)})
+            cost_map = and_or_search.AttackCostMap(graph, self.start_node)
+            self.assertTrue(np.array_equal(what_if.graph.is_viable, graph.is_viable))
+            self.assertTrue(np.array_equal(what_if.graph.is_necessary, graph.is_necessary))
+            self.assertEqual([what_if.cost_map.cost(i) for i in range(len(graph))], [cost_map.cost(i) for i in range(len(graph))])
+            self.assertLessEqual(what_if.cost_map.search.resettled_nodes, len(what_if.affected_nodes))
+
+    @print_function_name
+    def test_rank_defenses(self):
+        # Arrange
+        analysis = defense_analysis.DefenseAnalysis(self.graph, self.start_node)
+        targets = [node_id for i, node_id in enumerate(self.graph.node_ids) if analysis.cost_map.is_reachable(i)][-10:]
+        base_costs = [analysis.cost(target) for target in targets]
+
+        # Act
+        impacts = analysis.rank_defenses(analysis.defenses(), targets)
+
+        # Assert
+        self.assertEqual(len(impacts), len(analysis.defenses()))
+        self.assertEqual([impact.impact for impact in impacts], sorted((impact.impact for impact in impacts), reverse=True))
+        self.assertGreater(impacts[0].impact, 0)
+        for impact in impacts[:5]:
+            expected = analysis.with_defenses([impact.defense])
+            self.assertEqual(impact.costs, {target: expected.cost(target) for target in targets})
+        self.assertEqual([analysis.cost(target) for target in targets], base_costs)
+        with self.assertRaises(ValueError):
+            analysis.with_defenses(["Application:0:fullAccess"])
+
+    @print_function_name
+    def test_pruned_unreachable_what_ifs_match_full_graph(self):
+        # Arrange
+        attacker = next(attacker for attacker in self.attackgraph.attackers if attacker.node.id == "Attacker:12:firstSteps")
+        full_analysis = AttackSimulation(self.attackgraph, attacker, use_ttc=False).defense_analysis()
+        reachable_analysis = AttackSimulation(self.attackgraph, attacker, use_ttc=False, prune_unreachable=True).defense_analysis()
+        defenses = [defense for defense in reachable_analysis.defenses() if not reachable_analysis.is_enabled(defense)]
+        attack_steps = [node_id for node_id in reachable_analysis.graph.node_ids if not node_id.startswith("Attacker")]
+
+        self.assertTrue(reachable_analysis.graph.missing_necessary_parent.any())
+        self.assertGreater(len(defenses), 1)
+        for enabled_defenses in [[defense] for defense in defenses] + [defenses]:
+            # Act
+            reachable_what_if = reachable_analysis.with_defenses(enabled_defenses)
+            full_what_if = full_analysis.with_defenses(enabled_defenses)
+
+            # Assert
+            self.assertEqual({node_id: reachable_what_if.cost(node_id) for node_id in attack_steps},
+                             {node_id: full_what_if.cost(node_id) for node_id in attack_steps})
+
+    @print_function_name
+    def test_and_step_with_parent_outside_of_reachable_nodes_stays_not_viable(self):
+        # Arrange
+        # The 'and' step needs hidden, which the attacker can not reach, and stays in the cone of
+        # the defense through the 'or' step.
+        steps = [("Asset:0:start", "or", [], True), ("Asset:0:defense", "defense", [], False),
+                 ("Asset:0:guarded", "and", ["Asset:0:start", "Asset:0:defense"], True),
+                 ("Asset:0:either", "or", ["Asset:0:start", "Asset:0:guarded"], True),
+                 ("Asset:0:hidden", "or", [], True),
+                 ("Asset:0:target", "and", ["Asset:0:either", "Asset:0:hidden"], True)]
+        nodes = build_attack_graph_nodes(steps)
+        costs = {node_id: 1 for node_id, _, _, _ in steps}
+        reachable_graph = compiled_graph.CompiledAttackGraph(compiled_graph.reachable_nodes(nodes[:1]), costs)
+        full_graph = compiled_graph.CompiledAttackGraph(nodes, costs)
+
+        # Act
+        what_ifs = [defense_analysis.DefenseAnalysis(graph, graph.index["Asset:0:start"]).with_defenses(["Asset:0:defense"])
+                    for graph in [reachable_graph, full_graph]]
+
+        # Assert
+        self.assertNotIn("Asset:0:hidden", reachable_graph.index)
+        self.assertEqual(reachable_graph.missing_necessary_parent.tolist(), [node_id == "Asset:0:target" for node_id in reachable_graph.node_ids])
+        self.assertFalse(what_ifs[0].graph.is_viable[reachable_graph.index["Asset:0:target"]])
+        for what_if in what_ifs:
+            self.assertEqual(what_if.cost("Asset:0:target"), math.inf)
+            self.assertEqual(what_if.cost("Asset:0:either"), 2)
+
+class TestTargetRelevance(unittest.TestCase):
+
+    def setUp(self):
+        attackgraph, _ = graph_cache.build_attack_graph(constants.MAR_ARCHIVE, constants.MODEL_FILE)
+        self.graph = compiled_graph.CompiledAttackGraph(attackgraph.nodes)
+        self.relevance = relevance.TargetRelevance(self.graph)
+        # The nodes reachable from every node over the children.
+        self.reachable = []
+        for node in range(len(self.graph)):
+            found = {node}
+            stack = [node]
+            while stack:
+                for child in self.graph.children(stack.pop()).tolist():
+                    if child not in found:
+                        found.add(child)
+                        stack.append(child)
+            self.reachable.append(found)
+
+    @print_function_name
+    def test_components_match_mutual_reachability(self):
+        # Act
+        component = self.relevance.component
+
+        # Assert
+        self.assertLess(self.relevance.number_of_components, len(self.graph))
+        for node in range(len(self.graph)):
+            self.assertEqual({other for other in self.reachable[node] if node in self.reachable[other]},
+                             set(np.flatnonzero(component == component[node]).tolist()))
+        # The condensed graph is a DAG, the children have lower component indices.
+        for source in range(self.relevance.number_of_components):
+            for k in range(self.relevance.children_indptr[source], self.relevance.children_indptr[source + 1]):
+                self.assertLess(self.relevance.children_indices[k], source)
+
+    @print_function_name
+    def test_relevant_nodes_are_descendants_and_ancestors(self):
+        # Arrange
+        start_node = self.graph.index["Attacker:12:firstSteps"]
+        targets = [node for node in sorted(self.reachable[start_node]) if self.graph.node_type[node] == compiled_graph.OR][::10]
+
+        for target_node in targets:
+            # Act
+            relevant, stats = self.relevance.relevant_nodes(start_node, target_node)
+
+            # Assert
+            ancestors = {node for node in range(len(self.graph)) if target_node in self.reachable[node]}
+            self.assertEqual(set(np.flatnonzero(relevant).tolist()), self.reachable[start_node] & ancestors)
+            self.assertEqual(stats.descendant_nodes, len(self.reachable[start_node]))
+            self.assertEqual(stats.ancestor_nodes, len(ancestors))
+            self.assertEqual(stats.relevant_nodes, int(relevant.sum()))
+
+
+class TestBackgroundSink(unittest.TestCase):
+
+    @print_function_name
+    def test_writes_in_order_with_bounded_queue(self):
+        # Arrange
+        written = []
+        def write(value):
+            time.sleep(0.001)
+            written.append(value)
+
+        # Act
+        with background_sink.BackgroundSink(max_queue_size=2) as sink:
+            for value in range(20):
+                sink.submit(write, value)
+        stats = sink.stats()
+
+        # Assert
+        self.assertEqual(written, list(range(20)))
+        self.assertEqual((stats.submitted, stats.completed, stats.queue_depth), (20, 20, 0))
+        self.assertLessEqual(stats.max_queue_depth, 2)
+        self.assertGreater(stats.max_latency, 0)
+
+    @print_function_name
+    def test_write_error_is_raised_in_caller(self):
+        # Arrange
+        sink = background_sink.BackgroundSink()
+        def fail():
+            raise ConnectionError("Neo4j is down")
+
+        # Act
+        sink.submit(fail)
+
+        # Assert
+        with self.assertRaises(ConnectionError):
+            sink.flush()
+        with self.assertRaises(ConnectionError):
+            sink.close()
+
+class TestExporters(unittest.TestCase):
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+    @print_function_name
+    def test_parquet_exporter_writes_chunks(self):
+        # Arrange
+        import pyarrow.parquet
+        nodes = [("Attacker:1:firstSteps", (["Attacker:1", "False"], {"is_horizon_node": False, "cost": None})),
+                 ("Application:0:read", (["Application:0", "True"], {"is_horizon_node": True, "cost": "3"}))]
+        relationships = [("Attacker:1:firstSteps", "Application:0:read")]
+
+        with tempfile.TemporaryDirectory() as directory:
+            # Act
+            exporters.export(exporters.ParquetExporter(os.path.join(directory, "result")), nodes, relationships, chunk_size=1)
+            node_rows = pyarrow.parquet.read_table(os.path.join(directory, "result.nodes.parquet")).to_pylist()
+            relationship_rows = pyarrow.parquet.read_table(os.path.join(directory, "result.relationships.parquet")).to_pylist()
+
+        # Assert
+        self.assertEqual([(row["id"], (row["labels"], {"is_horizon_node": row["is_horizon_node"], "cost": row["cost"]})) for row in node_rows], nodes)
+        self.assertEqual([(row["from"], row["to"]) for row in relationship_rows], relationships)
+
+class TestBenchmarks(unittest.TestCase):
+
+    @print_function_name
+    def test_synthetic_attack_graph_is_consistent_and_reachable(self):
+        # Arrange
+        size = 2000
+
+        # Act
+        graph, ttcs = synthetic.synthetic_attack_graph(size, fan_out=3, and_ratio=0.3, seed=4)
+        cost_map = and_or_search.AttackCostMap(graph, 0)
+
+        # Assert
+        edges = {(parent, child) for parent in range(size) for child in graph.children(parent).tolist()}
+        self.assertEqual(edges, {(parent, child) for child in range(size) for parent in graph.parents(child).tolist()})
+        self.assertTrue(all(parent < child for parent, child in edges))
+        self.assertTrue(np.isfinite(cost_map.settled_cost).all())
+        self.assertAlmostEqual((graph.node_type == compiled_graph.AND).mean(), 0.3, delta=0.05)
+        self.assertEqual(len(ttcs), size)
+
+    @print_function_name
+    def test_compare_flags_regressions(self):
+        # Arrange
+        baseline = {"results": [{"size": 10, "benchmark": "dijkstra", "seconds": 1.0, "peak_memory_bytes": 100},
+                                {"size": 10, "benchmark": "bfs", "seconds": 1.0, "peak_memory_bytes": None}]}
+        current = {"results": [{"size": 10, "benchmark": "dijkstra", "seconds": 1.1, "peak_memory_bytes": 200},
+                               {"size": 10, "benchmark": "bfs", "seconds": 2.0, "peak_memory_bytes": None}]}
+
+        # Act
+        regressions = scaling.compare(baseline, current, threshold=0.25)
+
+        # Assert
+        self.assertEqual(regressions, [(10, "dijkstra", "peak_memory_bytes", 100, 200), (10, "bfs", "seconds", 1.0, 2.0)])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,95 @@
+from collections import deque
+import random
+
+import attack_surface
+
+
+def random_path(graph, start_nodes, target_node=None, attacker_cost_budget=None, rng=random, allowed=None):
+    """
+    Generate a random attack path from the start nodes, see AttackSimulation.random_path().
+
+    Parameters:
+    - graph: A CompiledAttackGraph instance.
+    - start_nodes: The index of the node the attacker starts from, or a list of indices.
+                   The start nodes are reached at their own cost.
+    - target_node: Optional index of the target node, the walk stops when it is reached.
+    - attacker_cost_budget: Optional cost budget, the walk stops before it is exceeded.
+    - rng: The random number generator, an object with a choice() method like random.Random.
+    - allowed: Optional sequence of booleans, the walk only enters the nodes i with allowed[i] True.
+
+    Returns:
+    - cost: The total cost of the random path.
+    - reached_order: The reached node indices in the order they were reached, the start nodes first.
+    - path: A dictionary mapping node indices to the list of their child indices in the path.
+    - horizon: The node indices of the attack surface (not reached yet) when the walk stopped.
+    """
+    view = graph.scalar_view()
+    parents_indptr = view.parents_indptr
+    parents_indices = view.parents_indices
+    costs = view.cost
+    start_nodes = [start_nodes] if isinstance(start_nodes, int) else list(start_nodes)
+
+    surface = attack_surface.AttackSurface(graph, start_nodes, allowed)
+    reached = surface.reached
+    path = {}
+
+    cost = sum(costs[start_node] for start_node in start_nodes)
+    while len(surface) > 0:
+        node = rng.choice(surface.horizon)
+
+        # Check if the cost is within cost budget (if the cost budget was specified).
+        if attacker_cost_budget != None and cost+costs[node] > attacker_cost_budget:
+            break
+
+        # Find a parent node and update path.
+        parent_node = start_nodes[0]
+        for k in range(parents_indptr[node], parents_indptr[node + 1]):
+            if reached[parents_indices[k]]:
+                parent_node = parents_indices[k]
+                break
+        path.setdefault(parent_node, []).append(node)
+        surface.compromise(node)
+        cost += costs[node]
+
+        # Check if the target node was selected (if the target node was specified).
+        if target_node != None and node == target_node:
+            break
+    return cost, surface.reached_order, path, list(surface.horizon)
+
+
+def bfs(graph, start_nodes, attacker_cost_budget):
+    """
+    Breadth-First Search from the start nodes within the cost budget, see AttackSimulation.bfs().
+
+    Parameters:
+    - graph: A CompiledAttackGraph instance.
+    - start_nodes: The index of the node the attacker starts from, or a list of indices.
+    - attacker_cost_budget: The cost budget.
+
+    Returns:
+    - cost: The cost of the last explored path.
+    - visited: The visited node indices.
+    - path: A dictionary mapping node indices to the list of their child indices in the path.
+    """
+    view = graph.scalar_view()
+    children_indptr = view.children_indptr
+    children_indices = view.children_indices
+    costs = view.cost
+    start_nodes = [start_nodes] if isinstance(start_nodes, int) else list(start_nodes)
+
+    # Start BFS from the start nodes at their own cost.
+    queue = deque((start_node, costs[start_node]) for start_node in start_nodes)
+    visited = list(start_nodes)
+    path = {}
+    cost = 0
+    while queue:
+        node, cost = queue.popleft()
+        # Explore the horizon of the current node.
+        for k in range(children_indptr[node], children_indptr[node + 1]):
+            child_node = children_indices[k]
+            next_cost = cost + costs[child_node]
+            if next_cost <= attacker_cost_budget:
+                visited.append(child_node)
+                queue.append((child_node, next_cost))
+                path.setdefault(node, []).append(child_node)
+    return cost, visited, path